@@ -1,27 +1,58 @@
 import os
-from flask import Flask, render_template
+from tempfile import SpooledTemporaryFile
+from flask import Flask, Request, render_template
 from flask_cors import CORS
 from dotenv import load_dotenv
 from config import Config
+from services.logging_setup import configure_logging
+from services.metrics import instrument_app
+from services.admission import install_admission_control, parse_class_settings
 from routes.convert_routes import convert_routes
 from routes.translate_routes import translate_bp
 from routes.upload_routes import upload_bp
+from routes.metrics_routes import metrics_bp
 from models.ai_models import AIModels
 
 # Load environment variables from .env file
 load_dotenv()
 
+configure_logging(Config.LOG_LEVEL, Config.LOG_FORMAT)
+
+class SpooledRequest(Request):
+    """Keeps uploads in memory up to UPLOAD_SPOOL_MAX_MEMORY, then spills to an anonymous temp file."""
+
+    def _get_file_stream(self, total_content_length, content_type, filename=None, content_length=None):
+        return SpooledTemporaryFile(max_size=Config.UPLOAD_SPOOL_MAX_MEMORY, mode='rb+')
+
 app = Flask(__name__)
+app.request_class = SpooledRequest
 CORS(app)  # Enable CORS
 app.config.from_object(Config)
+instrument_app(app)
+if Config.ADMISSION_CONTROL_ENABLED:
+    # Registered after the metrics hooks, so shed requests are still counted
+    install_admission_control(
+        app,
+        parse_class_settings(Config.ADMISSION_CONCURRENCY),
+        parse_class_settings(Config.ADMISSION_QUEUE),
+        parse_class_settings(Config.ADMISSION_TIMEOUT),
+        Config.ADMISSION_LOCK_DIR,
+        retry_after=Config.ADMISSION_RETRY_AFTER
+    )
 
 # Load AI models globally - now using online APIs
 ai_models = AIModels()
 
+if Config.PRELOAD_APP:
+    # Runs once in the gunicorn master; workers fork with the export stack already loaded
+    from services.convert_service import warm_export_stack
+    warm_export_stack()
+
 # Register Blueprints
 app.register_blueprint(translate_bp)
 app.register_blueprint(upload_bp)
 app.register_blueprint(convert_routes, url_prefix='/export')
+app.register_blueprint(metrics_bp)
 
 @app.route('/')
 def index():
@@ -0,0 +1,150 @@
+"""
+Deterministic benchmark inputs: PDFs with a text layer and scanned (image only)
+PDFs, WAV clips and chat histories of several sizes.
+
+Generated on first use into benchmarks/fixtures/ (not committed):
+
+    python -m benchmarks.fixtures
+"""
+import json
+import os
+import random
+import wave
+
+FIXTURES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures')
+FONT_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'services', 'fonts', 'DejaVuSans.ttf')
+
+# Fixture name -> size; names are what scenarios refer to
+PDF_PAGES = {'text_5p': 5, 'text_50p': 50}
+SCANNED_PDF_PAGES = {'scanned_2p': 2}
+AUDIO_SECONDS = {'clip_10s': 10, 'clip_60s': 60, 'clip_300s': 300}
+CHAT_ITEMS = {'chat_10': 10, 'chat_500': 500, 'chat_5000': 5000}
+
+AUDIO_RATE = 16000
+
+_ENGLISH_WORDS = (
+    "the report translation meeting document client contract review summary schedule budget "
+    "department quarterly delivery approval service request update support policy customer"
+).split()
+_ARABIC_WORDS = (
+    "التقرير الترجمة الاجتماع المستند العميل العقد المراجعة الملخص الجدول الميزانية "
+    "القسم التسليم الموافقة الخدمة الطلب التحديث الدعم السياسة"
+).split()
+
+def _sentence(rng, words, min_words=6, max_words=18, end='.'):
+    return ' '.join(rng.choice(words) for _ in range(rng.randint(min_words, max_words))).capitalize() + end
+
+def _paragraph(rng, sentences=5):
+    parts = []
+    for _ in range(sentences):
+        if rng.random() < 0.3:
+            parts.append(_sentence(rng, _ARABIC_WORDS, end=rng.choice('.؟')))
+        else:
+            parts.append(_sentence(rng, _ENGLISH_WORDS, end=rng.choice('.?!')))
+    return ' '.join(parts)
+
+def make_text_pdf(path, pages, seed=0):
+    """A PDF with a real text layer, roughly 30 lines of mixed English/Arabic per page."""
+    from reportlab.lib.pagesizes import A4
+    from reportlab.pdfbase import pdfmetrics
+    from reportlab.pdfbase.ttfonts import TTFont
+    from reportlab.pdfgen import canvas
+
+    pdfmetrics.registerFont(TTFont('DejaVuSans', FONT_PATH))
+    rng = random.Random(seed)
+    pdf = canvas.Canvas(path, pagesize=A4)
+    height = A4[1]
+    for _ in range(pages):
+        text = pdf.beginText(50, height - 60)
+        text.setFont('DejaVuSans', 10)
+        line = ''
+        for word in _paragraph(rng, sentences=40).split():
+            if len(line) + len(word) > 95:
+                text.textLine(line)
+                line = ''
+            line = f"{line} {word}".strip()
+        text.textLine(line)
+        pdf.drawText(text)
+        pdf.showPage()
+    pdf.save()
+
+def make_scanned_pdf(path, pages, seed=0):
+    """An image-only PDF (no text layer), which sends /upload-pdf down the OCR path."""
+    from PIL import Image, ImageDraw, ImageFont
+
+    rng = random.Random(seed)
+    try:
+        font = ImageFont.truetype(FONT_PATH, 28)
+    except OSError:
+        font = ImageFont.load_default()
+    images = []
+    for _ in range(pages):
+        image = Image.new('L', (1240, 1754), 255)  # A4 at 150 dpi
+        draw = ImageDraw.Draw(image)
+        for row in range(35):
+            draw.text((80, 80 + row * 46), _sentence(rng, _ENGLISH_WORDS, 6, 10), fill=0, font=font)
+        images.append(image)
+    images[0].save(path, 'PDF', resolution=150, save_all=True, append_images=images[1:])
+
+def make_wav(path, seconds, seed=0):
+    """Mono 16 kHz speech-like audio: tone bursts separated by short silences."""
+    import numpy as np
+
+    rng = random.Random(seed)
+    samples = np.zeros(seconds * AUDIO_RATE, dtype='<i2')
+    position = 0
+    while position < len(samples):
+        burst = min(int(AUDIO_RATE * rng.uniform(0.8, 3.0)), len(samples) - position)
+        t = np.arange(burst) / AUDIO_RATE
+        samples[position:position + burst] = 8000 * np.sin(2 * np.pi * rng.uniform(120, 300) * t)
+        position += burst + int(AUDIO_RATE * rng.uniform(0.2, 0.6))  # Silence between bursts
+    with wave.open(path, 'wb') as wav_file:
+        wav_file.setnchannels(1)
+        wav_file.setsampwidth(2)
+        wav_file.setframerate(AUDIO_RATE)
+        wav_file.writeframes(samples.tobytes())
+
+def make_chat(path, items, seed=0):
+    """A chat history as the frontend posts it to /export/*."""
+    rng = random.Random(seed)
+    chat = []
+    for _ in range(items):
+        english = _sentence(rng, _ENGLISH_WORDS, 4, 30)
+        arabic = _sentence(rng, _ARABIC_WORDS, 4, 30)
+        if rng.random() < 0.5:
+            chat.append({'original': english, 'translated': arabic, 'source_lang': 'English', 'target_lang': 'Arabic'})
+        else:
+            chat.append({'original': arabic, 'translated': english, 'source_lang': 'Arabic', 'target_lang': 'English'})
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(chat, f, ensure_ascii=False)
+
+def sentences(count, seed=0):
+    """Short texts for /translate, mixed Arabic and English."""
+    rng = random.Random(seed)
+    return [
+        (_sentence(rng, _ARABIC_WORDS, 3, 15), 'Arabic', 'English') if rng.random() < 0.5
+        else (_sentence(rng, _ENGLISH_WORDS, 3, 15), 'English', 'Arabic')
+        for _ in range(count)
+    ]
+
+def ensure_fixtures(directory=FIXTURES_DIR):
+    """Generate any missing fixture and return {name: path}."""
+    os.makedirs(directory, exist_ok=True)
+    builders = (
+        [(name, f'{name}.pdf', make_text_pdf, size) for name, size in PDF_PAGES.items()] +
+        [(name, f'{name}.pdf', make_scanned_pdf, size) for name, size in SCANNED_PDF_PAGES.items()] +
+        [(name, f'{name}.wav', make_wav, size) for name, size in AUDIO_SECONDS.items()] +
+        [(name, f'{name}.json', make_chat, size) for name, size in CHAT_ITEMS.items()]
+    )
+    paths = {}
+    for name, filename, build, size in builders:
+        path = os.path.join(directory, filename)
+        if not os.path.exists(path):
+            build(path + '.tmp', size)
+            os.replace(path + '.tmp', path)
+        paths[name] = path
+    return paths
+
+if __name__ == '__main__':
+    for name, path in ensure_fixtures().items():
+        print(f"{name:12} {os.path.getsize(path):>12,} bytes  {path}")
@@ -0,0 +1,172 @@
+"""
+Local stand-in for the Hugging Face Inference API and the OpenAI audio API.
+
+Answers the same routes the app calls, with configurable latency, error rate
+and 429 injection, so benchmarks are reproducible and cost nothing:
+
+    python -m benchmarks.mock_upstream --port 8900 --latency-ms 150 --jitter-ms 50 \\
+        --error-rate 0.01 --rate-limit-rate 0.02
+
+Then start the app with
+    HF_API_BASE_URL=http://127.0.0.1:8900 OPENAI_API_BASE_URL=http://127.0.0.1:8900
+"""
+import argparse
+import json
+import random
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Fake mp3 bytes returned per input character, so clip sizes scale with the text
+SPEECH_BYTES_PER_CHAR = 400
+SPEECH_CHUNK_SIZE = 16 * 1024
+
+class MockSettings:
+    def __init__(self, latency_ms=150, jitter_ms=50, per_item_ms=5, error_rate=0.0, rate_limit_rate=0.0,
+                 retry_after=1, seed=None):
+        """
+        Args:
+            latency_ms: Base latency of every response
+            jitter_ms: Uniform random jitter added to the base latency
+            per_item_ms: Extra latency per translated sentence (batched requests cost more)
+            error_rate: Share of requests answered with 503
+            rate_limit_rate: Share of requests answered with 429 and Retry-After
+            retry_after: Retry-After seconds sent with injected 429s
+            seed: Random seed, for repeatable error sequences
+        """
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.per_item_ms = per_item_ms
+        self.error_rate = error_rate
+        self.rate_limit_rate = rate_limit_rate
+        self.retry_after = retry_after
+        self.random = random.Random(seed)
+        self.lock = threading.Lock()
+        self.counts = {}
+
+    def count(self, key):
+        with self.lock:
+            self.counts[key] = self.counts.get(key, 0) + 1
+
+    def draw(self):
+        with self.lock:
+            return self.random.random(), self.random.uniform(0, self.jitter_ms)
+
+class MockUpstreamHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'  # Keep-alive, like the real APIs
+    settings = MockSettings()
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send_json(self, status, body, headers=None):
+        data = json.dumps(body, ensure_ascii=False).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _read_body(self):
+        length = int(self.headers.get('Content-Length') or 0)
+        return self.rfile.read(length) if length else b''
+
+    def _inject_failure(self, route):
+        """Sleep for the simulated latency and answer 429/503 when the dice say so."""
+        settings = self.settings
+        roll, jitter = settings.draw()
+        if roll < settings.rate_limit_rate:
+            settings.count(f'{route}:429')
+            self._send_json(429, {'error': 'Rate limit reached'}, {'Retry-After': str(settings.retry_after)})
+            return True
+        if roll < settings.rate_limit_rate + settings.error_rate:
+            time.sleep((settings.latency_ms + jitter) / 1000)
+            settings.count(f'{route}:503')
+            self._send_json(503, {'error': 'Model is currently loading'})
+            return True
+        time.sleep((settings.latency_ms + jitter) / 1000)
+        return False
+
+    def do_GET(self):
+        if self.path == '/stats':
+            with self.settings.lock:
+                self._send_json(200, dict(self.settings.counts))
+            return
+        self._send_json(404, {'error': 'Not found'})
+
+    def do_POST(self):
+        body = self._read_body()
+        if re.fullmatch(r'/models/[\w.-]+/[\w.-]+', self.path):
+            self._translate(body)
+        elif self.path == '/v1/audio/transcriptions':
+            self._transcribe(body)
+        elif self.path == '/v1/audio/speech':
+            self._speech(body)
+        else:
+            self._send_json(404, {'error': 'Not found'})
+
+    def _translate(self, body):
+        inputs = json.loads(body or b'{}').get('inputs', '')
+        texts = inputs if isinstance(inputs, list) else [inputs]
+        time.sleep(self.settings.per_item_ms * len(texts) / 1000)
+        if self._inject_failure('translate'):
+            return
+        self.settings.count('translate')
+        self._send_json(200, [{'translation_text': f'[mt] {text}'} for text in texts])
+
+    def _transcribe(self, body):
+        if self._inject_failure('transcribe'):
+            return
+        self.settings.count('transcribe')
+        self._send_json(200, {'text': f'mock transcript of {len(body)} bytes'})
+
+    def _speech(self, body):
+        text = json.loads(body or b'{}').get('input', '')
+        if self._inject_failure('speech'):
+            return
+        self.settings.count('speech')
+        size = max(len(text), 1) * SPEECH_BYTES_PER_CHAR
+        self.send_response(200)
+        self.send_header('Content-Type', 'audio/mpeg')
+        self.send_header('Content-Length', str(size))
+        self.end_headers()
+        # Streamed in chunks, like OpenAI's chunked speech responses
+        chunk = b'\xff\xf3' + b'\x00' * (SPEECH_CHUNK_SIZE - 2)
+        while size > 0:
+            self.wfile.write(chunk[:size])
+            size -= SPEECH_CHUNK_SIZE
+
+def make_server(host='127.0.0.1', port=8900, settings=None):
+    """Build (but don't start) a threaded mock upstream server."""
+    handler = type('ConfiguredMockUpstreamHandler', (MockUpstreamHandler,), {'settings': settings or MockSettings()})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    return server
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8900)
+    parser.add_argument('--latency-ms', type=float, default=150)
+    parser.add_argument('--jitter-ms', type=float, default=50)
+    parser.add_argument('--per-item-ms', type=float, default=5)
+    parser.add_argument('--error-rate', type=float, default=0.0)
+    parser.add_argument('--rate-limit-rate', type=float, default=0.0)
+    parser.add_argument('--retry-after', type=float, default=1)
+    parser.add_argument('--seed', type=int, default=None)
+    args = parser.parse_args()
+
+    settings = MockSettings(args.latency_ms, args.jitter_ms, args.per_item_ms, args.error_rate,
+                            args.rate_limit_rate, args.retry_after, args.seed)
+    server = make_server(args.host, args.port, settings)
+    print(f"Mock upstream listening on http://{args.host}:{server.server_address[1]}", flush=True)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,405 @@
+"""
+Benchmark runner: starts the mock upstream and the app under gunicorn, drives
+each scenario at the requested concurrency levels and reports throughput,
+p50/p99 latency and peak RSS of the server process tree.
+
+    python -m benchmarks.run                                   # every scenario at 1, 8 and 32
+    python -m benchmarks.run -s translate -s export_pdf_text -c 1 -c 16 -n 200
+    python -m benchmarks.run --output results.json
+    python -m benchmarks.run --compare results.json            # exit 1 on regressions
+    python -m benchmarks.run -s translate -c 4 --background export_pdf_table=16
+
+Latency is measured until the whole response body has been read. Caches live
+in a fresh temporary directory, so every run starts cold; pass --no-cache to
+keep them off entirely. Peak RSS is read from /proc and is only reported on Linux.
+"""
+import argparse
+import contextlib
+import json
+import math
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from itertools import count
+
+import requests
+
+from benchmarks.fixtures import ensure_fixtures, sentences
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Limits high enough that the client-side rate limiter never throttles the mock
+BENCHMARK_RATE_LIMITS = 'openai:*=1000000,huggingface:*=1000000'
+
+# Request numbers are unique for the whole run, so a later concurrency level
+# doesn't get cache hits for the texts an earlier level already sent
+_request_numbers = count()
+
+def _upload(path, field='file'):
+    with open(path, 'rb') as f:
+        return {field: (os.path.basename(path), f.read())}
+
+def _scenarios(fixtures, chat_items):
+    """Scenario name -> callable(session, base_url, i) returning a response with its body read."""
+    texts = sentences(5000)
+    with open(fixtures[chat_items], encoding='utf-8') as f:
+        chat = json.load(f)
+    uploads = {name: _upload(path) for name, path in fixtures.items() if path.endswith(('.pdf', '.wav'))}
+
+    def translate(session, base, i):
+        text, source, target = texts[i % len(texts)]
+        return session.post(f'{base}/translate', json={'text': text, 'sourceLang': source, 'targetLang': target})
+
+    def translate_batch(session, base, i):
+        batch = [texts[(i * 20 + j) % len(texts)] for j in range(20)]
+        return session.post(f'{base}/translate/batch', json={
+            'texts': [text for text, _, _ in batch], 'sourceLang': 'English', 'targetLang': 'Arabic'
+        })
+
+    def upload(route, name, params=None):
+        def run(session, base, i):
+            return session.post(f'{base}{route}', files=uploads[name], params=params)
+        return run
+
+    def tts(stream):
+        def run(session, base, i):
+            # A distinct text per request, so the audio cache doesn't answer for upstream
+            text = f"{texts[i % len(texts)][0]} ({i})"
+            return session.post(f'{base}/text-to-speech', json={'text': text, 'stream': stream})
+        return run
+
+    def export(fmt):
+        def run(session, base, i):
+            return session.post(f'{base}/export/{fmt}', json={'chat_data': chat})
+        return run
+
+    return {
+        'translate': translate,
+        'translate_batch': translate_batch,
+        'upload_pdf': upload('/upload-pdf', 'text_5p'),
+        'upload_pdf_large': upload('/upload-pdf', 'text_50p'),
+        'upload_pdf_stream': upload('/upload-pdf', 'text_50p', {'stream': '1'}),
+        'upload_pdf_scanned': upload('/upload-pdf', 'scanned_2p'),
+        'upload_audio': upload('/upload-audio', 'clip_10s', {'mode': 'single'}),
+        'upload_audio_long': upload('/upload-audio', 'clip_300s', {'mode': 'long'}),
+        'tts': tts(False),
+        'tts_stream': tts(True),
+        'export_excel': export('excel'),
+        'export_word': export('word'),
+        'export_word_text': export('word_text'),
+        'export_pdf_table': export('pdf_table'),
+        'export_pdf_text': export('pdf_text')
+    }
+
+def _process_tree(root_pid):
+    """PIDs of root_pid and all its descendants, from /proc."""
+    children = {}
+    for entry in os.listdir('/proc'):
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f'/proc/{entry}/stat') as f:
+                # The command name may contain spaces; fields after it are fixed
+                ppid = int(f.read().rsplit(')', 1)[1].split()[1])
+        except (OSError, IndexError, ValueError):
+            continue
+        children.setdefault(ppid, []).append(int(entry))
+
+    pids, stack = [], [root_pid]
+    while stack:
+        pid = stack.pop()
+        pids.append(pid)
+        stack.extend(children.get(pid, ()))
+    return pids
+
+def _rss_bytes(pid):
+    try:
+        with open(f'/proc/{pid}/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, IndexError, ValueError):
+        return 0
+
+class RssSampler:
+    """Samples the summed RSS of a process tree in the background and keeps the peak."""
+
+    def __init__(self, root_pid, interval=0.05):
+        self.root_pid = root_pid
+        self.interval = interval
+        self.peak = 0
+        self._stop = threading.Event()
+        self._thread = None
+
+    def __enter__(self):
+        self.peak = 0
+        self._stop.clear()
+        if self.root_pid and os.path.isdir('/proc'):
+            self._thread = threading.Thread(target=self._run, daemon=True)
+            self._thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self._stop.set()
+        if self._thread:
+            self._thread.join()
+
+    def _run(self):
+        while not self._stop.is_set():
+            self.peak = max(self.peak, sum(_rss_bytes(pid) for pid in _process_tree(self.root_pid)))
+            self._stop.wait(self.interval)
+
+def _percentile(values, percent):
+    """Nearest-rank percentile of a sorted list."""
+    if not values:
+        return None
+    return values[max(math.ceil(percent / 100 * len(values)) - 1, 0)]
+
+def run_level(scenario, base_url, concurrency, total, server_pid=None, timeout=300):
+    """Send `total` requests with `concurrency` in flight and summarize them."""
+    local = threading.local()
+
+    def one_request(_):
+        session = getattr(local, 'session', None)
+        if session is None:
+            session = local.session = requests.Session()
+        i = next(_request_numbers)
+        start = time.perf_counter()
+        try:
+            response = scenario(session, base_url, i)
+            # Streamed responses (NDJSON) report failures in their last line with a 200 status
+            ok = response.status_code < 400 and b'"error"' not in response.content[-512:]
+        except requests.RequestException:
+            ok = False
+        return time.perf_counter() - start, ok
+
+    with RssSampler(server_pid) as rss:
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            results = list(pool.map(one_request, range(total), timeout=timeout))
+        wall = time.perf_counter() - start
+
+    latencies = sorted(latency for latency, ok in results if ok)
+    return {
+        'concurrency': concurrency,
+        'requests': total,
+        'errors': sum(1 for _, ok in results if not ok),
+        'throughput': len(latencies) / wall if wall else 0.0,
+        'p50_ms': _percentile(latencies, 50) * 1000 if latencies else None,
+        'p99_ms': _percentile(latencies, 99) * 1000 if latencies else None,
+        'peak_rss_mb': rss.peak / (1024 * 1024) if rss.peak else None
+    }
+
+class BackgroundLoad:
+    """
+    Keeps `concurrency` requests of a scenario in flight until stopped, e.g.
+    exports saturating the server while /translate latency is measured.
+    """
+
+    def __init__(self, scenario, base_url, concurrency):
+        self.scenario = scenario
+        self.base_url = base_url
+        self.concurrency = concurrency
+        self.statuses = {}
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._threads = []
+
+    def __enter__(self):
+        for _ in range(self.concurrency):
+            thread = threading.Thread(target=self._run, daemon=True)
+            thread.start()
+            self._threads.append(thread)
+        return self
+
+    def __exit__(self, *exc_info):
+        self._stop.set()
+        for thread in self._threads:
+            thread.join()
+
+    def _run(self):
+        session = requests.Session()
+        while not self._stop.is_set():
+            try:
+                response = self.scenario(session, self.base_url, next(_request_numbers))
+                status = str(response.status_code)
+                if response.status_code == 503:
+                    # Shed requests come back at once; don't spin on them. The server drops
+                    # idle keep-alive connections meanwhile, so start on a fresh one
+                    session.close()
+                    self._stop.wait(float(response.headers.get('Retry-After', 1)))
+            except requests.RequestException as e:
+                status = type(e).__name__
+            with self._lock:
+                self.statuses[status] = self.statuses.get(status, 0) + 1
+
+def _wait_until_up(url, process, timeout=60):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process is not None and process.poll() is not None:
+            raise RuntimeError(f"{url} exited with status {process.returncode}")
+        try:
+            requests.get(url, timeout=1)
+            return
+        except requests.RequestException:
+            time.sleep(0.2)
+    raise RuntimeError(f"{url} did not come up within {timeout} s")
+
+def start_servers(args, workdir):
+    """Start the mock upstream and gunicorn; returns (base_url, [processes], gunicorn pid)."""
+    mock_url = f'http://127.0.0.1:{args.mock_port}'
+    mock = subprocess.Popen([
+        sys.executable, '-m', 'benchmarks.mock_upstream', '--port', str(args.mock_port),
+        '--latency-ms', str(args.latency_ms), '--jitter-ms', str(args.jitter_ms),
+        '--error-rate', str(args.error_rate), '--rate-limit-rate', str(args.rate_limit_rate),
+        '--seed', '0'
+    ], cwd=REPO_DIR, stdout=subprocess.DEVNULL)
+    _wait_until_up(f'{mock_url}/stats', mock)
+
+    env = dict(
+        os.environ,
+        PORT=str(args.port),
+        WEB_CONCURRENCY=str(args.workers),
+        SERVING_MODE=args.serving_mode,
+        HF_API_BASE_URL=mock_url,
+        OPENAI_API_BASE_URL=mock_url,
+        HUGGINGFACE_API_TOKEN='benchmark',
+        OPENAI_API_KEY='benchmark',
+        RATE_LIMITS=BENCHMARK_RATE_LIMITS,
+        RATE_LIMIT_PATH=os.path.join(workdir, 'rate_limits.sqlite3'),
+        TRANSLATION_MEMORY_PATH=os.path.join(workdir, 'translation_memory.sqlite3'),
+        EXTRACTION_CACHE_PATH=os.path.join(workdir, 'extraction_cache.sqlite3'),
+        TTS_CACHE_DIR=os.path.join(workdir, 'tts'),
+        EXPORT_JOBS_DIR=os.path.join(workdir, 'exports'),
+        PROMETHEUS_MULTIPROC_DIR=os.path.join(workdir, 'metrics'),
+        COALESCING_LOCK_DIR=os.path.join(workdir, 'locks'),
+        ADMISSION_LOCK_DIR=os.path.join(workdir, 'admission'),
+        LOG_LEVEL='WARNING',
+        FLASK_ENV='production'
+    )
+    if args.no_cache:
+        env.update(TRANSLATION_MEMORY_ENABLED='false', EXTRACTION_CACHE_ENABLED='false', TTS_CACHE_ENABLED='false')
+
+    # Worker timeouts would hide slow scenarios behind 502s; the runner has its own timeout
+    app = subprocess.Popen(
+        [sys.executable, '-m', 'gunicorn', 'app:app', '-c', 'gunicorn.conf.py', '--timeout', '600',
+         '--access-logfile', '/dev/null'],
+        cwd=REPO_DIR, env=env, stdout=subprocess.DEVNULL
+    )
+    base_url = f'http://127.0.0.1:{args.port}'
+    try:
+        _wait_until_up(f'{base_url}/metrics', app)
+    except RuntimeError:
+        mock.terminate()
+        raise
+    return base_url, [app, mock], app.pid
+
+def compare(results, baseline, tolerance):
+    """Regressions of results against a baseline run, as readable strings."""
+    previous = {(entry['scenario'], entry['concurrency']): entry for entry in baseline['results']}
+    regressions = []
+    for entry in results:
+        before = previous.get((entry['scenario'], entry['concurrency']))
+        if not before:
+            continue
+        label = f"{entry['scenario']} @ {entry['concurrency']}"
+        for key in ('p50_ms', 'p99_ms', 'peak_rss_mb'):
+            if before[key] and entry[key] and entry[key] > before[key] * (1 + tolerance):
+                regressions.append(f"{label}: {key} {before[key]:.1f} -> {entry[key]:.1f}")
+        if before['throughput'] and entry['throughput'] < before['throughput'] * (1 - tolerance):
+            regressions.append(f"{label}: throughput {before['throughput']:.2f} -> {entry['throughput']:.2f} req/s")
+        if entry['errors'] > before['errors']:
+            regressions.append(f"{label}: errors {before['errors']} -> {entry['errors']}")
+    return regressions
+
+def _format(value, pattern):
+    return pattern.format(value) if value is not None else '-'
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('-s', '--scenario', action='append', help='Scenario to run (repeatable, default: all)')
+    parser.add_argument('-c', '--concurrency', action='append', type=int, help='Concurrency level (repeatable, default: 1, 8, 32)')
+    parser.add_argument('-n', '--requests', type=int, default=50, help='Requests per scenario and concurrency level')
+    parser.add_argument('--chat', default='chat_500', choices=['chat_10', 'chat_500', 'chat_5000'],
+                        help='Chat history posted to the export scenarios')
+    parser.add_argument('--app-url', help='Benchmark an already running app instead of starting one')
+    parser.add_argument('--server-pid', type=int, help='PID whose process tree is sampled for RSS with --app-url')
+    parser.add_argument('--port', type=int, default=8901)
+    parser.add_argument('--mock-port', type=int, default=8900)
+    parser.add_argument('--workers', type=int, default=2, help='gunicorn workers (WEB_CONCURRENCY)')
+    parser.add_argument('--serving-mode', default='sync', choices=['sync', 'async'])
+    parser.add_argument('--latency-ms', type=float, default=150, help='Mock upstream base latency')
+    parser.add_argument('--jitter-ms', type=float, default=50, help='Mock upstream latency jitter')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='Share of upstream requests failing with 503')
+    parser.add_argument('--rate-limit-rate', type=float, default=0.0, help='Share of upstream requests failing with 429')
+    parser.add_argument('--no-cache', action='store_true', help='Disable translation memory, extraction and TTS caches')
+    parser.add_argument('--background', metavar='SCENARIO=CONCURRENCY',
+                        help='Keep this load running while measuring, e.g. export_pdf_table=16')
+    parser.add_argument('--output', help='Write results as JSON to this file')
+    parser.add_argument('--compare', help='Baseline JSON from an earlier --output run')
+    parser.add_argument('--tolerance', type=float, default=0.15, help='Allowed relative regression against --compare')
+    args = parser.parse_args()
+
+    fixtures = ensure_fixtures()
+    scenarios = _scenarios(fixtures, args.chat)
+    names = args.scenario or list(scenarios)
+    unknown = [name for name in names if name not in scenarios]
+    if unknown:
+        parser.error(f"unknown scenario(s): {', '.join(unknown)}; choose from {', '.join(scenarios)}")
+    levels = args.concurrency or [1, 8, 32]
+    background = None
+    if args.background:
+        background_name, _, background_concurrency = args.background.partition('=')
+        if background_name not in scenarios:
+            parser.error(f"unknown background scenario {background_name}")
+        background = (scenarios[background_name], int(background_concurrency or 8))
+
+    workdir = tempfile.mkdtemp(prefix='ai-translator-bench-')
+    processes = []
+    try:
+        if args.app_url:
+            base_url, server_pid = args.app_url.rstrip('/'), args.server_pid
+        else:
+            base_url, processes, server_pid = start_servers(args, workdir)
+
+        load = BackgroundLoad(background[0], base_url, background[1]) if background else contextlib.nullcontext()
+        results = []
+        print(f"{'scenario':22} {'conc':>5} {'req/s':>9} {'p50 ms':>9} {'p99 ms':>9} {'errors':>7} {'peak RSS MB':>12}")
+        with load:
+            for name in names:
+                for concurrency in levels:
+                    result = dict(scenario=name, **run_level(scenarios[name], base_url, concurrency, args.requests, server_pid))
+                    results.append(result)
+                    print(f"{name:22} {concurrency:>5} {result['throughput']:>9.2f} "
+                          f"{_format(result['p50_ms'], '{:.1f}'):>9} {_format(result['p99_ms'], '{:.1f}'):>9} "
+                          f"{result['errors']:>7} {_format(result['peak_rss_mb'], '{:.0f}'):>12}", flush=True)
+        if background:
+            print(f"background {args.background}: responses by status {dict(sorted(load.statuses.items()))}")
+    finally:
+        for process in processes:
+            process.terminate()
+            process.wait(timeout=30)
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    report = {
+        'created': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime()),
+        'settings': {key: value for key, value in vars(args).items() if key not in ('output', 'compare')},
+        'results': results
+    }
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+
+    if args.compare:
+        with open(args.compare, encoding='utf-8') as f:
+            regressions = compare(results, json.load(f), args.tolerance)
+        for regression in regressions:
+            print(f"REGRESSION {regression}")
+        if regressions:
+            sys.exit(1)
+
+if __name__ == '__main__':
+    main()
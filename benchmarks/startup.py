@@ -0,0 +1,148 @@
+"""
+Startup benchmark: how long a fresh process takes to import the app, which
+heavy libraries that import pulls in, and what each gunicorn worker costs in
+memory with and without PRELOAD_APP.
+
+    python -m benchmarks.startup
+    python -m benchmarks.startup --workers 4 --serving-mode async --output startup.json
+
+Memory is read from /proc/<pid>/smaps_rollup after every worker has served a
+translation and an export. RSS counts shared pages in full, PSS splits them
+between the processes sharing them and USS is what a worker alone holds;
+preloading shows up as lower USS per worker. Memory is only reported on Linux.
+"""
+import argparse
+import json
+import os
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+import requests
+
+from benchmarks.fixtures import ensure_fixtures
+from benchmarks.run import REPO_DIR, _process_tree, start_servers
+
+# Libraries the lazy imports keep out of a worker until a request needs them
+HEAVY_MODULES = ['reportlab', 'docx', 'PyPDF2', 'openai', 'arabic_reshaper', 'bidi', 'pdf2image', 'pytesseract']
+
+_IMPORT_PROBE = f"""
+import json, sys, time
+start = time.perf_counter()
+import app
+elapsed = time.perf_counter() - start
+print(json.dumps({{'seconds': elapsed, 'loaded': [m for m in {HEAVY_MODULES!r} if m in sys.modules]}}))
+"""
+
+def measure_import(runs, preload=False):
+    """Median seconds to import app in a fresh interpreter, and the heavy modules it loaded."""
+    env = dict(os.environ, PRELOAD_APP='true' if preload else 'false', LOG_LEVEL='WARNING',
+               PROMETHEUS_MULTIPROC_DIR=tempfile.mkdtemp(prefix='ai-translator-startup-'))
+    timings, loaded = [], []
+    try:
+        for _ in range(runs):
+            output = subprocess.run([sys.executable, '-c', _IMPORT_PROBE], cwd=REPO_DIR, env=env,
+                                    capture_output=True, text=True, check=True).stdout
+            result = json.loads(output.strip().splitlines()[-1])
+            timings.append(result['seconds'])
+            loaded = result['loaded']
+    finally:
+        shutil.rmtree(env['PROMETHEUS_MULTIPROC_DIR'], ignore_errors=True)
+    return statistics.median(timings), loaded
+
+def _smaps(pid):
+    """RSS, PSS and USS of a process in bytes, from /proc/<pid>/smaps_rollup."""
+    fields = {}
+    try:
+        with open(f'/proc/{pid}/smaps_rollup') as f:
+            for line in f:
+                parts = line.split()
+                if len(parts) == 3 and parts[2] == 'kB':
+                    fields[parts[0].rstrip(':')] = int(parts[1]) * 1024
+    except OSError:
+        return None
+    return {
+        'rss': fields.get('Rss', 0),
+        'pss': fields.get('Pss', 0),
+        'uss': fields.get('Private_Clean', 0) + fields.get('Private_Dirty', 0)
+    }
+
+def measure_serving(args, preload, chat):
+    """Time until gunicorn answers, first-request latencies and per-process memory once warm."""
+    os.environ['PRELOAD_APP'] = 'true' if preload else 'false'
+    workdir = tempfile.mkdtemp(prefix='ai-translator-startup-')
+    processes = []
+    try:
+        started = time.perf_counter()
+        base_url, processes, master_pid = start_servers(args, workdir)
+        ready = time.perf_counter() - started
+
+        session = requests.Session()
+        first = {}
+        for name, path, body in [('translate', '/translate', {'text': 'Good morning', 'sourceLang': 'English', 'targetLang': 'Arabic'}),
+                                 ('export_pdf_table', '/export/pdf_table', {'chat_data': chat})]:
+            start = time.perf_counter()
+            session.post(f'{base_url}{path}', json=body).content
+            first[name] = time.perf_counter() - start
+
+        # New connections spread over the workers, so each of them ends up having served both routes
+        for i in range(args.workers * 8):
+            requests.post(f'{base_url}/translate', json={'text': f'Warm up {i}', 'sourceLang': 'English', 'targetLang': 'Arabic'})
+            requests.post(f'{base_url}/export/pdf_table', json={'chat_data': chat}).content
+
+        workers = [pid for pid in _process_tree(master_pid) if pid != master_pid]
+        memory = {'master': _smaps(master_pid), 'workers': [m for m in map(_smaps, workers) if m]}
+    finally:
+        for process in processes:
+            process.terminate()
+            process.wait(timeout=30)
+        shutil.rmtree(workdir, ignore_errors=True)
+    return {'ready_seconds': ready, 'first_request_seconds': first, 'memory': memory}
+
+def _mb(value):
+    return f"{value / 1024 / 1024:.1f}" if value is not None else '-'
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--runs', type=int, default=5, help='Fresh interpreters timed per import measurement')
+    parser.add_argument('--port', type=int, default=8901)
+    parser.add_argument('--mock-port', type=int, default=8900)
+    parser.add_argument('--workers', type=int, default=2, help='gunicorn workers (WEB_CONCURRENCY)')
+    parser.add_argument('--serving-mode', default='sync', choices=['sync', 'async'])
+    parser.add_argument('--output', help='Write results as JSON to this file')
+    args = parser.parse_args()
+    # start_servers expects the mock upstream and cache settings of benchmarks.run
+    args.latency_ms, args.jitter_ms, args.error_rate, args.rate_limit_rate, args.no_cache = 20, 0, 0.0, 0.0, True
+
+    with open(ensure_fixtures()['chat_500'], encoding='utf-8') as f:
+        chat = json.load(f)
+
+    report = {'settings': vars(args), 'import': {}, 'serving': {}}
+    print(f"{'import app':16} {'ms':>8}  heavy modules loaded")
+    for label, preload in [('lazy', False), ('preload', True)]:
+        seconds, loaded = measure_import(args.runs, preload)
+        report['import'][label] = {'seconds': seconds, 'loaded': loaded}
+        print(f"{label:16} {seconds * 1000:>8.0f}  {', '.join(loaded) or '-'}", flush=True)
+
+    print(f"\n{'gunicorn':16} {'ready s':>8} {'1st translate ms':>17} {'1st export ms':>14} "
+          f"{'worker RSS MB':>14} {'worker PSS MB':>14} {'worker USS MB':>14} {'total PSS MB':>13}")
+    for label, preload in [('default', False), ('preload_app', True)]:
+        result = measure_serving(args, preload, chat)
+        report['serving'][label] = result
+        workers = result['memory']['workers']
+        master = result['memory']['master']
+        mean = {key: statistics.mean(w[key] for w in workers) if workers else None for key in ('rss', 'pss', 'uss')}
+        total_pss = sum(w['pss'] for w in workers) + master['pss'] if workers and master else None
+        print(f"{label:16} {result['ready_seconds']:>8.2f} {result['first_request_seconds']['translate'] * 1000:>17.0f} "
+              f"{result['first_request_seconds']['export_pdf_table'] * 1000:>14.0f} {_mb(mean['rss']):>14} "
+              f"{_mb(mean['pss']):>14} {_mb(mean['uss']):>14} {_mb(total_pss):>13}", flush=True)
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+
+if __name__ == '__main__':
+    main()
@@ -3,10 +3,148 @@ import os
 class Config:
     UPLOAD_FOLDER = 'uploads'
     MAX_CONTENT_LENGTH = 16 * 1024 * 1024  # 16MB max file size
+    UPLOAD_SPOOL_MAX_MEMORY = int(os.getenv('UPLOAD_SPOOL_MAX_MEMORY', 4 * 1024 * 1024))  # Larger uploads spill to a temp file
+    
+    # gunicorn preload_app: load the app and warm the export stack once in the master,
+    # workers share it copy-on-write instead of each importing it on first use
+    PRELOAD_APP = os.getenv('PRELOAD_APP', 'false').lower() == 'true'
+    
+    # Admission control per route class (interactive: /translate and /text-to-speech, batch: the
+    # /translate/batch page batches of PDF uploads, upload, export):
+    # concurrent requests across all workers, requests allowed to wait, and seconds they may wait.
+    # A waiting request holds its worker in the sync serving mode, so heavy routes don't queue there
+    # and leave the other workers to /translate.
+    SERVING_MODE = os.getenv('SERVING_MODE', 'sync')
+    WORKER_TIMEOUT = float(os.getenv('WORKER_TIMEOUT', 180 if SERVING_MODE == 'async' else 30))  # As in gunicorn.conf.py
+    ADMISSION_CONTROL_ENABLED = os.getenv('ADMISSION_CONTROL_ENABLED', 'true').lower() == 'true'
+    ADMISSION_CONCURRENCY = os.getenv('ADMISSION_CONCURRENCY', 'interactive=256,batch=16,upload=4,export=2' if SERVING_MODE == 'async'
+                                      else 'interactive=64,batch=1,upload=1,export=1')
+    ADMISSION_QUEUE = os.getenv('ADMISSION_QUEUE', 'interactive=512,batch=64,upload=16,export=16' if SERVING_MODE == 'async'
+                                else 'interactive=64,batch=0,upload=0,export=0')
+    ADMISSION_TIMEOUT = os.getenv('ADMISSION_TIMEOUT', 'interactive=5,batch=30,upload=30,export=30')
+    ADMISSION_RETRY_AFTER = int(os.getenv('ADMISSION_RETRY_AFTER', 2))  # Seconds sent with 503s
+    ADMISSION_LOCK_DIR = os.getenv('ADMISSION_LOCK_DIR', os.path.join('cache', 'admission'))
+    
+    # Logging: 'json' (structured, one object per line) or 'text'
+    LOG_LEVEL = os.getenv('LOG_LEVEL', 'INFO')
+    LOG_FORMAT = os.getenv('LOG_FORMAT', 'json')
     
     # API Keys for online services (use environment variables for security)
     HUGGINGFACE_API_TOKEN = os.getenv('HUGGINGFACE_API_TOKEN')
     OPENAI_API_KEY = os.getenv('OPENAI_API_KEY')
     
+    # Translation backend: 'huggingface_api' (Inference API) or 'local' (CTranslate2 on the CPU)
+    TRANSLATION_BACKEND = os.getenv('TRANSLATION_BACKEND', 'huggingface_api')
+    LOCAL_MODEL_DIR = os.getenv('LOCAL_MODEL_DIR', 'local_models')  # Converted opus-mt models, one directory each
+    LOCAL_TRANSLATION_COMPUTE_TYPE = os.getenv('LOCAL_TRANSLATION_COMPUTE_TYPE', 'int8')
+    LOCAL_TRANSLATION_BEAM_SIZE = int(os.getenv('LOCAL_TRANSLATION_BEAM_SIZE', 2))  # 1 = greedy, fastest
+    LOCAL_TRANSLATION_MAX_LENGTH = int(os.getenv('LOCAL_TRANSLATION_MAX_LENGTH', 256))
+    LOCAL_TRANSLATION_THREADS = int(os.getenv('LOCAL_TRANSLATION_THREADS', 0))  # 0 = CTranslate2 default
+    LOCAL_TRANSLATION_BATCH_SIZE = int(os.getenv('LOCAL_TRANSLATION_BATCH_SIZE', 16))
+    LOCAL_TRANSLATION_BATCH_WAIT_MS = int(os.getenv('LOCAL_TRANSLATION_BATCH_WAIT_MS', 10))  # Time a request waits for others to batch with (async mode)
+    
+    # Upstream API base URLs (point them at benchmarks/mock_upstream.py for load tests)
+    HF_API_BASE_URL = os.getenv('HF_API_BASE_URL', 'https://api-inference.huggingface.co').rstrip('/')
+    OPENAI_API_BASE_URL = os.getenv('OPENAI_API_BASE_URL', 'https://api.openai.com').rstrip('/')
+    
+    # Pooled upstream HTTP client: per-endpoint pool sizes, read timeouts and retry policy
+    HF_POOL_SIZE = int(os.getenv('HF_POOL_SIZE', 10))
+    HF_TIMEOUT = float(os.getenv('HF_TIMEOUT', 30))
+    OPENAI_POOL_SIZE = int(os.getenv('OPENAI_POOL_SIZE', 10))
+    OPENAI_TIMEOUT = float(os.getenv('OPENAI_TIMEOUT', 60))
+    UPSTREAM_CONNECT_TIMEOUT = float(os.getenv('UPSTREAM_CONNECT_TIMEOUT', 5))
+    UPSTREAM_MAX_RETRIES = int(os.getenv('UPSTREAM_MAX_RETRIES', 3))
+    
+    # Circuit breaker per upstream endpoint and model: fail fast after this many consecutive failures
+    CIRCUIT_BREAKER_ENABLED = os.getenv('CIRCUIT_BREAKER_ENABLED', 'true').lower() == 'true'
+    CIRCUIT_BREAKER_FAILURES = int(os.getenv('CIRCUIT_BREAKER_FAILURES', 5))
+    CIRCUIT_BREAKER_RESET_SECONDS = float(os.getenv('CIRCUIT_BREAKER_RESET_SECONDS', 30))  # Open for this long, then one probe
+    TRANSLATION_FALLBACK_ENABLED = os.getenv('TRANSLATION_FALLBACK_ENABLED', 'true').lower() == 'true'  # Alternate model while a breaker is open
+    
+    # Hedged translation requests: send a duplicate when a response is slower than the model's recent p95
+    HEDGING_ENABLED = os.getenv('HEDGING_ENABLED', 'true').lower() == 'true'
+    HEDGE_QUANTILE = float(os.getenv('HEDGE_QUANTILE', 0.95))
+    HEDGE_MIN_DELAY_MS = int(os.getenv('HEDGE_MIN_DELAY_MS', 50))
+    HEDGE_MAX_RATIO = float(os.getenv('HEDGE_MAX_RATIO', 0.1))  # At most this share of requests is duplicated
+    HEDGE_MIN_SAMPLES = int(os.getenv('HEDGE_MIN_SAMPLES', 20))  # Latencies observed before hedging starts
+    
+    # Client-side rate limits shared by all workers, in requests per minute per "endpoint:model"
+    RATE_LIMIT_ENABLED = os.getenv('RATE_LIMIT_ENABLED', 'true').lower() == 'true'
+    RATE_LIMIT_PATH = os.getenv('RATE_LIMIT_PATH', os.path.join('cache', 'rate_limits.sqlite3'))
+    RATE_LIMITS = os.getenv('RATE_LIMITS', 'openai:whisper-1=50,openai:tts-1=10,openai:tts-1-hd=10,huggingface:*=300')
+    RATE_LIMIT_BURST_SECONDS = float(os.getenv('RATE_LIMIT_BURST_SECONDS', 10))  # Bucket size in seconds of traffic
+    RATE_LIMIT_BULK_RESERVE = float(os.getenv('RATE_LIMIT_BULK_RESERVE', 0.2))  # Share kept for interactive requests
+    # Longest queueing per upstream call, kept well under the worker timeout so a shed call still
+    # leaves the request time to answer (5 s and 10 s in the sync serving mode)
+    RATE_LIMIT_MAX_WAIT = float(os.getenv('RATE_LIMIT_MAX_WAIT', WORKER_TIMEOUT / 6))  # Interactive requests
+    RATE_LIMIT_BULK_MAX_WAIT = float(os.getenv('RATE_LIMIT_BULK_MAX_WAIT', WORKER_TIMEOUT / 3))
+    
+    # Long audio: split into overlapping segments and transcribe them in parallel
+    LONG_AUDIO_SEGMENT_SECONDS = int(os.getenv('LONG_AUDIO_SEGMENT_SECONDS', 120))
+    LONG_AUDIO_OVERLAP_SECONDS = float(os.getenv('LONG_AUDIO_OVERLAP_SECONDS', 2))
+    LONG_AUDIO_MAX_PARALLEL = int(os.getenv('LONG_AUDIO_MAX_PARALLEL', 4))
+    LONG_AUDIO_AUTO_BYTES = int(os.getenv('LONG_AUDIO_AUTO_BYTES', 5 * 1024 * 1024))  # Larger uploads use long mode automatically
+    
+    # Streaming text-to-speech: characters per upstream request and segments synthesized ahead
+    TTS_STREAM_SEGMENT_CHARS = int(os.getenv('TTS_STREAM_SEGMENT_CHARS', 1000))
+    TTS_STREAM_MAX_PARALLEL = int(os.getenv('TTS_STREAM_MAX_PARALLEL', 3))
+    
+    # Synthesized speech cache (files on local disk, shared by all workers)
+    TTS_CACHE_ENABLED = os.getenv('TTS_CACHE_ENABLED', 'true').lower() == 'true'
+    TTS_CACHE_DIR = os.getenv('TTS_CACHE_DIR', os.path.join('cache', 'tts'))
+    TTS_CACHE_TTL = int(os.getenv('TTS_CACHE_TTL', 90 * 24 * 3600))  # 90 days
+    TTS_CACHE_MAX_BYTES = int(os.getenv('TTS_CACHE_MAX_BYTES', 1024 * 1024 * 1024))
+    
+    # Longest segment sent to a translation model as one input, in estimated tokens
+    # (opus-mt truncates at 512 and quality drops well before that)
+    SEGMENT_MAX_TOKENS = int(os.getenv('SEGMENT_MAX_TOKENS', 200))
+    
+    # Batch translation: how many sentences / estimated tokens go into one upstream request
+    TRANSLATION_BATCH_MAX_ITEMS = int(os.getenv('TRANSLATION_BATCH_MAX_ITEMS', 16))
+    TRANSLATION_BATCH_MAX_TOKENS = int(os.getenv('TRANSLATION_BATCH_MAX_TOKENS', 1200))
+    
+    # Identical in-flight /translate and /text-to-speech calls share one upstream request;
+    # across workers through lock files (not on Windows) and the shared caches
+    COALESCING_ENABLED = os.getenv('COALESCING_ENABLED', 'true').lower() == 'true'
+    COALESCING_LOCK_DIR = os.getenv('COALESCING_LOCK_DIR', os.path.join('cache', 'locks'))
+    COALESCING_LOCK_TIMEOUT = float(os.getenv('COALESCING_LOCK_TIMEOUT', 5))  # Longest wait for another worker's call (~upstream p99)
+    
+    # Micro-batching of concurrent /translate requests into one upstream call per model. Only used
+    # with SERVING_MODE=async: a sync worker serves one request at a time, so its batches never grow
+    TRANSLATION_MICROBATCH_ENABLED = os.getenv('TRANSLATION_MICROBATCH_ENABLED', 'true').lower() == 'true'
+    TRANSLATION_MICROBATCH_MAX_ITEMS = int(os.getenv('TRANSLATION_MICROBATCH_MAX_ITEMS', 8))
+    TRANSLATION_MICROBATCH_WAIT_MS = int(os.getenv('TRANSLATION_MICROBATCH_WAIT_MS', 10))
+    TRANSLATION_MICROBATCH_CONCURRENCY = int(os.getenv('TRANSLATION_MICROBATCH_CONCURRENCY', 8))  # Batches in flight per model
+    
+    # OCR for scanned PDFs: 'fast' (150 dpi), 'balanced' (200 dpi) or 'accurate' (300 dpi)
+    OCR_PROFILE = os.getenv('OCR_PROFILE', 'accurate')
+    OCR_LANG = os.getenv('OCR_LANG', 'ara+eng')
+    OCR_WORKERS = int(os.getenv('OCR_WORKERS', 0)) or None  # Defaults to the host's CPU count
+    
+    # PDF extraction results cached by content hash, shared by all workers
+    EXTRACTION_CACHE_ENABLED = os.getenv('EXTRACTION_CACHE_ENABLED', 'true').lower() == 'true'
+    EXTRACTION_CACHE_PATH = os.getenv('EXTRACTION_CACHE_PATH', os.path.join('cache', 'extraction_cache.sqlite3'))
+    EXTRACTION_CACHE_TTL = int(os.getenv('EXTRACTION_CACHE_TTL', 30 * 24 * 3600))  # 30 days
+    EXTRACTION_CACHE_MAX_BYTES = int(os.getenv('EXTRACTION_CACHE_MAX_BYTES', 512 * 1024 * 1024))
+    
+    # Translation memory shared by all workers (SQLite file on local disk)
+    TRANSLATION_MEMORY_ENABLED = os.getenv('TRANSLATION_MEMORY_ENABLED', 'true').lower() == 'true'
+    TRANSLATION_MEMORY_PATH = os.getenv('TRANSLATION_MEMORY_PATH', os.path.join('cache', 'translation_memory.sqlite3'))
+    TRANSLATION_MEMORY_TTL = int(os.getenv('TRANSLATION_MEMORY_TTL', 30 * 24 * 3600))  # 30 days
+    TRANSLATION_MEMORY_MAX_ENTRIES = int(os.getenv('TRANSLATION_MEMORY_MAX_ENTRIES', 200000))
+    TRANSLATION_MEMORY_MAX_BYTES = int(os.getenv('TRANSLATION_MEMORY_MAX_BYTES', 256 * 1024 * 1024))
+    TRANSLATION_MEMORY_WARM_FILE = os.getenv('TRANSLATION_MEMORY_WARM_FILE')  # Optional JSON seed file
+    
+    # Background export jobs: rendered files are kept on local disk until they expire
+    EXPORT_JOBS_DIR = os.getenv('EXPORT_JOBS_DIR', os.path.join('cache', 'exports'))
+    EXPORT_JOB_TTL = int(os.getenv('EXPORT_JOB_TTL', 3600))  # 1 hour
+    EXPORT_JOBS_MAX_BYTES = int(os.getenv('EXPORT_JOBS_MAX_BYTES', 1024 * 1024 * 1024))
+    EXPORT_WORKERS = int(os.getenv('EXPORT_WORKERS', 2))  # Render processes per web worker
+    EXPORT_JOB_STALE_SECONDS = int(os.getenv('EXPORT_JOB_STALE_SECONDS', 600))  # Unfinished jobs without progress for this long are retried
+    # Progress events (/export/jobs/<id>/events) hold a connection for the life of the job, which would tie up
+    # a whole sync worker; they are only offered with SERVING_MODE=async, and other clients poll the job
+    EXPORT_EVENTS_ENABLED = SERVING_MODE == 'async'
+    EXPORT_EVENTS_MAX_SECONDS = float(os.getenv('EXPORT_EVENTS_MAX_SECONDS', 120))  # Clients reconnect after this
+    
     # Legacy cache directory (no longer needed for online APIs)
     # CACHE_DIR = r"C:\Users\hesha\.cache\huggingface\hub"
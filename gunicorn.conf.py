@@ -1,20 +1,69 @@
 import os
+import tempfile
 
 # Server socket
 bind = f"0.0.0.0:{os.environ.get('PORT', 5000)}"
 backlog = 2048
 
+# Serving mode:
+#   sync  - one request per worker process (default)
+#   async - cooperative gevent workers; upstream API calls yield instead of blocking,
+#           so one process holds hundreds of in-flight requests. CPU-heavy work
+#           (exports, PDF parsing, OCR) is pushed to a native thread pool by
+#           services.executor.run_blocking.
+serving_mode = os.environ.get('SERVING_MODE', 'sync')
+
 # Worker processes
-workers = 2
-worker_class = "sync"
-worker_connections = 1000
-timeout = 30
+workers = int(os.environ.get('WEB_CONCURRENCY', 2))
+if serving_mode == 'async':
+    worker_class = "gevent"
+    worker_connections = int(os.environ.get('WORKER_CONNECTIONS', 1000))
+    # Whisper/TTS calls may take 60 s plus backoff; don't kill them mid-flight
+    timeout = int(os.environ.get('WORKER_TIMEOUT', 180))
+else:
+    worker_class = "sync"
+    worker_connections = 1000
+    timeout = int(os.environ.get('WORKER_TIMEOUT', 30))
 keepalive = 2
 
+# Preload: import the app once in the master and fork workers from it, so the
+# export stack, fonts and compiled regexes are loaded once and shared
+# copy-on-write. Connections, sessions, pools and batcher threads are per process
+# and reopened in each worker on first use.
+preload_app = os.environ.get('PRELOAD_APP', 'false').lower() == 'true'
+if preload_app and serving_mode == 'async':
+    # The app is imported before the gevent worker patches itself; patch first so
+    # the locks and sockets it creates in the master are cooperative ones
+    from gevent import monkey
+    monkey.patch_all()
+
 # Restart workers after this many requests, to help prevent memory leaks
 max_requests = 1000
 max_requests_jitter = 100
 
+# Prometheus metrics are written per process to this directory and merged by /metrics.
+# It must be set before any worker imports prometheus_client.
+metrics_dir = os.environ.setdefault(
+    'PROMETHEUS_MULTIPROC_DIR', os.path.join(tempfile.gettempdir(), 'ai-translator-metrics')
+)
+
+# Imported up front: child_exit runs inside the SIGCHLD handler, where a first
+# import can interleave with one already in progress and fail
+from prometheus_client import multiprocess
+
+# Must exist before a preloaded app creates its metrics in the master
+os.makedirs(metrics_dir, exist_ok=True)
+
+def on_starting(server):
+    # Values left over from a previous run would be merged into the new one; keep
+    # the master's own files, which a preloaded app has already opened
+    for name in os.listdir(metrics_dir):
+        if not name.endswith(f"_{os.getpid()}.db"):
+            os.remove(os.path.join(metrics_dir, name))
+
+def child_exit(server, worker):
+    multiprocess.mark_process_dead(worker.pid)
+
 # Logging
 loglevel = "info"
 accesslog = "-"
@@ -26,4 +75,4 @@ proc_name = "ai-translator"
 # Security
 limit_request_line = 4094
 limit_request_fields = 100
-limit_request_field_size = 8190 
\ No newline at end of file
+limit_request_field_size = 8190 
@@ -1,7 +1,16 @@
 import requests
-import openai
+import logging
 from typing import Optional
 import os
+from config import Config
+from services.cache_service import TranslationMemory, AudioCache
+from models.upstream_client import UpstreamClient, RateLimitError, CircuitOpenError
+from models.rate_limiter import RateLimiter, parse_rate_limits
+from services.coalescing import SingleFlight
+from services.translation_service import hf_model_name, TranslationBatcher
+from services.local_translation import LocalTranslator, LOCAL_MODELS
+
+logger = logging.getLogger(__name__)
 
 class AIModels:
     def __init__(self, hf_api_token: Optional[str] = None, openai_api_key: Optional[str] = None):
@@ -17,28 +26,187 @@ class AIModels:
         
         # Use better quality Helsinki-NLP models for translation
         self.translation_models = {
-            "en_to_ar": "https://api-inference.huggingface.co/models/Helsinki-NLP/opus-mt-tc-big-en-ar",  # UPGRADED: Better quality model
-            "ar_to_en": "https://api-inference.huggingface.co/models/Helsinki-NLP/opus-mt-ar-en"
+            "en_to_ar": f"{Config.HF_API_BASE_URL}/models/Helsinki-NLP/opus-mt-tc-big-en-ar",  # UPGRADED: Better quality model
+            "ar_to_en": f"{Config.HF_API_BASE_URL}/models/Helsinki-NLP/opus-mt-ar-en"
         }
         
+        # Alternates used while the primary model's circuit breaker is open
+        self.fallback_translation_models = {}
+        if Config.TRANSLATION_FALLBACK_ENABLED:
+            self.fallback_translation_models = {
+                "en_to_ar": [f"{Config.HF_API_BASE_URL}/models/Helsinki-NLP/opus-mt-en-ar"],
+                "ar_to_en": [f"{Config.HF_API_BASE_URL}/models/Helsinki-NLP/opus-mt-tc-big-ar-en"]
+            }
+        
+        # Optional in-process CPU backend, loaded once per worker
+        self.translation_backend = Config.TRANSLATION_BACKEND
+        self.local_translator = None
+        if self.translation_backend == 'local':
+            self.local_translator = LocalTranslator(
+                Config.LOCAL_MODEL_DIR,
+                beam_size=Config.LOCAL_TRANSLATION_BEAM_SIZE,
+                max_length=Config.LOCAL_TRANSLATION_MAX_LENGTH,
+                compute_type=Config.LOCAL_TRANSLATION_COMPUTE_TYPE,
+                threads=Config.LOCAL_TRANSLATION_THREADS,
+                max_batch_size=Config.LOCAL_TRANSLATION_BATCH_SIZE,
+                max_wait=Config.LOCAL_TRANSLATION_BATCH_WAIT_MS / 1000,
+                batching=Config.SERVING_MODE == 'async'
+            )
+            # CTranslate2 models are not fork-safe: under preload_app each worker loads
+            # them on its first request instead of inheriting them from the master
+            for direction in ([] if Config.PRELOAD_APP else LOCAL_MODELS):
+                try:
+                    self.local_translator.load(direction)
+                except Exception as e:
+                    logger.error("Failed to load local translation model (%s): %s", direction, e)
+        
         # OpenAI settings for Whisper
         self.openai_api_key = openai_api_key or os.getenv('OPENAI_API_KEY')
         
         if self.hf_api_token:
-            print(f"AI Models initialized for online inference.")
-            print(f"Hugging Face API token loaded: {self.hf_api_token[:8]}...")
+            logger.info("AI Models initialized for online inference.")
+            logger.info("Hugging Face API token loaded: %s...", self.hf_api_token[:8])
         
         if self.openai_api_key:
-            print(f"OpenAI API key loaded: {self.openai_api_key[:8]}...")
+            logger.info("OpenAI API key loaded: %s...", self.openai_api_key[:8])
+        
+        # Token buckets shared by all workers, consulted before every upstream call
+        self.rate_limiter = None
+        if Config.RATE_LIMIT_ENABLED:
+            self.rate_limiter = RateLimiter(
+                Config.RATE_LIMIT_PATH,
+                parse_rate_limits(Config.RATE_LIMITS),
+                burst_seconds=Config.RATE_LIMIT_BURST_SECONDS,
+                bulk_reserve=Config.RATE_LIMIT_BULK_RESERVE,
+                max_wait=Config.RATE_LIMIT_MAX_WAIT,
+                bulk_max_wait=Config.RATE_LIMIT_BULK_MAX_WAIT
+            )
+        
+        # One pooled keep-alive client per worker for every upstream API call
+        self.http_client = UpstreamClient(
+            endpoints={
+                'huggingface': {
+                    'base_url': Config.HF_API_BASE_URL,
+                    'pool_size': Config.HF_POOL_SIZE,
+                    'timeout': (Config.UPSTREAM_CONNECT_TIMEOUT, Config.HF_TIMEOUT)
+                },
+                'openai': {
+                    'base_url': Config.OPENAI_API_BASE_URL,
+                    'pool_size': Config.OPENAI_POOL_SIZE,
+                    'timeout': (Config.UPSTREAM_CONNECT_TIMEOUT, Config.OPENAI_TIMEOUT)
+                }
+            },
+            max_retries=Config.UPSTREAM_MAX_RETRIES,
+            rate_limiter=self.rate_limiter,
+            breaker_threshold=Config.CIRCUIT_BREAKER_FAILURES if Config.CIRCUIT_BREAKER_ENABLED else 0,
+            breaker_reset_timeout=Config.CIRCUIT_BREAKER_RESET_SECONDS,
+            hedge_settings={
+                'quantile': Config.HEDGE_QUANTILE,
+                'min_samples': Config.HEDGE_MIN_SAMPLES,
+                'min_delay': Config.HEDGE_MIN_DELAY_MS / 1000,
+                'max_ratio': Config.HEDGE_MAX_RATIO
+            } if Config.HEDGING_ENABLED else None
+        )
+        
+        # Merges concurrent /translate requests into batched upstream calls
+        self.translation_batcher = None
+        if Config.TRANSLATION_MICROBATCH_ENABLED and Config.SERVING_MODE == 'async' and self.hf_api_token:
+            self.translation_batcher = TranslationBatcher(
+                self.hf_api_token,
+                self.http_client,
+                max_batch_size=Config.TRANSLATION_MICROBATCH_MAX_ITEMS,
+                max_wait=Config.TRANSLATION_MICROBATCH_WAIT_MS / 1000,
+                max_concurrent_batches=Config.TRANSLATION_MICROBATCH_CONCURRENCY
+            )
+        
+        # Identical in-flight translation and speech requests share one upstream call
+        self.translation_coalescer = None
+        self.tts_coalescer = None
+        if Config.COALESCING_ENABLED:
+            self.translation_coalescer = SingleFlight('translate', Config.COALESCING_LOCK_DIR,
+                                                      lock_timeout=Config.COALESCING_LOCK_TIMEOUT)
+            self.tts_coalescer = SingleFlight('tts', Config.COALESCING_LOCK_DIR,
+                                              lock_timeout=Config.COALESCING_LOCK_TIMEOUT)
+        
+        # Translation memory shared by all workers
+        self.translation_memory = None
+        if Config.TRANSLATION_MEMORY_ENABLED:
+            self.translation_memory = TranslationMemory(
+                Config.TRANSLATION_MEMORY_PATH,
+                ttl=Config.TRANSLATION_MEMORY_TTL,
+                max_entries=Config.TRANSLATION_MEMORY_MAX_ENTRIES,
+                max_bytes=Config.TRANSLATION_MEMORY_MAX_BYTES
+            )
+            if Config.TRANSLATION_MEMORY_WARM_FILE:
+                self.warm_translation_memory(Config.TRANSLATION_MEMORY_WARM_FILE)
+        
+        # Content-addressed cache of synthesized speech clips
+        self.audio_cache = None
+        if Config.TTS_CACHE_ENABLED:
+            self.audio_cache = AudioCache(
+                Config.TTS_CACHE_DIR,
+                ttl=Config.TTS_CACHE_TTL,
+                max_bytes=Config.TTS_CACHE_MAX_BYTES
+            )
+
+    def warm_translation_memory(self, file_path: str) -> int:
+        """
+        Seed the translation memory from a JSON file of known translations
+        """
+        if not self.translation_memory:
+            return 0
+        
+        try:
+            loaded = self.translation_memory.warm(file_path, self.get_translation_model_key)
+            logger.info("Translation memory warmed with %d entries from %s", loaded, file_path)
+            return loaded
+        except Exception as e:
+            logger.error("Failed to warm translation memory: %s", e)
+            return 0
+
+    def get_translation_model_url(self, source_lang: str, target_lang: str) -> str:
+        """
+        Returns the model URL for a language direction
+        """
+        if source_lang == "English" and target_lang == "Arabic":
+            return self.translation_models["en_to_ar"]
+        elif source_lang == "Arabic" and target_lang == "English":
+            return self.translation_models["ar_to_en"]
+        raise ValueError(f"Unsupported language pair: {source_lang} → {target_lang}")
+
+    def get_translation_model_key(self, source_lang: str, target_lang: str) -> str:
+        """
+        Returns what translations for a direction are remembered under (model URL or local model id)
+        """
+        model_url = self.get_translation_model_url(source_lang, target_lang)
+        if self.local_translator:
+            direction = next(key for key, url in self.translation_models.items() if url == model_url)
+            return self.local_translator.model_id(direction)
+        return model_url
 
     def get_translation_model(self):
         """
         Returns translation model configuration for the translation service
         """
+        if self.local_translator:
+            return {
+                'type': 'local',
+                'translator': self.local_translator,
+                'memory': self.translation_memory,
+                # Translations run longer than their source; leave room under max_decoding_length
+                'max_tokens': min(Config.SEGMENT_MAX_TOKENS, int(Config.LOCAL_TRANSLATION_MAX_LENGTH / 1.5))
+            }
+        
         return {
             'type': 'huggingface_api',
             'models': self.translation_models,
-            'api_token': self.hf_api_token
+            'fallback_models': self.fallback_translation_models,
+            'api_token': self.hf_api_token,
+            'memory': self.translation_memory,
+            'client': self.http_client,
+            'batcher': self.translation_batcher,
+            'coalescer': self.translation_coalescer,
+            'max_tokens': Config.SEGMENT_MAX_TOKENS
         }
 
     def get_whisper_model(self):
@@ -48,7 +216,8 @@ class AIModels:
         return {
             'type': 'openai_api',
             'api_key': self.openai_api_key,
-            'model': 'whisper-1'
+            'model': 'whisper-1',
+            'client': self.http_client
         }
 
     def translate_text_online(self, text: str, source_lang: str, target_lang: str) -> str:
@@ -61,29 +230,30 @@ class AIModels:
         headers = {"Authorization": f"Bearer {self.hf_api_token}"}
         
         # Determine model based on language direction
-        if source_lang == "English" and target_lang == "Arabic":
-            model_url = self.translation_models["en_to_ar"]
-        elif source_lang == "Arabic" and target_lang == "English":
-            model_url = self.translation_models["ar_to_en"]
-        else:
-            raise ValueError(f"Unsupported language pair: {source_lang} → {target_lang}")
+        model_url = self.get_translation_model_url(source_lang, target_lang)
+        
+        if self.translation_memory:
+            remembered = self.translation_memory.lookup(text, source_lang, target_lang, model_url)
+            if remembered is not None:
+                return remembered
         
         payload = {"inputs": text}
         
         try:
-            response = requests.post(model_url, headers=headers, json=payload, timeout=30)
-            response.raise_for_status()
+            response = self.http_client.post('huggingface', model_url, model=hf_model_name(model_url),
+                                             headers=headers, json=payload)
             result = response.json()
             
             if isinstance(result, list) and len(result) > 0:
-                if 'translation_text' in result[0]:
-                    return result[0]['translation_text']
-                elif 'generated_text' in result[0]:
-                    return result[0]['generated_text']
+                translation = result[0].get('translation_text', result[0].get('generated_text'))
+                if translation is not None:
+                    if self.translation_memory:
+                        self.translation_memory.store(text, source_lang, target_lang, model_url, translation)
+                    return translation
             
             return str(result) if result else "Translation failed"
             
-        except requests.exceptions.RequestException as e:
+        except (requests.exceptions.RequestException, RateLimitError, CircuitOpenError) as e:
             raise Exception(f"Translation API error: {str(e)}")
 
     def transcribe_audio_online(self, audio_file_path: str) -> str:
@@ -95,7 +265,7 @@ class AIModels:
         
         try:
             from openai import OpenAI
-            client = OpenAI(api_key=self.openai_api_key)
+            client = OpenAI(api_key=self.openai_api_key, base_url=f"{Config.OPENAI_API_BASE_URL}/v1")
             
             with open(audio_file_path, 'rb') as audio_file:
                 response = client.audio.transcriptions.create(
@@ -0,0 +1,188 @@
+import os
+import random
+import sqlite3
+import threading
+import time
+from models.upstream_client import RateLimitError
+from services.metrics import RATE_LIMIT_WAIT, RATE_LIMIT_SHED
+
+PRIORITY_INTERACTIVE = 'interactive'
+PRIORITY_BULK = 'bulk'
+
+def parse_rate_limits(spec):
+    """
+    Parse "endpoint:model=requests_per_minute" pairs separated by commas, e.g.
+    "openai:whisper-1=50,openai:tts-1=10,huggingface:*=300". A "*" model is the
+    default for every model of that endpoint.
+    """
+    limits = {}
+    for item in (spec or '').split(','):
+        if not item.strip():
+            continue
+        key, _, value = item.partition('=')
+        limits[key.strip()] = float(value)
+    return limits
+
+class RateLimiter:
+    """
+    Token bucket per upstream endpoint and model, shared by all gunicorn workers
+    through a SQLite file, so requests wait here before they would be rejected
+    by the provider instead of every worker discovering the limit with a 429.
+
+    Bulk work (batch translation, long audio segments, TTS read-ahead) cannot
+    take the last bulk_reserve of a bucket, which keeps room for interactive calls.
+    """
+
+    def __init__(self, path, limits, burst_seconds=10, bulk_reserve=0.2, max_wait=30, bulk_max_wait=120):
+        """
+        Args:
+            path: SQLite database file (created if missing)
+            limits: Mapping of "endpoint:model" (or "endpoint:*") to requests per minute
+            burst_seconds: Bucket capacity, in seconds worth of requests
+            bulk_reserve: Fraction of each bucket only interactive requests may use
+            max_wait: Seconds an interactive request may queue before it is shed
+            bulk_max_wait: Seconds a bulk request may queue before it is shed
+        """
+        self.path = path
+        self.limits = limits
+        self.burst_seconds = burst_seconds
+        self.bulk_reserve = bulk_reserve
+        self.max_wait = {PRIORITY_INTERACTIVE: max_wait, PRIORITY_BULK: bulk_max_wait}
+        self._local = threading.local()
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        # A connection must not cross fork() (gunicorn preload_app); close it in the
+        # parent beforehand, it is reopened on next use
+        if hasattr(os, 'register_at_fork'):
+            os.register_at_fork(before=self._close)
+
+        conn = self._connect()
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS buckets ("
+            "name TEXT PRIMARY KEY, tokens REAL NOT NULL, updated_at REAL NOT NULL)"
+        )
+
+    def _close(self):
+        """Close the current thread's connection, if any."""
+        conn = getattr(self._local, 'conn', None)
+        if conn is not None:
+            conn.close()
+            self._local.conn = None
+
+    def _connect(self):
+        """Return a connection owned by the current thread and process."""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def _rate_for(self, name):
+        """Requests per second allowed for a bucket, or None if it is not limited."""
+        endpoint = name.split(':', 1)[0]
+        per_minute = self.limits.get(name, self.limits.get(f"{endpoint}:*"))
+        return per_minute / 60.0 if per_minute else None
+
+    def _take(self, name, rate, cost, floor):
+        """
+        Refill the bucket and take cost tokens if that leaves at least floor.
+
+        Returns:
+            float: 0 if the tokens were taken, otherwise seconds until they will be available
+        """
+        capacity = max(1.0, rate * self.burst_seconds)
+        conn = self._connect()
+        now = time.time()
+        # IMMEDIATE takes the write lock up front, so concurrent workers serialize here
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = conn.execute("SELECT tokens, updated_at FROM buckets WHERE name = ?", (name,)).fetchone()
+            tokens = capacity if row is None else min(capacity, row[0] + max(0.0, now - row[1]) * rate)
+
+            wait = 0.0
+            if tokens - cost >= floor * capacity:
+                tokens -= cost
+            else:
+                wait = (floor * capacity + cost - tokens) / rate
+
+            conn.execute(
+                "INSERT OR REPLACE INTO buckets (name, tokens, updated_at) VALUES (?, ?, ?)",
+                (name, tokens, now)
+            )
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        return wait
+
+    def acquire(self, endpoint, model, priority=PRIORITY_INTERACTIVE, cost=1):
+        """
+        Block until the request may be sent to the provider.
+
+        Raises:
+            RateLimitError: If the request would have to queue longer than its priority allows
+        """
+        name = f"{endpoint}:{model}"
+        rate = self._rate_for(name)
+        if rate is None:
+            return
+
+        floor = self.bulk_reserve if priority == PRIORITY_BULK else 0.0
+        start = time.time()
+        deadline = start + self.max_wait.get(priority, self.max_wait[PRIORITY_INTERACTIVE])
+        while True:
+            wait = self._take(name, rate, cost, floor)
+            if not wait:
+                RATE_LIMIT_WAIT.labels(endpoint, model, priority).observe(time.time() - start)
+                return
+            if time.time() + wait > deadline:
+                RATE_LIMIT_SHED.labels(endpoint, model, priority).inc()
+                raise RateLimitError("Rate limit exceeded. Please wait a few minutes before trying again.")
+            # Jitter spreads out workers that were queued behind the same refill
+            time.sleep(wait + random.uniform(0, 0.1))
+
+    def try_acquire(self, endpoint, model, priority=PRIORITY_INTERACTIVE, cost=1):
+        """Take a token only if one is available right now; never waits or sheds."""
+        name = f"{endpoint}:{model}"
+        rate = self._rate_for(name)
+        if rate is None:
+            return True
+        floor = self.bulk_reserve if priority == PRIORITY_BULK else 0.0
+        return not self._take(name, rate, cost, floor)
+
+    def penalize(self, endpoint, model, seconds):
+        """
+        Empty the bucket for `seconds` after the provider answered 429, for every worker.
+
+        Returns:
+            bool: False if the model has no bucket, so the caller has to wait itself
+        """
+        name = f"{endpoint}:{model}"
+        rate = self._rate_for(name)
+        if rate is None:
+            return False
+
+        conn = self._connect()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            now = time.time()
+            row = conn.execute("SELECT tokens, updated_at FROM buckets WHERE name = ?", (name,)).fetchone()
+            tokens = -rate * seconds
+            if row is not None:
+                # Keep a deeper debt left by another worker's penalty
+                tokens = min(tokens, row[0] + max(0.0, now - row[1]) * rate)
+            conn.execute(
+                "INSERT OR REPLACE INTO buckets (name, tokens, updated_at) VALUES (?, ?, ?)",
+                (name, tokens, now)
+            )
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        return True
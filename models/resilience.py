@@ -0,0 +1,122 @@
+import threading
+import time
+from collections import deque
+from services.metrics import CIRCUIT_BREAKER_TRANSITIONS
+
+CLOSED = 'closed'
+OPEN = 'open'
+HALF_OPEN = 'half_open'
+
+class CircuitBreaker:
+    """
+    Per-worker circuit breaker for one upstream endpoint and model.
+
+    After failure_threshold consecutive failures (connection errors, timeouts,
+    5xx after retries) the breaker opens and calls fail fast for reset_timeout
+    seconds. Then it turns half-open and lets a single probe call through: a
+    success closes it again, a failure reopens it for another reset_timeout.
+    """
+
+    def __init__(self, name, failure_threshold=5, reset_timeout=30):
+        """
+        Args:
+            name: Label for metrics and log messages, e.g. "huggingface:Helsinki-NLP/opus-mt-ar-en"
+            failure_threshold: Consecutive failures that open the breaker
+            reset_timeout: Seconds the breaker stays open before a probe is allowed
+        """
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._probing = False
+        self._lock = threading.Lock()
+
+    def _transition(self, state):
+        self.state = state
+        CIRCUIT_BREAKER_TRANSITIONS.labels(self.name, state).inc()
+
+    def allow(self):
+        """True if a call may go upstream now. Every allowed call must be followed by record_*()."""
+        with self._lock:
+            if self.state == OPEN:
+                if time.monotonic() - self._opened_at < self.reset_timeout:
+                    return False
+                self._transition(HALF_OPEN)
+            if self.state == HALF_OPEN:
+                if self._probing:
+                    return False
+                self._probing = True
+            return True
+
+    def retry_after(self):
+        """Seconds until the breaker lets a probe through."""
+        return max(0.0, self._opened_at + self.reset_timeout - time.monotonic())
+
+    def record_success(self):
+        with self._lock:
+            self._failures = 0
+            self._probing = False
+            if self.state != CLOSED:
+                self._transition(CLOSED)
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            self._probing = False
+            if self.state == HALF_OPEN or (self.state == CLOSED and self._failures >= self.failure_threshold):
+                self._opened_at = time.monotonic()
+                self._transition(OPEN)
+
+    def record_neutral(self):
+        """The call ended without saying anything about the provider's health (e.g. rate limited)."""
+        with self._lock:
+            self._probing = False
+
+class LatencyTracker:
+    """
+    Rolling window of successful upstream latencies for one endpoint and model,
+    used to decide when a hedged duplicate request is worth sending, plus the
+    per-worker budget that keeps hedges to a small share of all requests.
+    """
+
+    def __init__(self, quantile=0.95, window=200, min_samples=20, min_delay=0.05, max_ratio=0.1):
+        """
+        Args:
+            quantile: Latency quantile after which a request is hedged
+            window: Number of recent latencies kept
+            min_samples: Latencies needed before hedging starts
+            min_delay: Lower bound of the hedge delay in seconds
+            max_ratio: Largest share of requests that may be hedged
+        """
+        self.quantile = quantile
+        self.min_samples = min_samples
+        self.min_delay = min_delay
+        self.max_ratio = max_ratio
+        self._latencies = deque(maxlen=window)
+        self._requests = 0
+        self._hedges = 0
+        self._lock = threading.Lock()
+
+    def observe(self, seconds):
+        with self._lock:
+            self._latencies.append(seconds)
+
+    def hedge_delay(self):
+        """Seconds to wait for the first response before hedging, or None while there is too little data."""
+        with self._lock:
+            self._requests += 1
+            if len(self._latencies) < self.min_samples:
+                return None
+            latencies = sorted(self._latencies)
+        index = min(len(latencies) - 1, int(self.quantile * len(latencies)))
+        return max(self.min_delay, latencies[index])
+
+    def take_hedge(self):
+        """Count a hedge against the budget; False if it is used up."""
+        with self._lock:
+            if self._hedges + 1 > self.max_ratio * self._requests:
+                return False
+            self._hedges += 1
+            return True
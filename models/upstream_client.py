@@ -0,0 +1,297 @@
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+import requests
+from requests.adapters import HTTPAdapter
+from models.resilience import CircuitBreaker, LatencyTracker
+from services.metrics import UPSTREAM_LATENCY, UPSTREAM_RETRIES, HEDGED_REQUESTS, CIRCUIT_BREAKER_REJECTED
+
+logger = logging.getLogger(__name__)
+
+class RateLimitError(Exception):
+    """Raised when an upstream API keeps answering 429 after all retries."""
+
+class CircuitOpenError(Exception):
+    """Raised without calling upstream while the circuit breaker of an endpoint and model is open."""
+
+    def __init__(self, breaker):
+        self.breaker = breaker
+        self.retry_after = breaker.retry_after()
+        super().__init__(f"{breaker.name} is unavailable after repeated failures, "
+                         f"retrying in {self.retry_after:.0f} s")
+
+class UpstreamClient:
+    """
+    Pooled, keep-alive HTTP client for the upstream AI APIs.
+
+    Each endpoint gets its own requests.Session with a sized connection pool and
+    default timeout, so TCP/TLS connections to Hugging Face and OpenAI are reused
+    across requests. Retries for rate limiting and transient upstream errors are
+    handled here once instead of in every service.
+
+    Each endpoint and model also gets a circuit breaker, so a failing provider
+    is not retried by every request, and callers can opt into hedging: when a
+    response takes longer than the model's recent p95, a duplicate request is
+    sent and whichever answers first is used.
+    """
+
+    DEFAULT_ENDPOINTS = {
+        'huggingface': {
+            'base_url': 'https://api-inference.huggingface.co',
+            'pool_size': 10,
+            'timeout': (5, 30)  # (connect, read) seconds
+        },
+        'openai': {
+            'base_url': 'https://api.openai.com',
+            'pool_size': 10,
+            'timeout': (5, 60)
+        }
+    }
+
+    RETRY_STATUSES = (429, 502, 503, 504)
+
+    def __init__(self, endpoints=None, max_retries=3, backoff_base=1, max_backoff=30, rate_limiter=None,
+                 breaker_threshold=5, breaker_reset_timeout=30, hedge_settings=None):
+        """
+        Args:
+            endpoints: Mapping of endpoint name to {'base_url', 'pool_size', 'timeout'}
+            max_retries: Total attempts for retryable responses
+            backoff_base: First backoff delay in seconds, doubled on every retry
+            max_backoff: Upper bound for a single backoff delay
+            rate_limiter: Optional RateLimiter consulted before every attempt
+            breaker_threshold: Consecutive failures that open a circuit breaker, 0 to disable breakers
+            breaker_reset_timeout: Seconds an open breaker fails fast before it lets a probe through
+            hedge_settings: LatencyTracker keyword arguments, None to disable hedging
+        """
+        self.endpoints = endpoints or self.DEFAULT_ENDPOINTS
+        self.rate_limiter = rate_limiter
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.max_backoff = max_backoff
+        self.breaker_threshold = breaker_threshold
+        self.breaker_reset_timeout = breaker_reset_timeout
+        self.hedge_settings = hedge_settings
+        self._sessions = {}
+        self._breakers = {}
+        self._trackers = {}
+        self._hedge_pool = None
+        self._pid = None
+        self._lock = threading.Lock()
+
+    def _get_session(self, endpoint):
+        """Return the pooled session for an endpoint, rebuilding pools after a fork."""
+        with self._lock:
+            if self._pid != os.getpid():
+                self._sessions = {}
+                self._hedge_pool = None
+                self._pid = os.getpid()
+
+            session = self._sessions.get(endpoint)
+            if session is None:
+                settings = self.endpoints[endpoint]
+                session = requests.Session()
+                adapter = HTTPAdapter(pool_connections=1, pool_maxsize=settings['pool_size'])
+                session.mount(settings['base_url'], adapter)
+                self._sessions[endpoint] = session
+            return session
+
+    def get_breaker(self, endpoint, model):
+        """The circuit breaker of an endpoint and model, or None when breakers are disabled."""
+        if not self.breaker_threshold:
+            return None
+        name = f"{endpoint}:{model}"
+        with self._lock:
+            breaker = self._breakers.get(name)
+            if breaker is None:
+                breaker = self._breakers[name] = CircuitBreaker(name, self.breaker_threshold,
+                                                                self.breaker_reset_timeout)
+            return breaker
+
+    def _get_tracker(self, endpoint, model):
+        name = f"{endpoint}:{model}"
+        with self._lock:
+            tracker = self._trackers.get(name)
+            if tracker is None:
+                tracker = self._trackers[name] = LatencyTracker(**self.hedge_settings)
+            return tracker
+
+    def _get_hedge_pool(self):
+        """Threads (greenlets in the async serving mode) running hedged attempts."""
+        with self._lock:
+            if self._hedge_pool is None:
+                size = sum(settings['pool_size'] for settings in self.endpoints.values()) * 2
+                self._hedge_pool = ThreadPoolExecutor(max_workers=size, thread_name_prefix='upstream-hedge')
+            return self._hedge_pool
+
+    def _backoff_delay(self, response, attempt):
+        """Honour Retry-After when the provider sends it, otherwise back off exponentially."""
+        retry_after = response.headers.get('Retry-After')
+        if retry_after:
+            try:
+                return min(float(retry_after), self.max_backoff)
+            except ValueError:
+                pass
+        return min(self.backoff_base * (2 ** attempt), self.max_backoff)
+
+    @staticmethod
+    def _rewind_files(files):
+        """Multipart file objects are consumed by each attempt, so rewind them before retrying."""
+        for value in (files or {}).values():
+            file_obj = value[1] if isinstance(value, tuple) and len(value) > 1 else value
+            if hasattr(file_obj, 'seek'):
+                file_obj.seek(0)
+
+    def _send(self, session, url, endpoint, model, tracker, kwargs):
+        """One upstream attempt, timed for metrics and (when successful) the hedge delay."""
+        start = time.perf_counter()
+        try:
+            response = session.post(url, **kwargs)
+        except requests.exceptions.RequestException as e:
+            UPSTREAM_LATENCY.labels(endpoint, model or '', type(e).__name__).observe(time.perf_counter() - start)
+            raise
+        elapsed = time.perf_counter() - start
+        UPSTREAM_LATENCY.labels(endpoint, model or '', str(response.status_code)).observe(elapsed)
+        if tracker and response.status_code < 400:
+            tracker.observe(elapsed)
+        return response
+
+    def _send_hedged(self, session, url, endpoint, model, tracker, priority, kwargs):
+        """
+        Send an attempt and, if it is still outstanding after the tracked p95
+        latency, a duplicate; return whichever succeeds first. The slower
+        response is closed when it arrives.
+        """
+        delay = tracker.hedge_delay()
+        if delay is None:
+            return self._send(session, url, endpoint, model, tracker, kwargs)
+
+        pool = self._get_hedge_pool()
+        primary = pool.submit(self._send, session, url, endpoint, model, tracker, kwargs)
+        done, _ = wait([primary], timeout=delay)
+        if done or not tracker.take_hedge():
+            return primary.result()
+        # A hedge never queues in the rate limiter: if the bucket is empty, just keep waiting
+        if self.rate_limiter and model and not self.rate_limiter.try_acquire(endpoint, model, priority=priority):
+            return primary.result()
+
+        hedge = pool.submit(self._send, session, url, endpoint, model, tracker, kwargs)
+        pending = {primary, hedge}
+        fallback = None
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                if future.exception() is None and future.result().status_code < 400:
+                    HEDGED_REQUESTS.labels(endpoint, model or '', 'hedge' if future is hedge else 'primary').inc()
+                    for other in done | pending:
+                        if other is not future:
+                            other.add_done_callback(_close_response)
+                    # An attempt that failed earlier (e.g. a 5xx from the primary) holds a connection too
+                    if fallback is not None:
+                        _close_response(fallback)
+                    return future.result()
+                if fallback is not None:
+                    _close_response(fallback)
+                fallback = future
+
+        # Both attempts failed: report the later one like a single attempt would
+        HEDGED_REQUESTS.labels(endpoint, model or '', 'none').inc()
+        return fallback.result()
+
+    def post(self, endpoint, url, model=None, priority='interactive', hedge=False, **kwargs):
+        """
+        POST to an upstream API with pooling, timeouts and the shared retry policy.
+
+        Args:
+            endpoint: Endpoint name from the client configuration ('huggingface' or 'openai')
+            url: Full request URL, or a path relative to the endpoint's base_url
+            model: Model the request is billed against, selects the rate limit bucket and circuit breaker
+            priority: 'interactive' or 'bulk', bulk requests yield to interactive ones
+            hedge: Send a duplicate when the response is slow; only for idempotent, cheap requests
+            **kwargs: Passed to requests (headers, json, files, stream, timeout...)
+
+        Returns:
+            requests.Response: The first successful response
+
+        Raises:
+            CircuitOpenError: If the model's circuit breaker is open; nothing was sent
+            RateLimitError: If the API is still rate limiting after all retries
+            requests.exceptions.HTTPError: For other non-success responses
+        """
+        breaker = self.get_breaker(endpoint, model or url)
+        if breaker and not breaker.allow():
+            CIRCUIT_BREAKER_REJECTED.labels(breaker.name).inc()
+            raise CircuitOpenError(breaker)
+
+        try:
+            response = self._post(endpoint, url, model, priority, hedge, kwargs)
+        except RateLimitError:
+            if breaker:
+                breaker.record_neutral()
+            raise
+        except requests.exceptions.HTTPError as e:
+            # 4xx means the provider is up and answering; only server errors count against it
+            if breaker:
+                if e.response is not None and e.response.status_code < 500:
+                    breaker.record_success()
+                else:
+                    breaker.record_failure()
+            raise
+        except requests.exceptions.RequestException:
+            if breaker:
+                breaker.record_failure()
+            raise
+        except BaseException:
+            if breaker:
+                breaker.record_neutral()
+            raise
+        if breaker:
+            breaker.record_success()
+        return response
+
+    def _post(self, endpoint, url, model, priority, hedge, kwargs):
+        session = self._get_session(endpoint)
+        kwargs.setdefault('timeout', self.endpoints[endpoint]['timeout'])
+        if url.startswith('/'):
+            url = self.endpoints[endpoint]['base_url'].rstrip('/') + url
+
+        limiter = self.rate_limiter if model else None
+        # Multipart bodies are consumed by the request, so they can't be sent twice at once
+        hedge = hedge and self.hedge_settings and not kwargs.get('files')
+        tracker = self._get_tracker(endpoint, model or url) if hedge else None
+
+        for attempt in range(self.max_retries):
+            if attempt:
+                self._rewind_files(kwargs.get('files'))
+            if limiter:
+                limiter.acquire(endpoint, model, priority=priority)
+
+            if tracker:
+                response = self._send_hedged(session, url, endpoint, model, tracker, priority, kwargs)
+            else:
+                response = self._send(session, url, endpoint, model, tracker, kwargs)
+            if response.status_code < 400:
+                return response
+
+            if response.status_code in self.RETRY_STATUSES and attempt < self.max_retries - 1:
+                wait_time = self._backoff_delay(response, attempt)
+                UPSTREAM_RETRIES.labels(endpoint, model or '', str(response.status_code)).inc()
+                logger.warning("Upstream returned %s, retrying in %.1f s", response.status_code, wait_time,
+                               extra={'endpoint': endpoint, 'model': model, 'attempt': attempt + 1,
+                                      'max_retries': self.max_retries})
+                response.close()
+                # On 429, pause the bucket for every worker and let the next acquire() do the
+                # waiting; models without a bucket back off here like other retries
+                if not (limiter and response.status_code == 429 and limiter.penalize(endpoint, model, wait_time)):
+                    time.sleep(wait_time)
+                continue
+
+            if response.status_code == 429:
+                raise RateLimitError("Rate limit exceeded. Please wait a few minutes before trying again.")
+            response.raise_for_status()
+
+def _close_response(future):
+    """Done-callback releasing the connection of a hedged attempt that lost."""
+    if future.exception() is None:
+        future.result().close()
@@ -1,29 +1,134 @@
-from flask import Blueprint, request
+import re
+import json
+import time
+from flask import Blueprint, request, jsonify, send_file, Response, stream_with_context, url_for, current_app
 from services.convert_service import export_to_excel, export_to_word, export_to_pdf_table, export_to_word_text, export_to_pdf_text
+from services.export_jobs import submit_export, get_job_store, EXPORT_FORMATS, FINISHED_STATUSES
 
 convert_routes = Blueprint('convert_routes', __name__)
 
+_JOB_ID_RE = re.compile(r'^[0-9a-f]{64}$')
+
+def _wants_job():
+    """Exports run in the background when the client asks for ?async=1."""
+    return request.args.get('async', '').lower() in ('1', 'true')
+
 @convert_routes.route("/excel", methods=["POST"])
 def export_excel():
     chat_data = request.json.get("chat_data", [])
+    if _wants_job():
+        return _submit_job('excel', chat_data)
     return export_to_excel(chat_data)
 
 @convert_routes.route("/word", methods=["POST"])
 def export_word():
     chat_data = request.json.get("chat_data", [])
+    if _wants_job():
+        return _submit_job('word', chat_data)
     return export_to_word(chat_data)
 
 @convert_routes.route("/pdf_table", methods=["POST"])
 def export_pdf_table():
     chat_data = request.json.get("chat_data", [])
+    if _wants_job():
+        return _submit_job('pdf_table', chat_data)
     return export_to_pdf_table(chat_data)
 
 @convert_routes.route("/word_text", methods=["POST"])
 def export_word_text():
     chat_data = request.json.get("chat_data", [])
+    if _wants_job():
+        return _submit_job('word_text', chat_data)
     return export_to_word_text(chat_data)
 
 @convert_routes.route("/pdf_text", methods=["POST"])
 def export_pdf_text():
     chat_data = request.json.get("chat_data", [])
-    return export_to_pdf_text(chat_data)
\ No newline at end of file
+    if _wants_job():
+        return _submit_job('pdf_text', chat_data)
+    return export_to_pdf_text(chat_data)
+
+def _job_response(job):
+    """Public view of a job record."""
+    response = {
+        'job_id': job['id'],
+        'format': job['format'],
+        'status': job['status'],
+        'processed': job['processed'],
+        'total': job['total'],
+        'status_url': url_for('convert_routes.export_job_status', job_id=job['id'])
+    }
+    if current_app.config['EXPORT_EVENTS_ENABLED']:
+        response['events_url'] = url_for('convert_routes.export_job_events', job_id=job['id'])
+    if job['status'] == 'done':
+        response['download_url'] = url_for('convert_routes.export_job_download', job_id=job['id'])
+    if job.get('error'):
+        response['error'] = job['error']
+    return response
+
+def _submit_job(export_format, chat_data):
+    try:
+        job = submit_export(export_format, chat_data)
+        return jsonify(_job_response(job)), 202
+    except Exception as e:
+        return jsonify({'error': f'Failed to start export: {str(e)}'}), 500
+
+def _get_job(job_id):
+    if not _JOB_ID_RE.match(job_id):
+        return None
+    return get_job_store().get(job_id)
+
+@convert_routes.route("/jobs/<job_id>", methods=["GET"])
+def export_job_status(job_id):
+    job = _get_job(job_id)
+    if job is None:
+        return jsonify({'error': 'Export job not found or expired'}), 404
+    return jsonify(_job_response(job))
+
+@convert_routes.route("/jobs/<job_id>/events", methods=["GET"])
+def export_job_events(job_id):
+    """
+    Server-sent events with the job's progress, closed once it has finished or
+    after EXPORT_EVENTS_MAX_SECONDS (EventSource then reconnects). Only offered in
+    the async serving mode; elsewhere clients poll the job's status_url.
+    """
+    if not current_app.config['EXPORT_EVENTS_ENABLED']:
+        return jsonify({'error': 'Progress events are not available, poll the job status instead',
+                        'status_url': url_for('convert_routes.export_job_status', job_id=job_id)}), 404
+
+    job = _get_job(job_id)
+    if job is None:
+        return jsonify({'error': 'Export job not found or expired'}), 404
+
+    deadline = time.monotonic() + current_app.config['EXPORT_EVENTS_MAX_SECONDS']
+
+    def generate(job):
+        last_event = None
+        while job is not None:
+            event = json.dumps(_job_response(job))
+            if event != last_event:
+                yield f"data: {event}\n\n"
+                last_event = event
+            if job['status'] in FINISHED_STATUSES or time.monotonic() >= deadline:
+                return
+            time.sleep(0.5)
+            job = _get_job(job_id)
+        yield f"data: {json.dumps({'job_id': job_id, 'status': 'expired'})}\n\n"
+
+    return Response(stream_with_context(generate(job)), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+@convert_routes.route("/jobs/<job_id>/download", methods=["GET"])
+def export_job_download(job_id):
+    job = _get_job(job_id)
+    if job is None:
+        return jsonify({'error': 'Export job not found or expired'}), 404
+    if job['status'] != 'done':
+        return jsonify(_job_response(job)), 409
+
+    download_name, mimetype, _ = EXPORT_FORMATS[job['format']]
+    try:
+        return send_file(job['path'], as_attachment=True, download_name=download_name,
+                         mimetype=mimetype, conditional=True)
+    except FileNotFoundError:
+        return jsonify({'error': 'Export file expired'}), 404
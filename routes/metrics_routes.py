@@ -0,0 +1,9 @@
+from flask import Blueprint, Response
+from services.metrics import render_metrics
+
+metrics_bp = Blueprint('metrics_bp', __name__)
+
+@metrics_bp.route('/metrics', methods=['GET'])
+def metrics():
+    body, content_type = render_metrics()
+    return Response(body, content_type=content_type)
@@ -1,5 +1,5 @@
-from flask import Blueprint, request, jsonify
-from services.translation_service import translate_text
+from flask import Blueprint, request, jsonify, current_app
+from services.translation_service import translate_text, translate_text_many
 
 translate_bp = Blueprint('translate_bp', __name__)
 
@@ -21,3 +21,29 @@ def translate():
         return jsonify({'translation': translated_text})
     except Exception as e:
         return jsonify({'error': str(e)}), 500
+
+@translate_bp.route('/translate/batch', methods=['POST'])
+def translate_batch():
+    from app import ai_models  # Import the model instance
+
+    data = request.get_json()
+    texts = data.get('texts')
+    src_lang = data.get('sourceLang')
+    tgt_lang = data.get('targetLang')
+
+    if not all([texts, src_lang, tgt_lang]):
+        return jsonify({'error': 'Missing required parameters'}), 400
+
+    if not isinstance(texts, list):
+        return jsonify({'error': 'texts must be a list of strings'}), 400
+
+    try:
+        model_info = ai_models.get_translation_model()
+        results = translate_text_many(
+            texts, src_lang, tgt_lang, model_info,
+            max_batch_items=current_app.config['TRANSLATION_BATCH_MAX_ITEMS'],
+            max_batch_tokens=current_app.config['TRANSLATION_BATCH_MAX_TOKENS']
+        )
+        return jsonify({'translations': results})
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
@@ -1,34 +1,113 @@
 import os
-from flask import Blueprint, request, jsonify, send_file
+import re
+import json
+import logging
+from flask import Blueprint, request, jsonify, send_file, Response, stream_with_context, current_app, url_for
 from werkzeug.utils import secure_filename
-from services.pdf_service import extract_text_from_pdf, extract_text_with_ocr
-from services.audio_service import transcribe_audio, text_to_speech, save_audio_file
+from services.pdf_service import (
+    extract_text_cached, iter_page_sentences, iter_pdf_pages, count_pdf_pages,
+    get_extraction_cache, TEXT_LAYER_METHOD
+)
+from services.cache_service import hash_file, AudioCache
+from services.audio_service import (
+    transcribe_audio, transcribe_audio_long, text_to_speech, iter_text_to_speech
+)
+from services.executor import run_blocking
+from services.metrics import stage
 from io import BytesIO
-import uuid
+from itertools import chain
 
 upload_bp = Blueprint('upload_bp', __name__)
-
-UPLOAD_FOLDER = 'uploads'
-os.makedirs(UPLOAD_FOLDER, exist_ok=True)
+logger = logging.getLogger(__name__)
 
 @upload_bp.route('/upload-pdf', methods=['POST'])
 def upload_pdf():
-    if 'file' not in request.files:
+    # Accessing request.files reads and spools the whole multipart body
+    with stage('pdf', 'receive'):
+        files = request.files
+    if 'file' not in files:
         return jsonify({'error': 'No file provided'}), 400
 
-    file = request.files['file']
+    file = files['file']
     if file.filename == '':
         return jsonify({'error': 'No file selected'}), 400
 
     if file and file.filename.endswith('.pdf'):
-        filename = secure_filename(file.filename)
-        filepath = os.path.join(UPLOAD_FOLDER, filename)
-        file.save(filepath)
+        # Read straight from the spooled upload (RAM for small files, anonymous temp file for large ones)
+        pdf_stream = file.stream
 
-        text = extract_text_from_pdf(filepath) or extract_text_with_ocr(filepath)
-        os.remove(filepath)
+        # Streaming mode: send sentences page by page as NDJSON while the rest is parsed
+        if request.args.get('stream', '').lower() in ('1', 'true'):
+            return Response(stream_with_context(_stream_pdf_sentences(pdf_stream)), mimetype='application/x-ndjson')
 
-        return jsonify({'sentences': text}) if text else jsonify({'error': 'Failed to extract text'}), 400
+        # PDF parsing and OCR are CPU bound; keep them off the event loop in async mode
+        text = run_blocking(extract_text_cached, pdf_stream)
+
+        if text:
+            return jsonify({'sentences': text})
+        return jsonify({'error': 'Failed to extract text'}), 400
+
+    return jsonify({'error': 'Unsupported file type. Please upload a PDF.'}), 400
+
+def _stream_pdf_sentences(pdf_stream):
+    """
+    Yields NDJSON lines for a streamed PDF upload:
+    {"page": n, "pages": total, "sentences": [...]} per parsed page, then
+    {"done": true, "count": n} or {"error": "..."}.
+    """
+    count = 0
+    try:
+        cache = get_extraction_cache()
+        file_hash = None
+        cached = None
+        if cache:
+            with stage('pdf', 'hash'):
+                file_hash = run_blocking(hash_file, pdf_stream)
+            cached = cache.lookup(file_hash, TEXT_LAYER_METHOD)
+
+        if cached is not None:
+            count = len(cached)
+            if cached:
+                yield json.dumps({'page': 1, 'pages': 1, 'sentences': cached}) + "\n"
+        else:
+            try:
+                pages = run_blocking(count_pdf_pages, pdf_stream)
+                extracted = []
+                max_tokens = current_app.config['SEGMENT_MAX_TOKENS']
+                page_sentences = iter_page_sentences(iter_pdf_pages(pdf_stream), max_tokens)
+                # Each page is parsed and split off the event loop in async mode
+                while True:
+                    parsed = run_blocking(next, page_sentences, None)
+                    if parsed is None:
+                        break
+                    page_number, sentences = parsed
+                    count += len(sentences)
+                    extracted.extend(sentences)
+                    yield json.dumps({'page': page_number, 'pages': pages, 'sentences': sentences}) + "\n"
+            except Exception as e:
+                # Sentences already sent can't be taken back; otherwise treat an unreadable
+                # text layer as missing and let OCR below handle it, like extract_text_cached
+                if count:
+                    raise
+                logger.error("Error reading PDF with PyPDF2: %s", e)
+                extracted = []
+            if cache:
+                cache.store(file_hash, TEXT_LAYER_METHOD, extracted)
+
+        if not count:
+            # No text layer; fall back to (cached) OCR for image-based PDFs
+            sentences = run_blocking(extract_text_cached, pdf_stream, file_hash)
+            if sentences:
+                count = len(sentences)
+                yield json.dumps({'page': 1, 'pages': 1, 'sentences': sentences}) + "\n"
+
+        if count:
+            yield json.dumps({'done': True, 'count': count}) + "\n"
+        else:
+            yield json.dumps({'error': 'Failed to extract text'}) + "\n"
+    except Exception as e:
+        logger.exception("Error streaming PDF sentences")
+        yield json.dumps({'error': f'Failed to extract text: {str(e)}'}) + "\n"
 
 @upload_bp.route('/upload-audio', methods=['POST'])
 def upload_audio():
@@ -45,17 +124,26 @@ def upload_audio():
     allowed_extensions = ['.wav', '.mp3', '.m4a', '.ogg', '.flac']
     if file and any(file.filename.lower().endswith(ext) for ext in allowed_extensions):
         filename = secure_filename(file.filename)
-        filepath = os.path.join(UPLOAD_FOLDER, filename)
-        file.save(filepath)
 
         try:
             whisper_model_info = ai_models.get_whisper_model()
-            text = transcribe_audio(filepath, whisper_model_info)
+
+            # Long recordings are split and transcribed in parallel ('mode=long' or large uploads)
+            file.stream.seek(0, os.SEEK_END)
+            size = file.stream.tell()
+            mode = request.values.get('mode', '')
+            if mode == 'long' or (mode != 'single' and size > current_app.config['LONG_AUDIO_AUTO_BYTES']):
+                text = transcribe_audio_long(
+                    file.stream, whisper_model_info, filename,
+                    segment_seconds=current_app.config['LONG_AUDIO_SEGMENT_SECONDS'],
+                    overlap_seconds=current_app.config['LONG_AUDIO_OVERLAP_SECONDS'],
+                    max_parallel=current_app.config['LONG_AUDIO_MAX_PARALLEL']
+                )
+            else:
+                # The spooled upload goes straight into the Whisper multipart body
+                text = transcribe_audio(file.stream, whisper_model_info, filename=filename)
             return jsonify({'text': text})
         except Exception as e:
-            # Clean up file if transcription fails
-            if os.path.exists(filepath):
-                os.remove(filepath)
             return jsonify({'error': str(e)}), 500
     else:
         return jsonify({'error': 'Unsupported audio format. Please use WAV, MP3, M4A, OGG, or FLAC.'}), 400
@@ -82,13 +170,53 @@ def convert_text_to_speech():
         if voice not in valid_voices:
             voice = 'alloy'  # Default fallback
         
+        # The model names a metrics label, rate limit bucket and circuit breaker, so only known ones are accepted
+        valid_models = ['tts-1', 'tts-1-hd']
+        if model not in valid_models:
+            return jsonify({'error': f"Unsupported model. Use one of: {', '.join(valid_models)}"}), 400
+        
         # Get OpenAI API key
         api_key = ai_models.openai_api_key
         if not api_key:
             return jsonify({'error': 'OpenAI API key not configured'}), 500
         
-        # Generate audio
-        audio_data = text_to_speech(text, voice=voice, model=model, api_key=api_key)
+        # Replays are served from the audio cache without calling OpenAI
+        audio_cache = ai_models.audio_cache
+        cache_key = audio_cache.make_key(text, voice, model) if audio_cache else None
+        if audio_cache:
+            cached_path = audio_cache.lookup(cache_key)
+            if cached_path:
+                return _send_cached_audio(cache_key, cached_path)
+        
+        # Streaming mode: pass audio through chunk by chunk as it is synthesized
+        if data.get('stream'):
+            audio_chunks = iter_text_to_speech(
+                text, voice=voice, model=model, api_key=api_key, client=ai_models.http_client,
+                max_segment_chars=current_app.config['TTS_STREAM_SEGMENT_CHARS'],
+                max_parallel=current_app.config['TTS_STREAM_MAX_PARALLEL']
+            )
+            # Pull the first chunk now so upstream errors still produce a JSON error response
+            first_chunk = next(audio_chunks, b'')
+            audio_chunks = chain([first_chunk], audio_chunks)
+            if audio_cache:
+                # Tee the stream into the cache; the clip is kept only if the stream completes
+                audio_chunks = audio_cache.store_stream(cache_key, audio_chunks)
+            response = Response(stream_with_context(audio_chunks), mimetype='audio/mpeg')
+            if audio_cache:
+                response.headers['X-Audio-Url'] = url_for('upload_bp.get_cached_audio', key=cache_key)
+            return response
+        
+        # Generate audio; identical requests in flight share one OpenAI call
+        synthesize = lambda: text_to_speech(text, voice=voice, model=model, api_key=api_key, client=ai_models.http_client)
+        coalescer = ai_models.tts_coalescer
+        
+        if audio_cache:
+            # The clip is stored before the call returns, so requests waiting in other workers find it
+            cached_path = _coalesce(coalescer, cache_key, lambda: audio_cache.store(cache_key, synthesize()),
+                                    lambda: audio_cache.lookup(cache_key))
+            return _send_cached_audio(cache_key, cached_path)
+        
+        audio_data = _coalesce(coalescer, AudioCache.make_key(text, voice, model), synthesize)
         
         # Create a BytesIO object to serve the audio
         audio_buffer = BytesIO(audio_data)
@@ -103,3 +231,35 @@ def convert_text_to_speech():
         
     except Exception as e:
         return jsonify({'error': f'Text-to-speech failed: {str(e)}'}), 500
+
+
+def _coalesce(coalescer, key, fn, lookup=None):
+    return coalescer.do(key, fn, lookup) if coalescer else fn()
+
+def _send_cached_audio(cache_key, path):
+    """Serve a cached clip from disk with ETag, Last-Modified and Range support."""
+    response = send_file(
+        path,
+        mimetype='audio/mpeg',
+        download_name='speech.mp3',
+        conditional=True,
+        etag=cache_key,
+        last_modified=os.path.getmtime(path),
+        max_age=current_app.config['TTS_CACHE_TTL']
+    )
+    response.headers['X-Audio-Url'] = url_for('upload_bp.get_cached_audio', key=cache_key)
+    return response
+
+@upload_bp.route('/text-to-speech/audio/<key>', methods=['GET'])
+def get_cached_audio(key):
+    """Replay a cached clip; supports HTTP Range so players can seek without re-downloading."""
+    from app import ai_models  # Import the model instance
+
+    audio_cache = ai_models.audio_cache
+    if not audio_cache or not re.fullmatch(r'[0-9a-f]{64}', key):
+        return jsonify({'error': 'Audio not found'}), 404
+
+    cached_path = audio_cache.lookup(key)
+    if not cached_path:
+        return jsonify({'error': 'Audio not found'}), 404
+    return _send_cached_audio(key, cached_path)
@@ -0,0 +1,269 @@
+import json
+import logging
+import os
+import random
+import threading
+import time
+from flask import g, jsonify, request
+from services.metrics import ADMISSION_IN_FLIGHT, ADMISSION_QUEUE_DEPTH, ADMISSION_SHED, ADMISSION_WAIT
+
+try:
+    import fcntl
+except ImportError:  # Windows: no admission control
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+# URL rule -> route class. Unlisted routes (pages, /metrics, export job polling
+# and its event stream, clip downloads) are cheap or long-lived and never queued.
+ROUTE_CLASSES = {
+    '/translate': 'interactive',
+    '/translate/batch': 'batch',
+    '/text-to-speech': 'interactive',
+    '/upload-pdf': 'upload',
+    '/upload-audio': 'upload',
+    '/export/excel': 'export',
+    '/export/word': 'export',
+    '/export/pdf_table': 'export',
+    '/export/word_text': 'export',
+    '/export/pdf_text': 'export'
+}
+
+# Bodies of shed requests up to this size are read before answering
+DRAIN_MAX_BYTES = 1024 * 1024
+
+def parse_class_settings(spec):
+    """Parse "route_class=value" pairs separated by commas, e.g. "interactive=64,upload=2,export=2"."""
+    settings = {}
+    for item in (spec or '').split(','):
+        if not item.strip():
+            continue
+        key, _, value = item.partition('=')
+        settings[key.strip()] = float(value)
+    return settings
+
+class AdmissionRejected(Exception):
+    """The route class is saturated; the request should be answered with 503 and Retry-After."""
+
+    def __init__(self, route_class, reason, retry_after):
+        self.route_class = route_class
+        self.reason = reason
+        self.retry_after = retry_after
+        super().__init__(f"Server busy ({route_class} {reason.replace('_', ' ')}), retry in {retry_after} s")
+
+class AdmissionQueue:
+    """
+    Concurrency limit with a bounded wait queue for one route class, shared by
+    all gunicorn workers.
+
+    The running and waiting requests of every worker are counted in a single
+    state file, read and updated under an exclusive lock, so taking a slot or
+    checking for one costs one lock and one small read and write however many
+    slots there are. Counts are kept per worker pid; when the class looks full,
+    counts of workers that no longer exist (killed or crashed) are dropped.
+    When no queue place is free the request is rejected at once; a waiting
+    request checks for a slot with exponential backoff and is rejected too
+    once it has waited `timeout` seconds.
+    """
+
+    def __init__(self, route_class, concurrency, queue_size, timeout, lock_dir, retry_after=2, poll_interval=0.02,
+                 max_poll_interval=0.5):
+        """
+        Args:
+            route_class: Label for metrics and the state file name
+            concurrency: Requests of this class running at once
+            queue_size: Requests of this class waiting at once, 0 to reject as soon as all slots are taken
+            timeout: Seconds a request may wait for a slot
+            lock_dir: Directory for the state file
+            retry_after: Seconds sent in Retry-After with rejections
+            poll_interval: Seconds before a waiting request first checks for a slot again
+            max_poll_interval: Longest backoff between checks
+        """
+        self.route_class = route_class
+        self.concurrency = concurrency
+        self.queue_size = queue_size
+        self.timeout = timeout
+        self.path = os.path.join(lock_dir, f"{route_class}.state")
+        self.retry_after = retry_after
+        self.poll_interval = poll_interval
+        self.max_poll_interval = max_poll_interval
+        self._fd = None
+        self._fd_pid = None
+        # flock is per open file, so threads (greenlets) of one worker also take this lock
+        self._lock = threading.Lock()
+        os.makedirs(lock_dir, exist_ok=True)
+
+    def _update(self, change):
+        """
+        Call change(state, pid) on the counts under the lock and save them.
+
+        state maps worker pids (as strings) to [running, waiting] counts.
+        """
+        with self._lock:
+            if self._fd_pid != os.getpid():
+                # A descriptor inherited over fork would share its lock with the parent
+                self._fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+                self._fd_pid = os.getpid()
+            fcntl.flock(self._fd, fcntl.LOCK_EX)
+            try:
+                data = os.pread(self._fd, 1 << 16, 0)
+                state = json.loads(data) if data else {}
+                result = change(state, str(os.getpid()))
+                data = json.dumps(state, separators=(',', ':')).encode('utf-8')
+                os.ftruncate(self._fd, len(data))
+                os.pwrite(self._fd, data, 0)
+                return result
+            finally:
+                fcntl.flock(self._fd, fcntl.LOCK_UN)
+
+    @staticmethod
+    def _drop_dead_workers(state, own_pid):
+        for pid in list(state):
+            if pid == own_pid:
+                continue
+            try:
+                os.kill(int(pid), 0)
+            except ProcessLookupError:
+                del state[pid]
+            except PermissionError:
+                pass
+
+    def _take_slot(self, state, pid, waiting):
+        """Count a running request for pid if a slot is free; a waiting request leaves the queue with it."""
+        if sum(counts[0] for counts in state.values()) >= self.concurrency:
+            self._drop_dead_workers(state, pid)
+            if sum(counts[0] for counts in state.values()) >= self.concurrency:
+                return False
+        counts = state.setdefault(pid, [0, 0])
+        counts[0] += 1
+        if waiting:
+            counts[1] -= 1
+        return True
+
+    def _enter(self, state, pid):
+        """Take a slot, or else a queue place. Returns 'slot', 'queued' or None."""
+        if self._take_slot(state, pid, waiting=False):
+            return 'slot'
+        if sum(counts[1] for counts in state.values()) >= self.queue_size:
+            return None
+        state.setdefault(pid, [0, 0])[1] += 1
+        return 'queued'
+
+    @staticmethod
+    def _leave(state, pid, running):
+        counts = state.get(pid)
+        if counts is None:
+            return
+        counts[0 if running else 1] = max(0, counts[0 if running else 1] - 1)
+        if counts == [0, 0]:
+            del state[pid]
+
+    def acquire(self):
+        """
+        Wait for a slot, to be given back with release().
+
+        Raises:
+            AdmissionRejected: If the queue is full or the wait timed out
+        """
+        entered = self._update(self._enter)
+        if entered == 'slot':
+            ADMISSION_WAIT.labels(self.route_class).observe(0)
+            return
+        if entered is None:
+            ADMISSION_SHED.labels(self.route_class, 'queue_full').inc()
+            raise AdmissionRejected(self.route_class, 'queue_full', self.retry_after)
+
+        start = time.monotonic()
+        delay = self.poll_interval
+        ADMISSION_QUEUE_DEPTH.labels(self.route_class).inc()
+        try:
+            while True:
+                remaining = self.timeout - (time.monotonic() - start)
+                if remaining <= 0:
+                    self._update(lambda state, pid: self._leave(state, pid, running=False))
+                    ADMISSION_SHED.labels(self.route_class, 'timeout').inc()
+                    raise AdmissionRejected(self.route_class, 'timeout', self.retry_after)
+                time.sleep(min(remaining, delay * random.uniform(0.5, 1.5)))
+                if self._update(lambda state, pid: self._take_slot(state, pid, waiting=True)):
+                    break
+                delay = min(self.max_poll_interval, delay * 2)
+        finally:
+            ADMISSION_QUEUE_DEPTH.labels(self.route_class).dec()
+        ADMISSION_WAIT.labels(self.route_class).observe(time.monotonic() - start)
+
+    def release(self):
+        self._update(lambda state, pid: self._leave(state, pid, running=True))
+
+class _Admission:
+    """A slot held by the current request, released once (when its response is closed or at teardown)."""
+
+    def __init__(self, queue):
+        self.queue = queue
+        ADMISSION_IN_FLIGHT.labels(queue.route_class).inc()
+
+    def release(self):
+        if self.queue is not None:
+            self.queue.release()
+            ADMISSION_IN_FLIGHT.labels(self.queue.route_class).dec()
+            self.queue = None
+
+def install_admission_control(app, concurrency, queue_size, timeout, lock_dir, retry_after=2):
+    """
+    Limit concurrent requests per route class (see ROUTE_CLASSES) in front of
+    every blueprint, answering 503 with Retry-After instead of letting heavy
+    routes take every worker.
+
+    Args:
+        concurrency, queue_size, timeout: Mappings of route class to its limit
+        lock_dir: Directory for the state files shared by the workers
+        retry_after: Seconds sent in Retry-After with rejections
+    """
+    if fcntl is None:
+        logger.warning("Admission control needs fcntl and is disabled on this platform")
+        return
+
+    queues = {
+        route_class: AdmissionQueue(route_class, int(concurrency[route_class]), int(queue_size.get(route_class, 0)),
+                                    timeout.get(route_class, 30), lock_dir, retry_after)
+        for route_class in set(ROUTE_CLASSES.values()) if route_class in concurrency
+    }
+
+    @app.before_request
+    def _admit():
+        route_class = ROUTE_CLASSES.get(request.url_rule.rule) if request.url_rule else None
+        queue = queues.get(route_class)
+        if queue is None:
+            return None
+        try:
+            queue.acquire()
+            g.admission = _Admission(queue)
+        except AdmissionRejected as e:
+            logger.warning("Request shed: %s", e, extra={'route_class': route_class, 'reason': e.reason})
+            response = jsonify({'error': str(e)})
+            response.status_code = 503
+            response.headers['Retry-After'] = str(e.retry_after)
+            # An unread body would reset a keep-alive connection under the client; read
+            # small ones, and close the connection instead of receiving large uploads
+            if (request.content_length or 0) <= DRAIN_MAX_BYTES:
+                request.get_data()
+            else:
+                response.headers['Connection'] = 'close'
+            return response
+        return None
+
+    @app.after_request
+    def _release_on_close(response):
+        # Generated responses keep their slot until the last chunk is sent. send_file
+        # bodies (direct passthrough) are handed to the server without close hooks;
+        # they are already rendered and release at teardown like everything else.
+        if response.is_streamed and not response.direct_passthrough:
+            admission = g.pop('admission', None)
+            if admission is not None:
+                response.call_on_close(admission.release)
+        return response
+
+    @app.teardown_request
+    def _release(exc):
+        admission = g.pop('admission', None)
+        if admission is not None:
+            admission.release()
@@ -1,15 +1,26 @@
 import os
-import requests
-import time
+import re
+import wave
+import logging
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from io import BytesIO
 from pathlib import Path
+from services.executor import run_blocking
+from services.metrics import stage
 
-def transcribe_audio(file_path, whisper_model_info):
+logger = logging.getLogger(__name__)
+
+def transcribe_audio(audio_source, whisper_model_info, filename=None, priority='interactive'):
     """
     Transcribe audio using OpenAI Whisper API (STT - Speech to Text)
     
     Args:
-        file_path: Path to audio file
+        audio_source: Path to audio file, or a binary stream such as an upload
         whisper_model_info: Dictionary containing model info from AIModels.get_whisper_model()
+        filename: Name sent to Whisper for format detection (defaults to the path's name)
+        priority: Rate limiter priority, 'interactive' or 'bulk'
     """
     try:
         if whisper_model_info.get('type') == 'openai_api':
@@ -22,52 +33,261 @@ def transcribe_audio(file_path, whisper_model_info):
                 'Authorization': f'Bearer {api_key}'
             }
             
-            with open(file_path, "rb") as audio_file:
+            client = whisper_model_info.get('client')
+            if client is None:
+                raise ValueError("Upstream HTTP client not available for audio transcription")
+            
+            model = whisper_model_info.get('model', 'whisper-1')
+            with _open_audio(audio_source) as audio_file:
                 files = {
-                    'file': audio_file,
-                    'model': (None, 'whisper-1'),
+                    'file': (filename or os.path.basename(getattr(audio_file, 'name', 'audio.wav')), audio_file),
+                    'model': (None, model),
                     'language': (None, 'ar')  # Arabic for better accuracy
                 }
                 
-                # Retry logic for rate limiting
-                max_retries = 3
-                base_delay = 1
-                
-                for attempt in range(max_retries):
-                    response = requests.post(
-                        'https://api.openai.com/v1/audio/transcriptions',
-                        headers=headers,
-                        files=files,
-                        timeout=60
-                    )
-                    
-                    if response.status_code == 200:
-                        result = response.json()
-                        return result.get('text', '')
-                    elif response.status_code == 429:
-                        if attempt < max_retries - 1:
-                            # Exponential backoff: wait 1s, 2s, 4s
-                            wait_time = base_delay * (2 ** attempt)
-                            print(f"Rate limit hit, waiting {wait_time} seconds before retry {attempt + 1}/{max_retries}")
-                            time.sleep(wait_time)
-                            continue
-                        else:
-                            raise Exception("Rate limit exceeded. Please wait a few minutes before trying again.")
-                    else:
-                        response.raise_for_status()  # Raise for other HTTP errors
+                # Pooled connection; rate limiting and retries are handled by the client
+                response = client.post(
+                    'openai',
+                    '/v1/audio/transcriptions',
+                    model=model,
+                    priority=priority,
+                    headers=headers,
+                    files=files
+                )
+                result = response.json()
+                return result.get('text', '')
                 
         else:
             raise ValueError("Unsupported whisper model type. Only OpenAI API is supported.")
                 
     except Exception as e:
-        print(f"Audio transcription error: {str(e)}")
+        logger.error("Audio transcription error: %s", e)
         raise Exception(f"Audio transcription failed: {str(e)}")
-    finally:
-        # Clean up uploaded file
-        if os.path.exists(file_path):
-            os.remove(file_path)
 
-def text_to_speech(text, voice="alloy", model="tts-1", api_key=None):
+@contextmanager
+def _open_audio(audio_source):
+    """Opens an audio path, or rewinds an already open binary stream."""
+    if isinstance(audio_source, (str, os.PathLike)):
+        with open(audio_source, "rb") as audio_file:
+            yield audio_file
+    else:
+        audio_source.seek(0)
+        yield audio_source
+
+# Whisper works on 16 kHz mono; segments are resampled to it so uploads stay small
+WHISPER_SAMPLE_RATE = 16000
+
+def _resample(samples, rate, target_rate):
+    """Linearly resample int16 samples from rate to target_rate."""
+    import numpy as np
+
+    if rate == target_rate or not len(samples):
+        return samples
+    target_length = max(1, int(len(samples) * target_rate / rate))
+    positions = np.arange(target_length) * (rate / target_rate)
+    return np.interp(positions, np.arange(len(samples)), samples).astype(np.int16)
+
+def _decode_audio(audio_source, filename, rate=WHISPER_SAMPLE_RATE):
+    """
+    Decode audio into mono 16-bit samples at the given sample rate.
+    WAV is read with the standard library; other formats need pydub (and ffmpeg).
+
+    Returns:
+        (numpy.ndarray, int): int16 samples and the sample rate
+    """
+    import numpy as np
+
+    with _open_audio(audio_source) as audio_file:
+        if filename.lower().endswith('.wav'):
+            try:
+                with wave.open(audio_file, 'rb') as wav:
+                    sample_width = wav.getsampwidth()
+                    channels = wav.getnchannels()
+                    wav_rate = wav.getframerate()
+                    frames = wav.readframes(wav.getnframes())
+                if sample_width == 2:
+                    samples = np.frombuffer(frames, dtype=np.int16)
+                elif sample_width == 1:
+                    samples = ((np.frombuffer(frames, dtype=np.uint8).astype(np.int16) - 128) << 8)
+                elif sample_width == 4:
+                    samples = (np.frombuffer(frames, dtype=np.int32) >> 16).astype(np.int16)
+                else:
+                    raise wave.Error(f"Unsupported sample width: {sample_width}")
+                if channels > 1:
+                    samples = samples.reshape(-1, channels).mean(axis=1).astype(np.int16)
+                return _resample(samples, wav_rate, rate), rate
+            except wave.Error:
+                # Browser recordings are often WebM/Ogg labelled as .wav
+                audio_file.seek(0)
+
+        # Optional import - only works if pydub and ffmpeg are installed
+        from pydub import AudioSegment
+        segment = AudioSegment.from_file(audio_file).set_channels(1).set_sample_width(2).set_frame_rate(rate)
+        return np.array(segment.get_array_of_samples(), dtype=np.int16), rate
+
+def _find_cut_points(samples, rate, segment_seconds, search_seconds, frame_ms=100):
+    """
+    Choose split positions roughly every segment_seconds, moved to the quietest
+    frame within search_seconds of the nominal position so words aren't cut.
+    """
+    import numpy as np
+
+    frame = max(1, int(rate * frame_ms / 1000))
+    n_frames = len(samples) // frame
+    if not n_frames:
+        return []
+    energy = (samples[:n_frames * frame].astype(np.float32).reshape(n_frames, frame) ** 2).mean(axis=1)
+
+    cuts = []
+    position = segment_seconds * rate
+    while position < len(samples) - search_seconds * rate:
+        low = max(int((position - search_seconds * rate) // frame), (cuts[-1] // frame + 1) if cuts else 0)
+        high = min(int((position + search_seconds * rate) // frame), n_frames)
+        if low < high:
+            # Quietest frame wins; among equally quiet frames, the one nearest the nominal cut
+            window = np.arange(low, high)
+            distance = np.abs(window * frame - position)
+            best = window[np.lexsort((distance, energy[low:high]))[0]]
+            position = int(best) * frame + frame // 2
+        cuts.append(int(position))
+        position += segment_seconds * rate
+    return cuts
+
+def _encode_wav(samples, rate):
+    """Encode mono int16 samples as an in-memory WAV file."""
+    buffer = BytesIO()
+    with wave.open(buffer, 'wb') as wav:
+        wav.setnchannels(1)
+        wav.setsampwidth(2)
+        wav.setframerate(rate)
+        wav.writeframes(samples.tobytes())
+    buffer.seek(0)
+    return buffer
+
+def _segment_bounds(samples, rate, segment_seconds, overlap_seconds, search_seconds):
+    """(start, end) sample ranges of overlapping segments, cut at silence where possible."""
+    bounds = [0] + _find_cut_points(samples, rate, segment_seconds, search_seconds) + [len(samples)]
+    overlap = int(overlap_seconds * rate)
+    return [(max(0, start - overlap), end) for start, end in zip(bounds, bounds[1:])]
+
+def _decode_and_split(audio_source, filename, segment_seconds, overlap_seconds, search_seconds=10):
+    """Decode audio and choose its segments; returns (samples, rate, bounds)."""
+    samples, rate = _decode_audio(audio_source, filename)
+    return samples, rate, _segment_bounds(samples, rate, segment_seconds, overlap_seconds, search_seconds)
+
+def split_audio(audio_source, filename, segment_seconds=120, overlap_seconds=2, search_seconds=10):
+    """
+    Split audio into overlapping 16 kHz mono WAV segments, cutting at silence where possible.
+    
+    Args:
+        audio_source: Path or binary stream
+        filename: Original file name (used to detect the format)
+        segment_seconds: Target segment length
+        overlap_seconds: Audio repeated at the start of each segment after the first
+        search_seconds: How far from the nominal cut to look for silence
+    
+    Yields:
+        BytesIO: WAV segments in playback order, each encoded when it is reached
+    """
+    samples, rate = _decode_audio(audio_source, filename)
+    for start, end in _segment_bounds(samples, rate, segment_seconds, overlap_seconds, search_seconds):
+        yield _encode_wav(samples[start:end], rate)
+
+_WORD_NORMALIZE_RE = re.compile(r'[^\w]+', re.UNICODE)
+
+def merge_transcripts(texts, max_overlap_words=30):
+    """
+    Join segment transcripts in order, dropping words repeated because of the
+    audio overlap (the longest suffix of the text so far that matches a prefix
+    of the next segment, compared case- and punctuation-insensitively).
+    """
+    merged = []
+    for text in texts:
+        words = text.split()
+        if not words:
+            continue
+
+        normalized_tail = [_WORD_NORMALIZE_RE.sub('', w).lower() for w in merged[-max_overlap_words:]]
+        normalized_head = [_WORD_NORMALIZE_RE.sub('', w).lower() for w in words[:max_overlap_words]]
+        duplicate = 0
+        for size in range(min(len(normalized_tail), len(normalized_head)), 0, -1):
+            if normalized_tail[-size:] == normalized_head[:size]:
+                duplicate = size
+                break
+        merged.extend(words[duplicate:])
+    return ' '.join(merged)
+
+def transcribe_audio_long(audio_source, whisper_model_info, filename, segment_seconds=120,
+                          overlap_seconds=2, max_parallel=4):
+    """
+    Transcribe long recordings by splitting them into overlapping segments and
+    sending the segments to Whisper concurrently.
+    
+    Args:
+        audio_source: Path to audio file, or a binary stream such as an upload
+        whisper_model_info: Dictionary containing model info from AIModels.get_whisper_model()
+        filename: Original file name (used to detect the format)
+        segment_seconds: Target segment length in seconds
+        overlap_seconds: Overlap between consecutive segments in seconds
+        max_parallel: Maximum number of concurrent Whisper requests
+    
+    Returns:
+        str: The stitched transcript
+    """
+    try:
+        with stage('long_audio', 'split'):
+            # Decoding, resampling and finding cuts are CPU bound; keep them off the event loop in async mode
+            samples, rate, bounds = run_blocking(_decode_and_split, audio_source, filename, segment_seconds,
+                                                 overlap_seconds)
+    except Exception as e:
+        # pydub not installed, ffmpeg missing or a format it can't decode: Whisper may still read the file
+        logger.warning("Could not split audio (%s: %s), transcribing in one request", type(e).__name__, e)
+        return transcribe_audio(audio_source, whisper_model_info, filename=filename)
+
+    # Each segment is encoded by the request that sends it, so only those in flight are held as WAV
+    transcribe_segment = lambda bound, priority: transcribe_audio(
+        _encode_wav(samples[bound[0]:bound[1]], rate), whisper_model_info, filename='segment.wav', priority=priority
+    )
+    if len(bounds) == 1:
+        return transcribe_segment(bounds[0], 'interactive')
+
+    logger.info("Transcribing %d audio segments with up to %d parallel requests", len(bounds), max_parallel)
+    with stage('long_audio', 'transcribe'), ThreadPoolExecutor(max_workers=max_parallel) as pool:
+        texts = list(pool.map(lambda bound: transcribe_segment(bound, 'bulk'), bounds))
+    with stage('long_audio', 'merge'):
+        return merge_transcripts(texts)
+
+def _request_speech(text, voice, model, api_key, client, stream=False, priority='interactive'):
+    """Send one request to the OpenAI speech endpoint and return the response."""
+    if not api_key:
+        raise ValueError("OpenAI API key is required for text-to-speech")
+    if client is None:
+        raise ValueError("Upstream HTTP client is required for text-to-speech")
+    
+    headers = {
+        'Authorization': f'Bearer {api_key}',
+        'Content-Type': 'application/json'
+    }
+    
+    payload = {
+        'model': model,
+        'input': text,
+        'voice': voice,
+        'response_format': 'mp3'
+    }
+    
+    # Pooled connection; rate limiting and retries are handled by the client
+    return client.post(
+        'openai',
+        '/v1/audio/speech',
+        model=model,
+        priority=priority,
+        headers=headers,
+        json=payload,
+        stream=stream
+    )
+
+def text_to_speech(text, voice="alloy", model="tts-1", api_key=None, client=None):
     """
     Convert text to speech using OpenAI TTS API (TTS - Text to Speech)
     Uses direct API calls to bypass OpenAI client initialization issues
@@ -77,57 +297,102 @@ def text_to_speech(text, voice="alloy", model="tts-1", api_key=None):
         voice: Voice to use (alloy, echo, fable, onyx, nova, shimmer)
         model: TTS model to use (tts-1 or tts-1-hd)
         api_key: OpenAI API key
+        client: Pooled UpstreamClient owned by AIModels
     
     Returns:
         bytes: Audio data in MP3 format
     """
     try:
-        if not api_key:
-            raise ValueError("OpenAI API key is required for text-to-speech")
-        
-        headers = {
-            'Authorization': f'Bearer {api_key}',
-            'Content-Type': 'application/json'
-        }
-        
-        payload = {
-            'model': model,
-            'input': text,
-            'voice': voice,
-            'response_format': 'mp3'
-        }
-        
-        # Retry logic for rate limiting
-        max_retries = 3
-        base_delay = 1
-        
-        for attempt in range(max_retries):
-            response = requests.post(
-                'https://api.openai.com/v1/audio/speech',
-                headers=headers,
-                json=payload,
-                timeout=60
-            )
-            
-            if response.status_code == 200:
-                return response.content
-            elif response.status_code == 429:
-                if attempt < max_retries - 1:
-                    # Exponential backoff: wait 1s, 2s, 4s
-                    wait_time = base_delay * (2 ** attempt)
-                    print(f"TTS rate limit hit, waiting {wait_time} seconds before retry {attempt + 1}/{max_retries}")
-                    time.sleep(wait_time)
-                    continue
-                else:
-                    raise Exception("Rate limit exceeded. Please wait a few minutes before trying TTS again.")
-            else:
-                response.raise_for_status()  # Raise for other HTTP errors
+        return _request_speech(text, voice, model, api_key, client).content
         
     except Exception as e:
-        print(f"Text-to-speech error: {str(e)}")
-        print(f"Error type: {type(e).__name__}")
+        logger.error("Text-to-speech error (%s): %s", type(e).__name__, e)
         raise Exception(f"Text-to-speech failed: {str(e)}")
 
+def split_tts_text(text, max_chars=1000, first_chars=200):
+    """
+    Split text at sentence boundaries into segments of at most max_chars.
+    The first segment is kept short so the first audio arrives quickly.
+    """
+    from services.pdf_service import chunk_text_by_sentence
+
+    segments = []
+    current = ""
+    for sentence in chunk_text_by_sentence(text):
+        limit = first_chars if not segments else max_chars
+        if current and len(current) + len(sentence) + 1 > limit:
+            segments.append(current)
+            current = ""
+        current = f"{current} {sentence}" if current else sentence
+        # A single sentence longer than the limit is cut at a word boundary
+        while len(current) > max_chars:
+            cut = current.rfind(' ', 0, max_chars)
+            cut = cut if cut > 0 else max_chars
+            segments.append(current[:cut])
+            current = current[cut:].lstrip()
+    if current:
+        segments.append(current)
+    return segments
+
+def iter_text_to_speech(text, voice="alloy", model="tts-1", api_key=None, client=None,
+                        chunk_size=16 * 1024, max_segment_chars=1000, max_parallel=3):
+    """
+    Stream MP3 audio for text as it is synthesized.
+    
+    The first sentence-bounded segment is streamed straight from OpenAI. Later
+    segments are synthesized in parallel (at most max_parallel ahead of playback)
+    and emitted in order, so memory per request stays bounded.
+    
+    Args:
+        text: Text to convert to speech
+        voice: Voice to use (alloy, echo, fable, onyx, nova, shimmer)
+        model: TTS model to use (tts-1 or tts-1-hd)
+        api_key: OpenAI API key
+        client: Pooled UpstreamClient owned by AIModels
+        chunk_size: Size of the chunks yielded to the client
+        max_segment_chars: Maximum characters per upstream request
+        max_parallel: Maximum segments synthesized ahead of playback
+    
+    Yields:
+        bytes: MP3 audio chunks
+    """
+    segments = split_tts_text(text, max_chars=max_segment_chars)
+    if not segments:
+        return
+
+    def synthesize(segment):
+        # Read-ahead segments yield to requests someone is waiting on
+        return _request_speech(segment, voice, model, api_key, client, priority='bulk').content
+
+    # Start the first request before any background work so errors surface immediately
+    first_response = _request_speech(segments[0], voice, model, api_key, client, stream=True)
+
+    pool = ThreadPoolExecutor(max_workers=max_parallel) if len(segments) > 1 else None
+    pending = deque()
+    next_segment = 1
+
+    def schedule():
+        nonlocal next_segment
+        while pool and next_segment < len(segments) and len(pending) < max_parallel:
+            pending.append(pool.submit(synthesize, segments[next_segment]))
+            next_segment += 1
+
+    try:
+        schedule()
+        with first_response:
+            for chunk in first_response.iter_content(chunk_size=chunk_size):
+                if chunk:
+                    yield chunk
+
+        while pending:
+            audio = pending.popleft().result()
+            schedule()
+            for offset in range(0, len(audio), chunk_size):
+                yield audio[offset:offset + chunk_size]
+    finally:
+        if pool:
+            pool.shutdown(wait=False, cancel_futures=True)
+
 def save_audio_file(audio_data, filename, upload_folder="uploads"):
     """
     Save audio data to file
@@ -150,5 +415,5 @@ def save_audio_file(audio_data, filename, upload_folder="uploads"):
         return file_path
         
     except Exception as e:
-        print(f"Audio file save error: {str(e)}")
+        logger.error("Audio file save error: %s", e)
         raise Exception(f"Failed to save audio file: {str(e)}")
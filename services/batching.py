@@ -0,0 +1,117 @@
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from services.metrics import BATCH_SIZE
+
+class MicroBatcher:
+    """
+    Dynamic batching across concurrent requests.
+
+    Request threads submit single items and block on a Future. A background
+    thread collects whatever has been submitted, waiting at most max_wait for
+    a batch to fill up, and hands up to max_batch_size items to process_batch
+    in one call, so concurrent requests share one model or API invocation.
+    Batches run on a pool of max_concurrent_batches threads, so a slow batch
+    does not hold up the ones collected after it; while every pool thread is
+    busy, new items keep accumulating into the next batch.
+
+    process_batch may return an Exception instance in place of a result to fail
+    only that item; raising fails the whole batch.
+    """
+
+    def __init__(self, process_batch, max_batch_size=16, max_wait=0.01, name='micro-batcher', max_concurrent_batches=1):
+        """
+        Args:
+            process_batch: Callable taking a list of items and returning a list of results in the same order
+            max_batch_size: Maximum items per process_batch call
+            max_wait: Seconds the first item of a batch waits for more items to arrive
+            name: Name of the background thread
+            max_concurrent_batches: process_batch calls running at once
+        """
+        self.process_batch = process_batch
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait
+        self.name = name
+        self.max_concurrent_batches = max_concurrent_batches
+        self._queue = deque()
+        self._condition = threading.Condition()
+        self._thread = None
+        self._pool = None
+        self._slots = None
+        self._pid = None
+
+    def _ensure_thread(self):
+        """Start the batching thread, again after a fork (threads do not survive it)."""
+        if self._thread is None or self._pid != os.getpid() or not self._thread.is_alive():
+            if self._pid != os.getpid():
+                self._queue = deque()
+                self._pool = ThreadPoolExecutor(self.max_concurrent_batches, thread_name_prefix=self.name)
+                self._slots = threading.BoundedSemaphore(self.max_concurrent_batches)
+            self._thread = threading.Thread(target=self._run, name=self.name, daemon=True)
+            self._pid = os.getpid()
+            self._thread.start()
+
+    def submit(self, item):
+        """Queue an item and return a Future for its result."""
+        future = Future()
+        with self._condition:
+            self._ensure_thread()
+            self._queue.append((item, future))
+            self._condition.notify()
+        return future
+
+    def process(self, item):
+        """Process one item as part of the next batch and return its result."""
+        return self.submit(item).result()
+
+    def process_many(self, items):
+        """Submit several items at once and return their results in order."""
+        futures = [self.submit(item) for item in items]
+        return [future.result() for future in futures]
+
+    def _next_batch(self):
+        with self._condition:
+            while not self._queue:
+                self._condition.wait()
+
+            deadline = time.monotonic() + self.max_wait
+            while len(self._queue) < self.max_batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                self._condition.wait(remaining)
+
+            return [self._queue.popleft() for _ in range(min(len(self._queue), self.max_batch_size))]
+
+    def _run(self):
+        while True:
+            # Collect the next batch only once a pool thread is free to run it
+            self._slots.acquire()
+            batch = [(item, future) for item, future in self._next_batch()
+                     if future.set_running_or_notify_cancel()]
+            if not batch:
+                self._slots.release()
+                continue
+            self._pool.submit(self._process, batch)
+
+    def _process(self, batch):
+        try:
+            BATCH_SIZE.labels(self.name).observe(len(batch))
+            try:
+                results = self.process_batch([item for item, _ in batch])
+                if len(results) != len(batch):
+                    raise ValueError(f"Batch returned {len(results)} results for {len(batch)} items")
+            except Exception as e:
+                for _, future in batch:
+                    future.set_exception(e)
+                return
+
+            for (_, future), result in zip(batch, results):
+                if isinstance(result, Exception):
+                    future.set_exception(result)
+                else:
+                    future.set_result(result)
+        finally:
+            self._slots.release()
@@ -0,0 +1,377 @@
+import hashlib
+import json
+import os
+import random
+import re
+import sqlite3
+import threading
+import time
+import unicodedata
+from services.metrics import CACHE_LOOKUPS
+
+class DiskCache:
+    """
+    Small key/value cache stored in SQLite so it is shared by all gunicorn workers.
+    Entries expire after a TTL and the least recently used ones are evicted once
+    the cache grows beyond max_entries or max_bytes.
+    """
+
+    # Run the (relatively expensive) eviction pass on roughly 1 in N writes
+    EVICT_EVERY = 32
+
+    # A hit only rewrites accessed_at when it is older than this, so most hits are plain reads
+    ACCESS_RESOLUTION = 60
+
+    # Hit/miss counters are kept per process and added to the shared stats row this often
+    STATS_FLUSH_SECONDS = 10
+
+    def __init__(self, path, ttl=None, max_entries=None, max_bytes=None, on_evict=None, name=None):
+        """
+        Args:
+            path: SQLite database file (created if missing)
+            ttl: Seconds an entry stays valid, None for no expiry
+            max_entries: Maximum number of entries kept, None for unbounded
+            max_bytes: Maximum total size of stored values, None for unbounded
+            on_evict: Optional callable receiving (key, value) pairs of removed entries,
+                      for caches whose values point at external files
+            name: Label for the cache lookup metrics, defaults to the file name
+        """
+        self.path = path
+        self.name = name or os.path.splitext(os.path.basename(path))[0]
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.on_evict = on_evict
+        self._local = threading.local()
+        self._pending_stats = {'hits': 0, 'misses': 0}
+        self._stats_flushed_at = time.monotonic()
+        self._stats_lock = threading.Lock()
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        # A connection must not cross fork() (gunicorn preload_app); close it in the
+        # parent beforehand, it is reopened on next use
+        if hasattr(os, 'register_at_fork'):
+            os.register_at_fork(before=self._close)
+
+        conn = self._connect()
+        with conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS entries ("
+                "key TEXT PRIMARY KEY, value BLOB NOT NULL, size INTEGER NOT NULL, "
+                "created_at REAL NOT NULL, accessed_at REAL NOT NULL)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS entries_accessed_at ON entries (accessed_at)")
+            conn.execute("CREATE TABLE IF NOT EXISTS stats (name TEXT PRIMARY KEY, value INTEGER NOT NULL)")
+            conn.execute("INSERT OR IGNORE INTO stats (name, value) VALUES ('hits', 0), ('misses', 0)")
+
+    def _close(self):
+        """Close the current thread's connection, if any."""
+        conn = getattr(self._local, 'conn', None)
+        if conn is not None:
+            conn.close()
+            self._local.conn = None
+
+    def _connect(self):
+        """Return a connection owned by the current thread and process."""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def get(self, key):
+        """Return the cached value for key, or None on a miss."""
+        conn = self._connect()
+        now = time.time()
+        expired = None
+        # A plain read in the common case; readers in every worker would otherwise queue on the write lock
+        row = conn.execute("SELECT value, created_at, accessed_at FROM entries WHERE key = ?", (key,)).fetchone()
+        if row is not None and self.ttl is not None and now - row[1] > self.ttl:
+            with conn:
+                # Unless another worker has just stored it again
+                conn.execute("DELETE FROM entries WHERE key = ? AND created_at = ?", (key, row[1]))
+            expired = [(key, row[0])]
+            row = None
+        elif row is not None and now - row[2] > self.ACCESS_RESOLUTION:
+            # LRU order only needs to be roughly right
+            with conn:
+                conn.execute("UPDATE entries SET accessed_at = ? WHERE key = ?", (now, key))
+
+        if expired and self.on_evict:
+            self.on_evict(expired)
+        CACHE_LOOKUPS.labels(self.name, 'hit' if row is not None else 'miss').inc()
+        self._count('hits' if row is not None else 'misses')
+        return row[0] if row is not None else None
+
+    def _count(self, counter):
+        """Count a lookup for stats(); the shared row is updated in batches (Prometheus has the live rates)."""
+        with self._stats_lock:
+            self._pending_stats[counter] += 1
+            if time.monotonic() - self._stats_flushed_at < self.STATS_FLUSH_SECONDS:
+                return
+        self._flush_stats()
+
+    def _flush_stats(self):
+        with self._stats_lock:
+            pending = self._pending_stats
+            self._pending_stats = {'hits': 0, 'misses': 0}
+            self._stats_flushed_at = time.monotonic()
+        if not any(pending.values()):
+            return
+        conn = self._connect()
+        with conn:
+            conn.executemany("UPDATE stats SET value = value + ? WHERE name = ?",
+                             [(count, name) for name, count in pending.items() if count])
+
+    def set(self, key, value, replace=True, size=None):
+        """
+        Store value (str or bytes) under key.
+
+        Args:
+            replace: When False an existing entry is kept as is
+            size: Bytes accounted against max_bytes, defaults to the size of value
+
+        Returns:
+            bool: False if replace is False and the key already existed
+        """
+        conn = self._connect()
+        now = time.time()
+        verb = "INSERT OR REPLACE" if replace else "INSERT OR IGNORE"
+        if size is None:
+            size = len(value.encode('utf-8')) if isinstance(value, str) else len(value)
+        with conn:
+            written = conn.execute(
+                f"{verb} INTO entries (key, value, size, created_at, accessed_at) VALUES (?, ?, ?, ?, ?)",
+                (key, value, size, now, now)
+            ).rowcount > 0
+
+        if random.randrange(self.EVICT_EVERY) == 0:
+            self.evict()
+        return written
+
+    def delete(self, key):
+        conn = self._connect()
+        with conn:
+            row = conn.execute("SELECT value FROM entries WHERE key = ?", (key,)).fetchone()
+            conn.execute("DELETE FROM entries WHERE key = ?", (key,))
+        if row is not None and self.on_evict:
+            self.on_evict([(key, row[0])])
+
+    def evict(self):
+        """Drop expired entries, then least recently used ones until the limits are met."""
+        conn = self._connect()
+        victims = []
+        with conn:
+            if self.ttl is not None:
+                cutoff = time.time() - self.ttl
+                victims.extend(conn.execute("SELECT key, value FROM entries WHERE created_at < ?", (cutoff,)).fetchall())
+                conn.execute("DELETE FROM entries WHERE created_at < ?", (cutoff,))
+
+            count, total_bytes = conn.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM entries").fetchone()
+            excess_entries = count - self.max_entries if self.max_entries is not None else 0
+            excess_bytes = total_bytes - self.max_bytes if self.max_bytes is not None else 0
+
+            if excess_entries > 0 or excess_bytes > 0:
+                lru = []
+                for key, value, size in conn.execute("SELECT key, value, size FROM entries ORDER BY accessed_at ASC"):
+                    if excess_entries <= 0 and excess_bytes <= 0:
+                        break
+                    lru.append((key, value))
+                    excess_entries -= 1
+                    excess_bytes -= size
+                conn.executemany("DELETE FROM entries WHERE key = ?", [(key,) for key, _ in lru])
+                victims.extend(lru)
+
+        if victims and self.on_evict:
+            self.on_evict(victims)
+
+    def stats(self):
+        """Return hit/miss counters (shared across workers, up to STATS_FLUSH_SECONDS behind) and current size."""
+        self._flush_stats()
+        conn = self._connect()
+        counters = dict(conn.execute("SELECT name, value FROM stats").fetchall())
+        count, total_bytes = conn.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM entries").fetchone()
+        lookups = counters.get('hits', 0) + counters.get('misses', 0)
+        return {
+            'hits': counters.get('hits', 0),
+            'misses': counters.get('misses', 0),
+            'hit_ratio': counters.get('hits', 0) / lookups if lookups else 0.0,
+            'entries': count,
+            'bytes': total_bytes
+        }
+
+_WHITESPACE_RE = re.compile(r'\s+')
+
+def normalize_text(text):
+    """Normalize text so trivially different copies of a sentence share one cache entry."""
+    return _WHITESPACE_RE.sub(' ', unicodedata.normalize('NFC', text)).strip()
+
+class TranslationMemory:
+    """
+    Translation memory in front of the Hugging Face models, keyed by normalized
+    source text, language pair and model URL.
+    """
+
+    def __init__(self, path, ttl=None, max_entries=None, max_bytes=None):
+        self.cache = DiskCache(path, ttl=ttl, max_entries=max_entries, max_bytes=max_bytes,
+                               name='translation_memory')
+
+    @staticmethod
+    def make_key(text, source_lang, target_lang, model_url):
+        raw = "\x1f".join([model_url, source_lang, target_lang, normalize_text(text)])
+        return hashlib.sha256(raw.encode('utf-8')).hexdigest()
+
+    def lookup(self, text, source_lang, target_lang, model_url):
+        """Return the remembered translation or None."""
+        return self.cache.get(self.make_key(text, source_lang, target_lang, model_url))
+
+    def store(self, text, source_lang, target_lang, model_url, translation, replace=True):
+        self.cache.set(self.make_key(text, source_lang, target_lang, model_url), translation, replace=replace)
+
+    def warm(self, file_path, resolve_model_url):
+        """
+        Seed the memory from a JSON file of known translations.
+
+        Args:
+            file_path: JSON list of {"text", "translation", "source_lang", "target_lang"} objects
+            resolve_model_url: Callable (source_lang, target_lang) -> model URL
+
+        Returns:
+            int: Number of entries loaded
+        """
+        with open(file_path, 'r', encoding='utf-8') as f:
+            entries = json.load(f)
+
+        loaded = 0
+        for entry in entries:
+            model_url = resolve_model_url(entry['source_lang'], entry['target_lang'])
+            # Never overwrite what workers have already learned
+            self.store(entry['text'], entry['source_lang'], entry['target_lang'], model_url,
+                       entry['translation'], replace=False)
+            loaded += 1
+        return loaded
+
+    def stats(self):
+        return self.cache.stats()
+
+def hash_file(source, chunk_size=1024 * 1024):
+    """Returns the SHA-256 hex digest of a file path or binary stream, read in chunks."""
+    digest = hashlib.sha256()
+    if isinstance(source, (str, os.PathLike)):
+        with open(source, 'rb') as f:
+            for chunk in iter(lambda: f.read(chunk_size), b''):
+                digest.update(chunk)
+    else:
+        source.seek(0)
+        for chunk in iter(lambda: source.read(chunk_size), b''):
+            digest.update(chunk)
+        source.seek(0)
+    return digest.hexdigest()
+
+class ExtractionCache:
+    """
+    Cache of PDF extraction results keyed by the SHA-256 of the uploaded bytes
+    and the extraction method (text layer, or OCR with its language and DPI).
+    """
+
+    def __init__(self, path, ttl=None, max_entries=None, max_bytes=None):
+        self.cache = DiskCache(path, ttl=ttl, max_entries=max_entries, max_bytes=max_bytes,
+                               name='pdf_extraction')
+
+    @staticmethod
+    def make_key(file_hash, method):
+        return f"{method}:{file_hash}"
+
+    def lookup(self, file_hash, method):
+        """Return the cached list of sentences or None."""
+        value = self.cache.get(self.make_key(file_hash, method))
+        return json.loads(value) if value is not None else None
+
+    def store(self, file_hash, method, sentences):
+        self.cache.set(self.make_key(file_hash, method), json.dumps(sentences, ensure_ascii=False))
+
+    def stats(self):
+        return self.cache.stats()
+
+class AudioCache:
+    """
+    Content-addressed cache of synthesized speech. Clips are stored as files
+    (so they can be served with sendfile and HTTP Range) and indexed in a
+    DiskCache that enforces the TTL and the size-capped LRU eviction.
+    """
+
+    def __init__(self, directory, ttl=None, max_bytes=None):
+        # Absolute, since Flask resolves relative send_file paths against the app root
+        self.directory = os.path.abspath(directory)
+        os.makedirs(directory, exist_ok=True)
+        self.cache = DiskCache(os.path.join(directory, 'index.sqlite3'), ttl=ttl, max_bytes=max_bytes,
+                               on_evict=self._remove_files, name='tts_audio')
+
+    @staticmethod
+    def make_key(text, voice, model, audio_format='mp3'):
+        raw = "\x1f".join([model, voice, audio_format, text])
+        return hashlib.sha256(raw.encode('utf-8')).hexdigest()
+
+    def path_for(self, key):
+        return os.path.join(self.directory, key[:2], f"{key}.mp3")
+
+    def lookup(self, key):
+        """Return the path of the cached clip, or None."""
+        if self.cache.get(key) is None:
+            return None
+        path = self.path_for(key)
+        return path if os.path.exists(path) else None
+
+    def store(self, key, audio_data):
+        """Store a complete clip and return its path."""
+        return self.store_stream(key, [audio_data], passthrough=False)
+
+    def store_stream(self, key, chunks, passthrough=True):
+        """
+        Write chunks to the cache as they are produced. The clip only becomes
+        visible once the stream has completed, so aborted streams leave nothing behind.
+
+        Returns:
+            A generator re-yielding the chunks when passthrough is True, otherwise the stored path
+        """
+        writer = self._write_chunks(key, chunks)
+        if passthrough:
+            return writer
+        for _ in writer:
+            pass
+        return self.path_for(key)
+
+    def _write_chunks(self, key, chunks):
+        path = self.path_for(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        temp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        size = 0
+        completed = False
+        try:
+            with open(temp_path, 'wb') as f:
+                for chunk in chunks:
+                    f.write(chunk)
+                    size += len(chunk)
+                    yield chunk
+            os.replace(temp_path, path)
+            completed = True
+            self.cache.set(key, os.path.basename(path), size=size)
+        finally:
+            if not completed and os.path.exists(temp_path):
+                os.remove(temp_path)
+
+    def _remove_files(self, entries):
+        for key, _ in entries:
+            try:
+                os.remove(self.path_for(key))
+            except FileNotFoundError:
+                pass
+
+    def stats(self):
+        return self.cache.stats()
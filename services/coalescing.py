@@ -0,0 +1,137 @@
+import hashlib
+import os
+import threading
+import time
+from concurrent.futures import Future
+from services.metrics import COALESCED_REQUESTS
+
+try:
+    import fcntl
+except ImportError:  # Windows: coalescing stays within the worker process
+    fcntl = None
+
+class SingleFlight:
+    """
+    Coalesces identical concurrent calls.
+
+    Within a worker, the first caller for a key runs the call and later callers
+    with the same key wait for its result (or exception) instead of making their
+    own. Across gunicorn workers, best effort: the caller holds a file lock for
+    the key while it runs, and a caller in another worker that had to wait for
+    that lock first checks the shared cache (the `lookup` callable) before
+    calling upstream itself.
+
+    Each key gets its own lock file, named by the key's full hash and removed
+    when the call ends, so unrelated calls never wait on each other.
+    """
+
+    def __init__(self, name, lock_dir=None, lock_timeout=5, poll_interval=0.02):
+        """
+        Args:
+            name: Label for metrics
+            lock_dir: Directory for the cross-worker lock files, None to coalesce within the worker only
+            lock_timeout: Seconds to wait for another worker before calling anyway; about the
+                upstream p99, well under the worker timeout
+            poll_interval: Seconds between attempts to take a held lock
+        """
+        self.name = name
+        self.lock_dir = lock_dir if fcntl else None
+        self.lock_timeout = lock_timeout
+        self.poll_interval = poll_interval
+        self._calls = {}
+        self._lock = threading.Lock()
+        if self.lock_dir:
+            os.makedirs(self.lock_dir, exist_ok=True)
+
+    def do(self, key, fn, lookup=None):
+        """
+        Return fn(), shared with every identical call already in flight.
+
+        Args:
+            key: Identity of the call (e.g. a cache key)
+            fn: Makes the call; should store its result where lookup finds it
+            lookup: Optional callable returning a result another worker stored, or None
+        """
+        with self._lock:
+            future = self._calls.get(key)
+            leader = future is None
+            if leader:
+                future = self._calls[key] = Future()
+
+        if not leader:
+            COALESCED_REQUESTS.labels(self.name, 'thread').inc()
+            return future.result()
+
+        try:
+            result = self._run(key, fn, lookup)
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        else:
+            future.set_result(result)
+            return result
+        finally:
+            with self._lock:
+                del self._calls[key]
+
+    def _run(self, key, fn, lookup):
+        if not self.lock_dir or lookup is None:
+            return fn()
+
+        path = os.path.join(self.lock_dir, f"{self.name}-{hashlib.sha256(key.encode('utf-8')).hexdigest()}.lock")
+        fd, waited = self._acquire(path)
+        try:
+            if waited:
+                # Another worker held the lock, most likely making this very call
+                result = lookup()
+                if result is not None:
+                    COALESCED_REQUESTS.labels(self.name, 'worker').inc()
+                    return result
+            return fn()
+        finally:
+            if fd is not None:
+                # Removed while still locked, so a waiter that then gets the lock on
+                # the old file sees it is stale and moves on to a new one
+                try:
+                    os.unlink(path)
+                except FileNotFoundError:
+                    pass
+                os.close(fd)
+
+    def _acquire(self, path):
+        """
+        Lock the key's file, polling so gevent workers keep serving.
+
+        Returns:
+            tuple: (fd of the locked file, or None after lock_timeout; whether another caller held it)
+        """
+        deadline = time.monotonic() + self.lock_timeout
+        waited = False
+        fd = None
+        try:
+            while True:
+                if fd is None:
+                    fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o644)
+                try:
+                    fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                except BlockingIOError:
+                    if time.monotonic() >= deadline:
+                        os.close(fd)
+                        fd = None
+                        return None, True
+                    waited = True
+                    time.sleep(self.poll_interval)
+                    continue
+                try:
+                    if os.stat(path).st_ino == os.fstat(fd).st_ino:
+                        return fd, waited
+                except FileNotFoundError:
+                    pass
+                # The holder removed this file when it finished; lock the current one instead
+                waited = True
+                os.close(fd)
+                fd = None
+        except BaseException:
+            if fd is not None:
+                os.close(fd)
+            raise
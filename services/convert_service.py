@@ -1,18 +1,14 @@
 import os
+import re
+import zipfile
+from functools import lru_cache
+from importlib.util import find_spec
 from io import BytesIO
-from flask import send_file, jsonify, make_response
-from docx import Document
-from fpdf import FPDF
-import arabic_reshaper
-from bidi.algorithm import get_display
-from reportlab.pdfgen import canvas
-from reportlab.lib.pagesizes import A4
-from reportlab.pdfbase.ttfonts import TTFont
-from reportlab.pdfbase import pdfmetrics
-from reportlab.lib import colors
-from reportlab.platypus import Table, TableStyle
-from reportlab.platypus import SimpleDocTemplate, Paragraph
-from reportlab.lib.styles import getSampleStyleSheet
+from tempfile import SpooledTemporaryFile
+from flask import send_file, jsonify, make_response, Response
+from services.executor import run_blocking
+from services.zip_stream import iter_zip, xml_text
+from services.metrics import stage, timed_iter
 
 def format_text(text, language):
     """Format text for proper display based on language."""
@@ -20,134 +16,337 @@ def format_text(text, language):
         return reshape_arabic(text)
     return text
 
+# Fields of a chat_data item used by the exports
+CHAT_FIELDS = ('original', 'translated', 'source_lang', 'target_lang')
+
+def normalize_chat_data(chat_data):
+    """
+    Check chat data before an export starts and coerce its values to strings, so
+    a streamed export can't fail after its headers have gone out.
+
+    Raises:
+        ValueError: If chat_data is not a list of objects
+    """
+    if not isinstance(chat_data, list):
+        raise ValueError("chat_data must be a list")
+    items = []
+    for index, item in enumerate(chat_data):
+        if not isinstance(item, dict):
+            raise ValueError(f"chat_data item {index} must be an object")
+        items.append({key: '' if item.get(key) is None else str(item[key]) for key in CHAT_FIELDS})
+    return items
+
+XLSX_MIMETYPE = 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+
+EXCEL_COLUMNS = [
+    ('Original Text', 'original'),
+    ('Translated Text', 'translated'),
+    ('Source Language', 'source_lang'),
+    ('Target Language', 'target_lang')
+]
+
+_XLSX_STATIC_PARTS = {
+    '[Content_Types].xml': (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+        '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+        '<Default Extension="xml" ContentType="application/xml"/>'
+        '<Override PartName="/xl/workbook.xml" ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>'
+        '<Override PartName="/xl/worksheets/sheet1.xml" ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>'
+        '<Override PartName="/xl/styles.xml" ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.styles+xml"/>'
+        '</Types>'
+    ),
+    '_rels/.rels': (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+        '<Relationship Id="rId1" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument" Target="xl/workbook.xml"/>'
+        '</Relationships>'
+    ),
+    'xl/workbook.xml': (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<workbook xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main" '
+        'xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships">'
+        '<sheets><sheet name="Translations" sheetId="1" r:id="rId1"/></sheets>'
+        '</workbook>'
+    ),
+    'xl/_rels/workbook.xml.rels': (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+        '<Relationship Id="rId1" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/worksheet" Target="worksheets/sheet1.xml"/>'
+        '<Relationship Id="rId2" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/styles" Target="styles.xml"/>'
+        '</Relationships>'
+    ),
+    # Style 1 is the bold header
+    'xl/styles.xml': (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<styleSheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main">'
+        '<fonts count="2"><font><sz val="11"/><name val="Calibri"/></font>'
+        '<font><b/><sz val="11"/><name val="Calibri"/></font></fonts>'
+        '<fills count="2"><fill><patternFill patternType="none"/></fill><fill><patternFill patternType="gray125"/></fill></fills>'
+        '<borders count="1"><border><left/><right/><top/><bottom/><diagonal/></border></borders>'
+        '<cellStyleXfs count="1"><xf numFmtId="0" fontId="0" fillId="0" borderId="0"/></cellStyleXfs>'
+        '<cellXfs count="2"><xf numFmtId="0" fontId="0" fillId="0" borderId="0" xfId="0"/>'
+        '<xf numFmtId="0" fontId="1" fillId="0" borderId="0" xfId="0" applyFont="1"/></cellXfs>'
+        '<cellStyles count="1"><cellStyle name="Normal" xfId="0" builtinId="0"/></cellStyles>'
+        '</styleSheet>'
+    )
+}
+
+def _excel_row(row_number, values, style=None):
+    style_attr = f' s="{style}"' if style else ''
+    cells = ''.join(
+        f'<c r="{column}{row_number}" t="inlineStr"{style_attr}><is><t xml:space="preserve">{xml_text(value)}</t></is></c>'
+        for column, value in zip('ABCD', values)
+    )
+    return f'<row r="{row_number}">{cells}</row>'
+
+def _iter_excel_sheet(chat_data, rows_per_chunk=200):
+    """Yields the worksheet XML, writing rows straight from chat_data."""
+    yield (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<worksheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main">'
+        '<cols><col min="1" max="2" width="60" customWidth="1"/><col min="3" max="4" width="18" customWidth="1"/></cols>'
+        '<sheetData>' + _excel_row(1, [title for title, _ in EXCEL_COLUMNS], style=1)
+    ).encode('utf-8')
+
+    rows = []
+    for row_number, item in enumerate(chat_data, 2):
+        rows.append(_excel_row(row_number, [item.get(key, '') for _, key in EXCEL_COLUMNS]))
+        if len(rows) >= rows_per_chunk:
+            yield ''.join(rows).encode('utf-8')
+            rows = []
+    rows.append('</sheetData></worksheet>')
+    yield ''.join(rows).encode('utf-8')
+
+def iter_excel(chat_data):
+    """Stream chat data as an .xlsx workbook, yielding the file while it is produced."""
+    entries = [(name, xml.encode('utf-8')) for name, xml in _XLSX_STATIC_PARTS.items()]
+    entries.append(('xl/worksheets/sheet1.xml', _iter_excel_sheet(chat_data)))
+    return iter_zip(entries)
+
+def render_excel(chat_data):
+    """Render chat data as an Excel workbook."""
+    output = BytesIO()
+    for chunk in iter_excel(chat_data):
+        output.write(chunk)
+    output.seek(0)
+    return output
+
 def export_to_excel(chat_data):
-    """Export chat data to Excel format. Requires pandas and openpyxl."""
+    """Export chat data to Excel format, streaming the workbook as it is written."""
+    # Bad input has to be answered before the first byte; later errors can only cut the download short
     try:
-        # Optional import - only works if packages are installed
-        import pandas as pd
-        
-        # Prepare data for Excel
-        data = []
-        for item in chat_data:
-            data.append({
-                'Original Text': item.get('original', ''),
-                'Translated Text': item.get('translated', ''),
-                'Source Language': item.get('source_lang', ''),
-                'Target Language': item.get('target_lang', '')
-            })
-        
-        # Create DataFrame
-        df = pd.DataFrame(data)
-        
-        # Create Excel file in memory
-        output = BytesIO()
-        with pd.ExcelWriter(output, engine='openpyxl') as writer:
-            df.to_excel(writer, sheet_name='Translations', index=False)
-        
-        output.seek(0)
-        
-        response = make_response(send_file(
-            output,
-            as_attachment=True,
-            download_name='chat_translations.xlsx',
-            mimetype='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+        chat_data = normalize_chat_data(chat_data)
+    except ValueError as e:
+        return jsonify({'error': f'Failed to export to Excel: {str(e)}'}), 400
+
+    return Response(
+        timed_iter(iter_excel(chat_data), 'export', 'excel'),
+        mimetype=XLSX_MIMETYPE,
+        headers={'Content-Disposition': 'attachment; filename=chat_translations.xlsx'}
+    )
+
+DOCX_MIMETYPE = 'application/vnd.openxmlformats-officedocument.wordprocessingml.document'
+
+# python-docx's blank document; every part except the body is used as is. Located
+# without importing python-docx, which would load lxml into every worker.
+DOCX_TEMPLATE_PATH = os.path.join(find_spec('docx').submodule_search_locations[0], 'templates', 'default.docx')
+
+_DOCX_RUN_SPECIALS_RE = re.compile(r'([\t\n\r])')
+
+@lru_cache(maxsize=None)
+def _docx_template():
+    """
+    Returns (parts, body_start, body_end): the template's parts in archive order
+    with None in place of word/document.xml, and that part split around its body.
+    """
+    with zipfile.ZipFile(DOCX_TEMPLATE_PATH) as template:
+        parts = [(info.filename, None if info.filename == 'word/document.xml' else template.read(info))
+                 for info in template.infolist()]
+        document = template.read('word/document.xml').decode('utf-8')
+    body_start = document.index('<w:body>') + len('<w:body>')
+    body_end = document.index('<w:sectPr')
+    return parts, document[:body_start].encode('utf-8'), document[body_end:].encode('utf-8')
+
+def _docx_run(text, bold=False):
+    """A w:r element for text, with tabs and line breaks handled the way python-docx's add_run does."""
+    content = []
+    for piece in _DOCX_RUN_SPECIALS_RE.split(str(text)):
+        if piece == '\t':
+            content.append('<w:tab/>')
+        elif piece in ('\n', '\r'):
+            content.append('<w:br/>')
+        elif piece:
+            space = ' xml:space="preserve"' if piece[0].isspace() or piece[-1].isspace() else ''
+            content.append(f'<w:t{space}>{xml_text(piece)}</w:t>')
+    run_properties = '<w:rPr><w:b/></w:rPr>' if bold else ''
+    return f'<w:r>{run_properties}{"".join(content)}</w:r>'
+
+def _docx_labelled_paragraph(label, text):
+    return f'<w:p>{_docx_run(label, bold=True)}{_docx_run(text)}</w:p>'
+
+def _iter_word_body(chat_data, items_per_chunk=200):
+    """Yields word/document.xml, writing the paragraphs straight from chat_data."""
+    _, body_start, body_end = _docx_template()
+    yield body_start + (
+        '<w:p><w:pPr><w:pStyle w:val="Title"/><w:jc w:val="center"/></w:pPr>'
+        '<w:r><w:t>Translation Results</w:t></w:r></w:p>'
+    ).encode('utf-8')
+
+    separator = f'<w:p>{_docx_run("─" * 50)}</w:p>'
+    paragraphs = []
+    for i, item in enumerate(chat_data, 1):
+        paragraphs.append(
+            f'<w:p><w:pPr><w:pStyle w:val="Heading1"/></w:pPr><w:r><w:t>Translation {i}</w:t></w:r></w:p>'
+        )
+        paragraphs.append(_docx_labelled_paragraph('Original: ', item.get('original', '')))
+        paragraphs.append(_docx_labelled_paragraph('Translated: ', item.get('translated', '')))
+        paragraphs.append(_docx_labelled_paragraph(
+            'Language Pair: ', f"{item.get('source_lang', '')} → {item.get('target_lang', '')}"
         ))
-        
-        return response
-        
-    except ImportError:
-        return jsonify({
-            'error': 'Excel export not available. Install pandas and openpyxl for Excel export functionality.',
-            'message': 'Run: pip install pandas openpyxl'
-        }), 400
-    except Exception as e:
-        return jsonify({'error': f'Failed to export to Excel: {str(e)}'}), 500
+        paragraphs.append(separator)
+        if i % items_per_chunk == 0:
+            yield ''.join(paragraphs).encode('utf-8')
+            paragraphs = []
+    yield ''.join(paragraphs).encode('utf-8') + body_end
+
+def iter_word(chat_data):
+    """Stream chat data as a .docx document, yielding the file while it is produced."""
+    parts, _, _ = _docx_template()
+    return iter_zip(
+        (name, _iter_word_body(chat_data) if content is None else content)
+        for name, content in parts
+    )
+
+def render_word(chat_data):
+    """Render chat data as a Word document."""
+    output = BytesIO()
+    for chunk in iter_word(chat_data):
+        output.write(chunk)
+    output.seek(0)
+    return output
 
 def export_to_word(chat_data):
-    """Export chat data to Word document format."""
+    """Export chat data to Word document format, streaming the document as it is written."""
+    # Bad input has to be answered before the first byte; later errors can only cut the download short
     try:
-        doc = Document()
-        
-        # Add title
-        title = doc.add_heading('Translation Results', 0)
-        title.alignment = 1  # Center alignment
-        
-        # Add content
-        for i, item in enumerate(chat_data, 1):
-            # Add entry number
-            doc.add_heading(f'Translation {i}', level=1)
-            
-            # Original text
-            original_para = doc.add_paragraph()
-            original_para.add_run('Original: ').bold = True
-            original_para.add_run(item.get('original', ''))
-            
-            # Translated text
-            translated_para = doc.add_paragraph()
-            translated_para.add_run('Translated: ').bold = True
-            translated_para.add_run(item.get('translated', ''))
-            
-            # Languages
-            lang_para = doc.add_paragraph()
-            lang_para.add_run('Language Pair: ').bold = True
-            lang_para.add_run(f"{item.get('source_lang', '')} → {item.get('target_lang', '')}")
-            
-            doc.add_paragraph('─' * 50)  # Separator
-        
-        # Save to BytesIO
-        output = BytesIO()
-        doc.save(output)
-        output.seek(0)
-        
-        response = make_response(send_file(
-            output,
-            as_attachment=True,
-            download_name='chat_translations.docx',
-            mimetype='application/vnd.openxmlformats-officedocument.wordprocessingml.document'
-        ))
-        
-        return response
+        chat_data = normalize_chat_data(chat_data)
+    except ValueError as e:
+        return jsonify({'error': f'Failed to export to Word: {str(e)}'}), 400
+
+    return Response(
+        timed_iter(iter_word(chat_data), 'export', 'word'),
+        mimetype=DOCX_MIMETYPE,
+        headers={'Content-Disposition': 'attachment; filename=chat_translations.docx'}
+    )
+
+FONTS_DIR = os.path.join(os.path.dirname(__file__), 'fonts')
+
+# Rows per table chunk, about what fits on one A4 page with the default styles
+PDF_TABLE_ROWS_PER_PAGE = 40
+
+# Finished PDFs larger than this are spooled to a temporary file instead of memory.
+# ReportLab keeps every page until doc.build() returns and writes the document in
+# one go at the end (the cross-reference table needs all object offsets), so a PDF
+# can't be sent page by page; spooling at least keeps large ones out of RAM.
+PDF_SPOOL_MAX_MEMORY = 2 * 1024 * 1024
+
+@lru_cache(maxsize=None)
+def register_fonts():
+    """
+    Register the bundled fonts with ReportLab, once per process.
+
+    Returns:
+        str: Font name to use for user text (DejaVuSans covers Arabic, Helvetica does not)
+    """
+    # ReportLab is imported on first use, so workers that never export don't load it
+    from reportlab.pdfbase import pdfmetrics
+    from reportlab.pdfbase.ttfonts import TTFont
+
+    body_font = 'Helvetica'
+    for name, filename in [('DejaVuSans', 'DejaVuSans.ttf'), ('arial', 'arial.ttf')]:
+        font_path = os.path.join(FONTS_DIR, filename)
+        if os.path.exists(font_path):
+            pdfmetrics.registerFont(TTFont(name, font_path))
+            if body_font == 'Helvetica':
+                body_font = name
+    
+    if body_font != 'Helvetica':
+        # Only the regular faces are bundled; the (ASCII) bold labels use Helvetica-Bold
+        pdfmetrics.registerFontFamily(body_font, normal=body_font, bold='Helvetica-Bold',
+                           italic=body_font, boldItalic='Helvetica-Bold')
+    return body_font
+
+@lru_cache(maxsize=None)
+def _pdf_table_style(font):
+    from reportlab.lib import colors
+    from reportlab.platypus import TableStyle
+
+    return TableStyle([
+        ('BACKGROUND', (0, 0), (-1, 0), colors.grey),
+        ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
+        ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
+        ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+        ('FONTNAME', (0, 1), (-1, -1), font),
+        ('FONTSIZE', (0, 0), (-1, 0), 12),
+        ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
+        ('BACKGROUND', (0, 1), (-1, -1), colors.beige),
+        ('GRID', (0, 0), (-1, -1), 1, colors.black)
+    ])
+
+def _pdf_table_chunk(rows, font):
+    """One page worth of table rows under the column header."""
+    from reportlab.platypus import Table
+
+    data = [['Original Text', 'Translated Text', 'Language Pair']] + rows
+    table = Table(data, colWidths=[150, 150, 100], repeatRows=1)
+    table.setStyle(_pdf_table_style(font))
+    return table
+
+@lru_cache(maxsize=None)
+def _pdf_text_styles(font):
+    from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
+
+    styles = getSampleStyleSheet()
+    styles.add(ParagraphStyle('Body', parent=styles['Normal'], fontName=font))
+    return styles
+
+def render_pdf_table(chat_data):
+    """Render chat data as a PDF with table format, into a spooled file that is complete when returned."""
+    from reportlab.lib.pagesizes import A4
+    from reportlab.platypus import SimpleDocTemplate
+
+    font = register_fonts()
+    buffer = SpooledTemporaryFile(max_size=PDF_SPOOL_MAX_MEMORY)
+    doc = SimpleDocTemplate(buffer, pagesize=A4)
+    
+    # Lay the table out in page-sized chunks: ReportLab measures (and re-splits)
+    # a single Table as a whole, which gets slower with every page added
+    story = []
+    rows = []
+    for item in chat_data:
+        original = format_text(item.get('original', ''), item.get('source_lang', ''))
+        translated = format_text(item.get('translated', ''), item.get('target_lang', ''))
+        lang_pair = f"{item.get('source_lang', '')} → {item.get('target_lang', '')}"
         
-    except Exception as e:
-        return jsonify({'error': f'Failed to export to Word: {str(e)}'}), 500
+        rows.append([original, translated, lang_pair])
+        if len(rows) == PDF_TABLE_ROWS_PER_PAGE:
+            story.append(_pdf_table_chunk(rows, font))
+            rows = []
+    
+    if rows or not story:
+        story.append(_pdf_table_chunk(rows, font))
+    
+    # Build PDF
+    doc.build(story)
+    buffer.seek(0)
+    return buffer
 
 def export_to_pdf_table(chat_data):
     """Export chat data to PDF with table format."""
     try:
-        print(f"[DEBUG] Received chat_data: {chat_data}")  # Debug log
-        print(f"[DEBUG] Chat data type: {type(chat_data)}")  # Debug log
-        print(f"[DEBUG] Chat data length: {len(chat_data) if chat_data else 0}")  # Debug log
-        
-        buffer = BytesIO()
-        doc = SimpleDocTemplate(buffer, pagesize=A4)
-        
-        # Prepare data for table
-        data = [['Original Text', 'Translated Text', 'Language Pair']]
-        
-        for i, item in enumerate(chat_data):
-            print(f"[DEBUG] Processing item {i}: {item}")  # Debug log
-            original = format_text(item.get('original', ''), item.get('source_lang', ''))
-            translated = format_text(item.get('translated', ''), item.get('target_lang', ''))
-            lang_pair = f"{item.get('source_lang', '')} → {item.get('target_lang', '')}"
-            
-            data.append([original, translated, lang_pair])
-        
-        # Create table
-        table = Table(data, colWidths=[150, 150, 100])
-        table.setStyle(TableStyle([
-            ('BACKGROUND', (0, 0), (-1, 0), colors.grey),
-            ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
-            ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
-            ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-            ('FONTSIZE', (0, 0), (-1, 0), 12),
-            ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
-            ('BACKGROUND', (0, 1), (-1, -1), colors.beige),
-            ('GRID', (0, 0), (-1, -1), 1, colors.black)
-        ]))
-        
-        # Build PDF
-        doc.build([table])
-        buffer.seek(0)
+        with stage('export', 'pdf_table'):
+            buffer = run_blocking(render_pdf_table, chat_data)
         
         response = make_response(send_file(
             buffer,
@@ -165,51 +364,55 @@ def export_to_word_text(chat_data):
     """Export chat data to Word document with text format."""
     return export_to_word(chat_data)  # Same implementation
 
-def export_to_pdf_text(chat_data):
-    """Export chat data to PDF with text format."""
-    try:
-        print(f"[DEBUG] PDF Text - Received chat_data: {chat_data}")  # Debug log
-        print(f"[DEBUG] PDF Text - Chat data type: {type(chat_data)}")  # Debug log
-        print(f"[DEBUG] PDF Text - Chat data length: {len(chat_data) if chat_data else 0}")  # Debug log
+def render_pdf_text(chat_data):
+    """Render chat data as a PDF with text format, into a spooled file that is complete when returned."""
+    from reportlab.lib.pagesizes import A4
+    from reportlab.platypus import SimpleDocTemplate, Paragraph
+
+    styles = _pdf_text_styles(register_fonts())
+    buffer = SpooledTemporaryFile(max_size=PDF_SPOOL_MAX_MEMORY)
+    doc = SimpleDocTemplate(buffer, pagesize=A4)
+    story = []
+    
+    # Add title
+    title = Paragraph("Translation Results", styles['Title'])
+    story.append(title)
+    
+    # Add content
+    for i, item in enumerate(chat_data, 1):
+        # Entry header
+        header = Paragraph(f"Translation {i}", styles['Heading1'])
+        story.append(header)
         
-        buffer = BytesIO()
-        doc = SimpleDocTemplate(buffer, pagesize=A4)
-        styles = getSampleStyleSheet()
-        story = []
+        # Paragraph text is markup, so user text has to be escaped
+        original = xml_text(format_text(item.get('original', ''), item.get('source_lang', '')))
+        original_para = Paragraph(f"<b>Original:</b> {original}", styles['Body'])
+        story.append(original_para)
         
-        # Add title
-        title = Paragraph("Translation Results", styles['Title'])
-        story.append(title)
+        # Translated text
+        translated = xml_text(format_text(item.get('translated', ''), item.get('target_lang', '')))
+        translated_para = Paragraph(f"<b>Translated:</b> {translated}", styles['Body'])
+        story.append(translated_para)
         
-        # Add content
-        for i, item in enumerate(chat_data, 1):
-            print(f"[DEBUG] PDF Text - Processing item {i}: {item}")  # Debug log
-            # Entry header
-            header = Paragraph(f"Translation {i}", styles['Heading1'])
-            story.append(header)
-            
-            # Original text
-            original_text = f"<b>Original:</b> {item.get('original', '')}"
-            original_para = Paragraph(original_text, styles['Normal'])
-            story.append(original_para)
-            
-            # Translated text
-            translated_text = f"<b>Translated:</b> {item.get('translated', '')}"
-            translated_para = Paragraph(translated_text, styles['Normal'])
-            story.append(translated_para)
-            
-            # Language pair
-            lang_text = f"<b>Language Pair:</b> {item.get('source_lang', '')} → {item.get('target_lang', '')}"
-            lang_para = Paragraph(lang_text, styles['Normal'])
-            story.append(lang_para)
-            
-            # Separator
-            separator = Paragraph("─" * 50, styles['Normal'])
-            story.append(separator)
+        # Language pair
+        lang_pair = xml_text(f"{item.get('source_lang', '')} → {item.get('target_lang', '')}")
+        lang_para = Paragraph(f"<b>Language Pair:</b> {lang_pair}", styles['Body'])
+        story.append(lang_para)
         
-        # Build PDF
-        doc.build(story)
-        buffer.seek(0)
+        # Separator
+        separator = Paragraph("─" * 50, styles['Body'])
+        story.append(separator)
+    
+    # Build PDF
+    doc.build(story)
+    buffer.seek(0)
+    return buffer
+
+def export_to_pdf_text(chat_data):
+    """Export chat data to PDF with text format."""
+    try:
+        with stage('export', 'pdf_text'):
+            buffer = run_blocking(render_pdf_text, chat_data)
         
         response = make_response(send_file(
             buffer,
@@ -223,11 +426,24 @@ def export_to_pdf_text(chat_data):
     except Exception as e:
         return jsonify({'error': f'Failed to export to PDF: {str(e)}'}), 500
 
-# Register arial font
-font_path = os.path.join(os.path.dirname(__file__), 'fonts', 'arial.ttf')
-if os.path.exists(font_path):
-    pdfmetrics.registerFont(TTFont('arial', font_path))
-
+@lru_cache(maxsize=8192)
 def reshape_arabic(text):
     """Fix Arabic text display issues (inversion & spacing)."""
-    return get_display(arabic_reshaper.reshape(text))
\ No newline at end of file
+    import arabic_reshaper
+    from bidi.algorithm import get_display
+
+    return get_display(arabic_reshaper.reshape(text))
+
+def warm_export_stack():
+    """
+    Import the export libraries and build the per-process caches (fonts, styles,
+    DOCX template) up front. Called in the gunicorn master with PRELOAD_APP so
+    forked workers inherit them instead of each paying for them on first export.
+    """
+    import reportlab.platypus  # noqa: F401
+
+    font = register_fonts()
+    _pdf_table_style(font)
+    _pdf_text_styles(font)
+    _docx_template()
+    reshape_arabic('مرحبا')
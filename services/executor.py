@@ -0,0 +1,32 @@
+import os
+
+# Native threads available to cooperative (gevent) workers for CPU-heavy work
+CPU_THREADS = int(os.getenv('CPU_THREADS', os.cpu_count() or 2))
+
+def is_cooperative():
+    """True when running under the async serving mode (gevent-patched worker)."""
+    try:
+        from gevent import monkey
+    except ImportError:
+        return False
+    return monkey.is_module_patched('socket')
+
+def run_blocking(fn, *args, **kwargs):
+    """
+    Run CPU-heavy work (exports, PDF parsing, OCR) without stalling the worker.
+
+    In the async serving mode the call is pushed to gevent's native thread pool so
+    the event loop keeps serving in-flight upstream requests while it runs. In the
+    default sync mode there is nothing else to serve, so the call runs inline.
+
+    Args:
+        fn: Callable to run. It must not rely on the Flask request context.
+    """
+    if not is_cooperative():
+        return fn(*args, **kwargs)
+
+    import gevent
+    pool = gevent.get_hub().threadpool
+    if pool.maxsize != CPU_THREADS:
+        pool.maxsize = CPU_THREADS
+    return pool.apply(fn, args, kwargs)
@@ -0,0 +1,201 @@
+import hashlib
+import json
+import logging
+import multiprocessing
+import os
+import shutil
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from config import Config
+from services.cache_service import DiskCache
+from services.metrics import stage
+from services.convert_service import (
+    XLSX_MIMETYPE, DOCX_MIMETYPE, iter_excel, iter_word, render_pdf_table, render_pdf_text
+)
+
+# Export format -> (download name, mimetype, renderer returning a file object or an iterable of bytes)
+EXPORT_FORMATS = {
+    'excel': ('chat_translations.xlsx', XLSX_MIMETYPE, iter_excel),
+    'word': ('chat_translations.docx', DOCX_MIMETYPE, iter_word),
+    'word_text': ('chat_translations.docx', DOCX_MIMETYPE, iter_word),
+    'pdf_table': ('chat_translations.pdf', 'application/pdf', render_pdf_table),
+    'pdf_text': ('chat_translations.pdf', 'application/pdf', render_pdf_text)
+}
+
+FINISHED_STATUSES = ('done', 'failed')
+
+logger = logging.getLogger(__name__)
+
+class ExportJobStore:
+    """
+    Export jobs and their rendered files, shared by all gunicorn workers so a job
+    can be polled or downloaded through any of them. Job records live in a
+    DiskCache (which enforces the TTL and the size cap) and point at the files.
+    """
+
+    def __init__(self, directory, ttl=None, max_bytes=None, stale_after=None):
+        # Absolute, since Flask resolves relative send_file paths against the app root
+        self.directory = os.path.abspath(directory)
+        self.stale_after = stale_after
+        os.makedirs(directory, exist_ok=True)
+        self.cache = DiskCache(os.path.join(directory, 'jobs.sqlite3'), ttl=ttl, max_bytes=max_bytes,
+                               on_evict=self._remove_files, name='export_jobs')
+
+    @staticmethod
+    def make_job_id(export_format, chat_data):
+        """Content hash of the request, so identical exports share one job."""
+        payload = json.dumps(chat_data, sort_keys=True, ensure_ascii=False, separators=(',', ':'))
+        return hashlib.sha256(f"{export_format}\x1f{payload}".encode('utf-8')).hexdigest()
+
+    def path_for(self, job_id, export_format):
+        extension = os.path.splitext(EXPORT_FORMATS[export_format][0])[1]
+        return os.path.join(self.directory, job_id[:2], f"{job_id}{extension}")
+
+    def get(self, job_id):
+        """Return the job record, or None if it is unknown or expired."""
+        value = self.cache.get(job_id)
+        return json.loads(value) if value is not None else None
+
+    def is_reusable(self, job):
+        """False for jobs that have to be run again (failed, abandoned or missing their file)."""
+        if job['status'] == 'failed':
+            return False
+        if job['status'] == 'done':
+            return os.path.exists(job['path'])
+        return self.stale_after is None or time.time() - job['updated_at'] < self.stale_after
+
+    def create(self, job_id, export_format, total):
+        """
+        Register a queued job unless an equivalent one already exists.
+
+        Returns:
+            bool: True if the caller should run the job
+        """
+        job = {'id': job_id, 'format': export_format, 'status': 'queued',
+               'processed': 0, 'total': total, 'updated_at': time.time()}
+        if self.cache.set(job_id, json.dumps(job), replace=False):
+            return True
+
+        existing = self.get(job_id)
+        if existing is not None and self.is_reusable(existing):
+            return False
+        self.cache.set(job_id, json.dumps(job))
+        return True
+
+    def update(self, job_id, size=None, **fields):
+        job = self.get(job_id)
+        if job is None:
+            return None
+        job.update(fields, updated_at=time.time())
+        self.cache.set(job_id, json.dumps(job), size=size)
+        return job
+
+    def _remove_files(self, entries):
+        for _, value in entries:
+            path = json.loads(value).get('path')
+            if path:
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass
+
+    def stats(self):
+        return self.cache.stats()
+
+_job_store = None
+
+def get_job_store():
+    """Returns the per-process handle on the shared export job store."""
+    global _job_store
+    if _job_store is None:
+        _job_store = ExportJobStore(
+            Config.EXPORT_JOBS_DIR,
+            ttl=Config.EXPORT_JOB_TTL,
+            max_bytes=Config.EXPORT_JOBS_MAX_BYTES,
+            stale_after=Config.EXPORT_JOB_STALE_SECONDS
+        )
+    return _job_store
+
+def _track_progress(store, job_id, chat_data, updates=50):
+    """Yields chat_data items while recording how many the renderer has consumed."""
+    every = max(1, len(chat_data) // updates)
+    for processed, item in enumerate(chat_data, 1):
+        yield item
+        if processed % every == 0:
+            store.update(job_id, processed=processed)
+
+def run_export_job(job_id, export_format, chat_data):
+    """Render one export to its file. Runs inside a worker process."""
+    store = get_job_store()
+    renderer = EXPORT_FORMATS[export_format][2]
+    path = store.path_for(job_id, export_format)
+    temp_path = f"{path}.{os.getpid()}.tmp"
+    try:
+        store.update(job_id, status='running')
+        with stage('export_job', export_format):
+            output = renderer(_track_progress(store, job_id, chat_data))
+
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(temp_path, 'wb') as f:
+                if hasattr(output, 'read'):
+                    shutil.copyfileobj(output, f)
+                else:
+                    for chunk in output:
+                        f.write(chunk)
+            os.replace(temp_path, path)
+
+        store.update(job_id, size=os.path.getsize(path), status='done', processed=len(chat_data), path=path)
+        logger.info("Export job finished", extra={'job_id': job_id, 'format': export_format, 'items': len(chat_data)})
+    except Exception as e:
+        logger.exception("Export job failed", extra={'job_id': job_id, 'format': export_format})
+        store.update(job_id, status='failed', error=str(e))
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+
+_pool = None
+_pool_pid = None
+_pool_lock = threading.Lock()
+
+def _get_pool(rebuild=False):
+    global _pool, _pool_pid
+    with _pool_lock:
+        if rebuild or _pool is None or _pool_pid != os.getpid():
+            # spawn keeps render processes independent of the (possibly gevent-patched) web worker
+            context = multiprocessing.get_context('spawn')
+            _pool = ProcessPoolExecutor(max_workers=Config.EXPORT_WORKERS, mp_context=context)
+            _pool_pid = os.getpid()
+        return _pool
+
+def _on_job_finished(job_id):
+    def callback(future):
+        # Only set when the render process itself died; run_export_job records its own errors
+        error = future.exception()
+        if error is not None:
+            get_job_store().update(job_id, status='failed', error=f"Export worker crashed: {str(error)}")
+    return callback
+
+def submit_export(export_format, chat_data):
+    """
+    Queue an export on the local render pool, or attach to an identical one.
+
+    Args:
+        export_format: Key of EXPORT_FORMATS
+        chat_data: List of chat items as posted to the /export routes
+
+    Returns:
+        dict: The job record
+    """
+    if export_format not in EXPORT_FORMATS:
+        raise ValueError(f"Unsupported export format: {export_format}")
+
+    store = get_job_store()
+    job_id = store.make_job_id(export_format, chat_data)
+    if store.create(job_id, export_format, len(chat_data)):
+        try:
+            future = _get_pool().submit(run_export_job, job_id, export_format, chat_data)
+        except BrokenProcessPool:
+            future = _get_pool(rebuild=True).submit(run_export_job, job_id, export_format, chat_data)
+        future.add_done_callback(_on_job_finished(job_id))
+    return store.get(job_id)
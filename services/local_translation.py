@@ -0,0 +1,121 @@
+import logging
+import os
+import threading
+from services.batching import MicroBatcher
+from services.executor import run_blocking
+
+logger = logging.getLogger(__name__)
+
+# Direction -> converted model directory (under LOCAL_MODEL_DIR) and the target
+# language token multilingual opus-mt-tc models expect at the start of the input
+LOCAL_MODELS = {
+    'en_to_ar': {'name': 'opus-mt-tc-big-en-ar', 'source_prefix': '>>ara<<'},
+    'ar_to_en': {'name': 'opus-mt-ar-en', 'source_prefix': None}
+}
+
+class LocalTranslator:
+    """
+    Helsinki-NLP opus-mt models running on the CPU with CTranslate2.
+
+    Models are converted (and int8 quantized) ahead of time with:
+
+        ct2-transformers-converter --model Helsinki-NLP/opus-mt-ar-en \\
+            --output_dir local_models/opus-mt-ar-en --quantization int8 \\
+            --copy_files source.spm target.spm
+
+    Each worker loads them once. With batching on (the async serving mode),
+    concurrent requests for the same direction are merged by a MicroBatcher
+    into a single translate_batch call; a sync worker never has concurrent
+    requests, so there each call goes straight to the model.
+    """
+
+    def __init__(self, model_dir, beam_size=2, max_length=256, compute_type='int8', threads=0,
+                 max_batch_size=16, max_wait=0.01, batching=True):
+        """
+        Args:
+            model_dir: Directory holding one converted model directory per LOCAL_MODELS entry
+            beam_size: Beam width (1 is greedy decoding, fastest)
+            max_length: Maximum number of generated tokens per sentence
+            compute_type: CTranslate2 compute type, e.g. 'int8', 'int8_float32' or 'float32'
+            threads: Intra-op threads per model, 0 lets CTranslate2 decide
+            max_batch_size: Maximum sentences per translate_batch call
+            max_wait: Seconds a request waits for others to join its batch
+            batching: Merge concurrent requests with a MicroBatcher
+        """
+        self.model_dir = model_dir
+        self.beam_size = beam_size
+        self.max_length = max_length
+        self.compute_type = compute_type
+        self.threads = threads
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait
+        self.batching = batching
+        self._models = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def model_id(direction):
+        """Stable identifier of the model for a direction (used as translation memory key)."""
+        return f"local/{LOCAL_MODELS[direction]['name']}"
+
+    def load(self, direction):
+        """Load the model for a direction if this worker has not done so yet."""
+        with self._lock:
+            model = self._models.get(direction)
+            if model is not None:
+                return model
+
+            try:
+                import ctranslate2
+                import sentencepiece
+            except ImportError:
+                raise RuntimeError("The local translation backend needs the ctranslate2 and sentencepiece packages")
+
+            path = os.path.join(self.model_dir, LOCAL_MODELS[direction]['name'])
+            if not os.path.isdir(path):
+                raise RuntimeError(f"Converted model not found: {path}")
+
+            model = {
+                'translator': ctranslate2.Translator(path, device='cpu', compute_type=self.compute_type,
+                                                     intra_threads=self.threads),
+                'source_sp': sentencepiece.SentencePieceProcessor(model_file=os.path.join(path, 'source.spm')),
+                'target_sp': sentencepiece.SentencePieceProcessor(model_file=os.path.join(path, 'target.spm')),
+                'batcher': MicroBatcher(lambda texts: self._translate_batch(direction, texts),
+                                        max_batch_size=self.max_batch_size, max_wait=self.max_wait,
+                                        name=f"local-translate-{direction}") if self.batching else None
+            }
+            self._models[direction] = model
+            logger.info("Loaded local translation model %s (%s, beam %d)", path, self.compute_type, self.beam_size)
+            return model
+
+    def _translate_batch(self, direction, texts):
+        model = self._models[direction]
+        prefix = LOCAL_MODELS[direction]['source_prefix']
+        tokens = []
+        for text in texts:
+            pieces = model['source_sp'].encode(text, out_type=str)
+            tokens.append(([prefix] if prefix else []) + pieces + ['</s>'])
+
+        # translate_batch releases the GIL; keep it off the event loop in async mode
+        results = run_blocking(
+            model['translator'].translate_batch,
+            tokens,
+            beam_size=self.beam_size,
+            max_decoding_length=self.max_length,
+            max_batch_size=self.max_batch_size
+        )
+        return [model['target_sp'].decode(result.hypotheses[0]) for result in results]
+
+    def translate(self, text, direction):
+        """Translate one text, batched with whatever other requests are in flight."""
+        batcher = self.load(direction)['batcher']
+        if batcher is None:
+            return self._translate_batch(direction, [text])[0]
+        return batcher.process(text)
+
+    def translate_many(self, texts, direction):
+        """Translate several texts; they join the same dynamic batches as single requests."""
+        batcher = self.load(direction)['batcher']
+        if batcher is None:
+            return self._translate_batch(direction, list(texts))
+        return batcher.process_many(texts)
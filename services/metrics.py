@@ -0,0 +1,172 @@
+import os
+import time
+from contextlib import contextmanager
+from flask import g, request
+from prometheus_client import (
+    Counter, Gauge, Histogram, CollectorRegistry, REGISTRY, CONTENT_TYPE_LATEST, generate_latest, multiprocess
+)
+
+# Seconds; covers cache hits (ms) up to long Whisper/OCR runs (minutes)
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300)
+
+REQUEST_LATENCY = Histogram(
+    'http_request_duration_seconds', 'Time spent in Flask views (until the response starts)',
+    ['route', 'method', 'status'], buckets=LATENCY_BUCKETS
+)
+REQUESTS_IN_FLIGHT = Gauge(
+    'http_requests_in_flight', 'Requests currently being handled',
+    ['route'], multiprocess_mode='livesum'
+)
+STAGE_LATENCY = Histogram(
+    'pipeline_stage_duration_seconds', 'Time spent per processing stage',
+    ['pipeline', 'stage'], buckets=LATENCY_BUCKETS
+)
+UPSTREAM_LATENCY = Histogram(
+    'upstream_request_duration_seconds', 'Latency of each upstream API attempt',
+    ['endpoint', 'model', 'status'], buckets=LATENCY_BUCKETS
+)
+UPSTREAM_RETRIES = Counter(
+    'upstream_retries_total', 'Upstream attempts that were retried, by the status that caused the retry',
+    ['endpoint', 'model', 'status']
+)
+HEDGED_REQUESTS = Counter(
+    'upstream_hedged_requests_total', 'Hedged duplicate upstream requests, by which request answered first',
+    ['endpoint', 'model', 'winner']
+)
+CIRCUIT_BREAKER_TRANSITIONS = Counter(
+    'circuit_breaker_transitions_total', 'Circuit breaker state changes, by the state entered',
+    ['breaker', 'state']
+)
+CIRCUIT_BREAKER_REJECTED = Counter(
+    'circuit_breaker_rejected_total', 'Upstream calls failed fast by an open circuit breaker',
+    ['breaker']
+)
+TRANSLATION_FALLBACKS = Counter(
+    'translation_fallbacks_total', 'Translations sent to an alternate model because the primary was unavailable',
+    ['model', 'fallback']
+)
+RATE_LIMIT_WAIT = Histogram(
+    'rate_limiter_wait_seconds', 'Time requests queued in the client-side rate limiter',
+    ['endpoint', 'model', 'priority'], buckets=LATENCY_BUCKETS
+)
+RATE_LIMIT_SHED = Counter(
+    'rate_limiter_shed_total', 'Requests rejected by the client-side rate limiter',
+    ['endpoint', 'model', 'priority']
+)
+ADMISSION_IN_FLIGHT = Gauge(
+    'admission_in_flight', 'Admitted requests currently running, per route class',
+    ['route_class'], multiprocess_mode='livesum'
+)
+ADMISSION_QUEUE_DEPTH = Gauge(
+    'admission_queue_depth', 'Requests waiting for admission, per route class',
+    ['route_class'], multiprocess_mode='livesum'
+)
+ADMISSION_WAIT = Histogram(
+    'admission_wait_seconds', 'Time admitted requests waited for a slot',
+    ['route_class'], buckets=LATENCY_BUCKETS
+)
+ADMISSION_SHED = Counter(
+    'admission_shed_total', 'Requests answered with 503 by admission control, by reason (queue_full or timeout)',
+    ['route_class', 'reason']
+)
+CACHE_LOOKUPS = Counter(
+    'cache_lookups_total', 'Cache lookups by cache and result (hit or miss)',
+    ['cache', 'result']
+)
+COALESCED_REQUESTS = Counter(
+    'coalesced_requests_total', 'Requests answered by an identical call already in flight',
+    ['name', 'scope']
+)
+BATCH_SIZE = Histogram(
+    'microbatch_size', 'Items per micro-batch',
+    ['batcher'], buckets=(1, 2, 4, 8, 16, 32, 64)
+)
+
+@contextmanager
+def stage(pipeline, name):
+    """Time a block as one observation of a pipeline stage."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        STAGE_LATENCY.labels(pipeline, name).observe(time.perf_counter() - start)
+
+class Stopwatch:
+    """
+    Accumulates the time of a stage that runs in many small pieces (e.g. once
+    per page) and records it as a single observation.
+    """
+
+    def __init__(self, pipeline, name):
+        self.pipeline = pipeline
+        self.name = name
+        self.elapsed = 0.0
+        self._start = None
+
+    def __enter__(self):
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.elapsed += time.perf_counter() - self._start
+
+    def record(self):
+        STAGE_LATENCY.labels(self.pipeline, self.name).observe(self.elapsed)
+
+def timed_iter(iterable, pipeline, name):
+    """
+    Re-yield items, recording the time spent producing them (not the time the
+    consumer spends on them) as one stage observation once the iterator ends.
+    """
+    stopwatch = Stopwatch(pipeline, name)
+    iterator = iter(iterable)
+    try:
+        while True:
+            with stopwatch:
+                try:
+                    item = next(iterator)
+                except StopIteration:
+                    return
+            yield item
+    finally:
+        stopwatch.record()
+
+def _route_label():
+    # The URL rule, not the path, keeps the label set small (/export/jobs/<job_id>)
+    return request.url_rule.rule if request.url_rule else 'unmatched'
+
+def instrument_app(app):
+    """Record latency and in-flight requests for every route of the app."""
+
+    @app.before_request
+    def _start_timer():
+        g.metrics_start = time.perf_counter()
+        g.metrics_route = _route_label()
+        REQUESTS_IN_FLIGHT.labels(g.metrics_route).inc()
+
+    @app.after_request
+    def _record_latency(response):
+        start = g.get('metrics_start')
+        if start is not None:
+            REQUEST_LATENCY.labels(g.metrics_route, request.method, str(response.status_code)).observe(
+                time.perf_counter() - start
+            )
+        return response
+
+    @app.teardown_request
+    def _end_request(exc):
+        route = g.pop('metrics_route', None)
+        if route is not None:
+            REQUESTS_IN_FLIGHT.labels(route).dec()
+
+def render_metrics():
+    """
+    Returns (body, content type) for the /metrics endpoint. Under gunicorn the
+    values of all workers are merged from PROMETHEUS_MULTIPROC_DIR.
+    """
+    if os.environ.get('PROMETHEUS_MULTIPROC_DIR'):
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = REGISTRY
+    return generate_latest(registry), CONTENT_TYPE_LATEST
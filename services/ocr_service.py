@@ -0,0 +1,65 @@
+import os
+import logging
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+
+logger = logging.getLogger(__name__)
+
+# Quality vs. speed trade-offs for scanned PDFs
+OCR_PROFILES = {
+    'fast': {'dpi': 150, 'config': '--oem 1 --psm 6'},
+    'balanced': {'dpi': 200, 'config': '--oem 1 --psm 3'},
+    'accurate': {'dpi': 300, 'config': '--oem 1 --psm 3'}
+}
+
+def _ocr_page(file_path, page_number, dpi, lang, config):
+    """Rasterize and OCR a single page. Runs inside a worker process."""
+    from pdf2image import convert_from_path
+    from pytesseract import image_to_string
+
+    images = convert_from_path(file_path, dpi=dpi, first_page=page_number, last_page=page_number)
+    if not images:
+        return ""
+    try:
+        return image_to_string(images[0], lang=lang, config=config)
+    finally:
+        images[0].close()
+
+def count_ocr_pages(file_path):
+    """Returns the number of pages poppler sees in the PDF."""
+    from pdf2image import pdfinfo_from_path
+    return int(pdfinfo_from_path(file_path)['Pages'])
+
+def iter_ocr_pages(file_path, lang="ara+eng", profile="accurate", workers=None, window=None):
+    """
+    OCR a PDF page by page across a process pool, yielding page texts in page order.
+
+    Pages are rasterized lazily inside the workers, one page per task, and at
+    most `window` pages are in flight at a time, so memory stays bounded no
+    matter how long the document is.
+
+    Args:
+        file_path: Path to the PDF
+        lang: Tesseract language(s)
+        profile: Key of OCR_PROFILES ('fast', 'balanced' or 'accurate')
+        workers: Number of OCR processes, defaults to the host's CPU count
+        window: Pages submitted per round, defaults to twice the worker count
+    """
+    settings = OCR_PROFILES.get(profile, OCR_PROFILES['accurate'])
+    page_count = count_ocr_pages(file_path)
+    workers = max(1, min(workers or os.cpu_count() or 1, page_count))
+    window = window or workers * 2
+
+    # spawn keeps workers independent of the (possibly gevent-patched) web worker
+    context = multiprocessing.get_context('spawn')
+    with ProcessPoolExecutor(max_workers=workers, mp_context=context) as pool:
+        for first_page in range(1, page_count + 1, window):
+            last_page = min(first_page + window - 1, page_count)
+            futures = [
+                pool.submit(_ocr_page, file_path, page_number, settings['dpi'], lang, settings['config'])
+                for page_number in range(first_page, last_page + 1)
+            ]
+            for page_number, future in enumerate(futures, first_page):
+                text = future.result()
+                logger.debug("OCR extracted %d characters from page %d/%d", len(text), page_number, page_count)
+                yield text
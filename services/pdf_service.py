@@ -1,55 +1,357 @@
-import PyPDF2
 import re
 import os
+import logging
+import shutil
+import tempfile
+from contextlib import contextmanager
+from config import Config
+from services.cache_service import ExtractionCache, hash_file
+from services.metrics import stage, Stopwatch, timed_iter
 
-def chunk_text_by_sentence(text):
-    """Splits text into sentences, handling Arabic & English punctuation correctly."""
-    normalized_text = text.replace("\n", " ")  # Remove line breaks
-    normalized_text = re.sub(r'([.!?])(?=\S)', r'\1 ', normalized_text)  # Ensure space after punctuation
-    return re.split(r'(?<=[.!?])\s+', normalized_text.strip()) if text else []
+logger = logging.getLogger(__name__)
 
-def extract_text_from_pdf(file_path):
-    """Extracts text from a PDF using PyPDF2."""
-    text = ""
+# Sentence terminators: . ! ? and the ellipsis, plus the Arabic question mark (؟),
+# semicolon (؛, which often ends a sentence in Arabic prose) and full stop (۔)
+_TERMINATORS = '.!?…؟؛۔'
+_CLOSERS = '"\'»”’)]'
+_OPENERS = '"\'«“‘(['
+
+# Terminators and closing quotes, followed by whitespace, the end of the text, or a capital
+# or Arabic letter glued on by PDF extraction ("end.Next"). Digits and lowercase letters
+# don't start sentences, which keeps 3.14, e.g and example.com in one piece.
+_BOUNDARY_RE = re.compile(rf'[{_TERMINATORS}]+[{re.escape(_CLOSERS)}]*(?:\s+|$|(?=[A-Z\u0621-\u064A]))')
+_WHITESPACE_RE = re.compile(r'\s+')
+_CLAUSE_SPLIT_RE = re.compile(r'(?<=[,،;:])\s+')
+_DOTTED_LETTERS_RE = re.compile(r'(?:[^\W\d_]\.)+[^\W\d_]')  # e.g, i.e, U.S, a.m
+
+# Arabic words split into more SentencePiece pieces than Latin ones
+_TOKEN_RE = re.compile(r'(?P<arabic>[\u0621-\u06D3\u06D5-\u06FF]+)|(?P<word>\w+)|[^\w\s]')
+_LATIN_CHARS_PER_TOKEN = 4
+_ARABIC_CHARS_PER_TOKEN = 3
+
+# Abbreviations whose period does not end a sentence (compared lowercased, without the dot)
+_ABBREVIATIONS = frozenset((
+    'mr', 'mrs', 'ms', 'dr', 'prof', 'sr', 'jr', 'st', 'mt', 'vs', 'etc', 'approx', 'dept', 'est', 'govt',
+    'inc', 'ltd', 'co', 'corp', 'jan', 'feb', 'mar', 'apr', 'jun', 'jul', 'aug', 'sep', 'sept', 'oct',
+    'nov', 'dec', 'هـ'
+))
+# Only abbreviations when a number follows ("No. 5", "p. 12"), otherwise ordinary words
+_NUMBER_ABBREVIATIONS = frozenset(('no', 'nos', 'vol', 'p', 'pp', 'fig', 'figs', 'ch', 'sec', 'art'))
+
+def estimate_tokens(text):
+    """
+    Approximate SentencePiece token count of text for the opus-mt models, without
+    loading a tokenizer: about 4 characters per token for Latin words, 3 for Arabic
+    words and one per punctuation mark. Counts of space-joined texts add up.
+    """
+    tokens = 0
+    for match in _TOKEN_RE.finditer(text):
+        kind = match.lastgroup
+        if kind == 'arabic':
+            tokens += -(-len(match.group()) // _ARABIC_CHARS_PER_TOKEN)
+        elif kind == 'word':
+            tokens += -(-len(match.group()) // _LATIN_CHARS_PER_TOKEN)
+        else:
+            tokens += 1
+    return tokens
+
+def _is_abbreviation(text, segment_start, match):
+    """Whether the single period of a boundary match belongs to an abbreviation or an initial."""
+    if text[match.start():match.end()].rstrip(_CLOSERS + ' ') != '.':
+        return False
+    word_start = max(text.rfind(' ', segment_start, match.start()) + 1, segment_start)
+    word = text[word_start:match.start()].lstrip(_OPENERS).lower()
+    if not word:
+        return False
+    if len(word) == 1 and word.isalpha():
+        return True  # Initials ("J. Smith", "د. أحمد")
+    if word in _ABBREVIATIONS or _DOTTED_LETTERS_RE.fullmatch(word):
+        return True
+    return word in _NUMBER_ABBREVIATIONS and text[match.end():match.end() + 1].isdigit()
+
+def _split_sentences(text):
+    """
+    Split normalized text at sentence boundaries.
+
+    Returns:
+        (sentences, tail): Completed sentences, and the text after the last boundary
+        (an unfinished sentence, or '' if the text ends with one)
+    """
+    sentences = []
+    start = 0
+    for match in _BOUNDARY_RE.finditer(text):
+        if _is_abbreviation(text, start, match):
+            continue
+        sentence = text[start:match.end()].strip()
+        if sentence:
+            sentences.append(sentence)
+        start = match.end()
+    return sentences, text[start:].strip()
+
+def _pack(pieces, max_tokens, separator=' '):
+    """Greedily join consecutive pieces while they stay within max_tokens."""
+    packed = []
+    current = []
+    current_tokens = 0
+    for piece in pieces:
+        tokens = estimate_tokens(piece)
+        if current and current_tokens + tokens > max_tokens:
+            packed.append(separator.join(current))
+            current = []
+            current_tokens = 0
+        current.append(piece)
+        current_tokens += tokens
+    if current:
+        packed.append(separator.join(current))
+    return packed
+
+def _split_word(word, max_tokens):
+    """Hard-split a single word over the budget (a long URL, base64, unspaced CJK) by characters."""
+    pieces = []
+    while word:
+        # At most one token per character, so a piece of max_tokens characters always fits
+        size = min(len(word), max_tokens * _LATIN_CHARS_PER_TOKEN)
+        while size > max(1, max_tokens) and estimate_tokens(word[:size]) > max_tokens:
+            size = max(max(1, max_tokens), size * 3 // 4)
+        pieces.append(word[:size])
+        word = word[size:]
+    return pieces
+
+def _split_long(sentence, max_tokens):
+    """Split a sentence over the budget at clause punctuation, then between words, then inside words."""
+    if estimate_tokens(sentence) <= max_tokens:
+        return [sentence]
+
+    pieces = []
+    for clause in _pack(_CLAUSE_SPLIT_RE.split(sentence), max_tokens):
+        if estimate_tokens(clause) <= max_tokens:
+            pieces.append(clause)
+            continue
+        words = []
+        for word in clause.split(' '):
+            words.extend(_split_word(word, max_tokens) if estimate_tokens(word) > max_tokens else [word])
+        pieces.extend(_pack(words, max_tokens))
+    return pieces
+
+def _fit_to_budget(sentences, max_tokens, pack=False):
+    if not max_tokens:
+        return sentences
+    pieces = [piece for sentence in sentences for piece in _split_long(sentence, max_tokens)]
+    return _pack(pieces, max_tokens) if pack else pieces
+
+def chunk_text_by_sentence(text, max_tokens=None, pack=False):
+    """
+    Splits text into sentences, handling Arabic & English punctuation correctly.
+
+    Args:
+        text: Text to split
+        max_tokens: Optional budget in estimated model tokens; longer sentences are
+            split at clause punctuation, then between words
+        pack: Also join consecutive short sentences up to max_tokens, for fewer,
+            right-sized model inputs
+    """
+    if not text:
+        return []
+    sentences, tail = _split_sentences(_WHITESPACE_RE.sub(' ', text).strip())
+    if tail:
+        sentences.append(tail)
+    return _fit_to_budget(sentences, max_tokens, pack)
+
+def iter_page_sentences(page_texts, max_tokens=None):
+    """
+    Incrementally split a stream of page texts into sentences.
+
+    A sentence that is still open at the end of a page is carried over and
+    completed with the text of the next page, so the output matches running
+    chunk_text_by_sentence over the whole document.
+
+    Args:
+        page_texts: Iterable of page texts
+        max_tokens: Optional per-sentence budget in estimated model tokens
+
+    Yields:
+        (page_number, sentences): Sentences completed on each page (1-based page numbers)
+    """
+    carry = ""
+    page_number = 0
+    splitting = Stopwatch('pdf', 'sentence_split')
+    try:
+        for page_number, page_text in enumerate(page_texts, 1):
+            if not page_text or not page_text.strip():
+                continue
+
+            with splitting:
+                text = _WHITESPACE_RE.sub(' ', f"{carry} {page_text}").strip()
+                sentences, carry = _split_sentences(text)
+                sentences = _fit_to_budget(sentences, max_tokens)
+                if max_tokens and estimate_tokens(carry) > max_tokens:
+                    # Text without punctuation (tables, headings) would otherwise pile up
+                    pieces = _split_long(carry, max_tokens)
+                    carry = pieces.pop()
+                    sentences.extend(pieces)
+            if sentences:
+                yield page_number, sentences
+
+        if carry:
+            yield page_number, _fit_to_budget([carry], max_tokens)
+    finally:
+        splitting.record()
+
+_extraction_cache = None
+
+def get_extraction_cache():
+    """Returns the per-process handle on the shared extraction cache, or None if disabled."""
+    global _extraction_cache
+    if _extraction_cache is None and Config.EXTRACTION_CACHE_ENABLED:
+        _extraction_cache = ExtractionCache(
+            Config.EXTRACTION_CACHE_PATH,
+            ttl=Config.EXTRACTION_CACHE_TTL,
+            max_bytes=Config.EXTRACTION_CACHE_MAX_BYTES
+        )
+    return _extraction_cache
+
+# Cached sentences depend on how they were segmented; bump when the segmenter changes
+SEGMENTER_KEY = f"seg3:{Config.SEGMENT_MAX_TOKENS}"
+TEXT_LAYER_METHOD = f"text:{SEGMENTER_KEY}"
+
+def ocr_method_key(lang=None, profile=None):
+    """Cache key component describing an OCR run (language, profile and DPI)."""
+    from services.ocr_service import OCR_PROFILES
+    profile = profile or Config.OCR_PROFILE
+    dpi = OCR_PROFILES.get(profile, OCR_PROFILES['accurate'])['dpi']
+    return f"ocr:{lang or Config.OCR_LANG}:{profile}:{dpi}:{SEGMENTER_KEY}"
+
+def extract_text_cached(source, file_hash=None):
+    """
+    Extracts sentences from a PDF (text layer first, then OCR), reusing cached
+    results for previously seen file contents.
+
+    Args:
+        source: Path or binary stream of the PDF
+        file_hash: SHA-256 of the contents, computed if not given
+
+    Returns:
+        list: Extracted sentences, empty if nothing could be extracted
+    """
+    cache = get_extraction_cache()
+    if cache is None:
+        return extract_text_from_pdf(source) or extract_text_with_ocr(source)
+
+    if not file_hash:
+        with stage('pdf', 'hash'):
+            file_hash = hash_file(source)
+    sentences = cache.lookup(file_hash, TEXT_LAYER_METHOD)
+    if sentences is None:
+        sentences = extract_text_from_pdf(source)
+        # An empty text layer is remembered too, so scanned PDFs go straight to OCR next time
+        cache.store(file_hash, TEXT_LAYER_METHOD, sentences)
+    if sentences:
+        return sentences
+
+    method = ocr_method_key()
+    sentences = cache.lookup(file_hash, method)
+    if sentences is None:
+        sentences = extract_text_with_ocr(source)
+        # Empty OCR output may just mean OCR isn't installed, so only successes are cached
+        if sentences:
+            cache.store(file_hash, method, sentences)
+    return sentences
+
+@contextmanager
+def open_pdf(source):
+    """Opens a PDF given as a path, or rewinds an already open binary stream (e.g. an upload)."""
+    if isinstance(source, (str, os.PathLike)):
+        with open(source, 'rb') as file:
+            yield file
+    else:
+        source.seek(0)
+        yield source
+
+@contextmanager
+def as_file_path(source, suffix=".pdf"):
+    """
+    Yields a filesystem path for tools that cannot read streams (poppler, tesseract).
+    Streams are spilled to a uniquely named temporary file that is removed afterwards.
+    """
+    if isinstance(source, (str, os.PathLike)):
+        yield source
+        return
+
+    source.seek(0)
+    with tempfile.NamedTemporaryFile(suffix=suffix, delete=False) as temp_file:
+        shutil.copyfileobj(source, temp_file)
+    try:
+        yield temp_file.name
+    finally:
+        os.remove(temp_file.name)
+
+def _iter_page_texts(file):
+    import PyPDF2  # Imported on first use, like the OCR stack
+
+    pdf_reader = PyPDF2.PdfReader(file)
+    for page in pdf_reader.pages:
+        yield page.extract_text() or ""
+
+def iter_pdf_pages(source):
+    """Yields the text of each PDF page, parsing one page at a time with PyPDF2."""
+    with open_pdf(source) as file:
+        yield from timed_iter(_iter_page_texts(file), 'pdf', 'pypdf2')
+
+def count_pdf_pages(source):
+    """Returns the number of pages in a PDF."""
+    import PyPDF2
+
+    with open_pdf(source) as file:
+        return len(PyPDF2.PdfReader(file).pages)
+
+def extract_text_from_pdf(source):
+    """Extracts text from a PDF (path or binary stream) using PyPDF2."""
+    sentences = []
     try:
-        with open(file_path, 'rb') as file:
-            pdf_reader = PyPDF2.PdfReader(file)
-            for page in pdf_reader.pages:
-                page_text = page.extract_text()
-                if page_text.strip():
-                    text += page_text + " "
+        for _, page_sentences in iter_page_sentences(iter_pdf_pages(source), Config.SEGMENT_MAX_TOKENS):
+            sentences.extend(page_sentences)
     except Exception as e:
-        print(f"Error reading PDF with PyPDF2: {e}")
+        logger.error("Error reading PDF with PyPDF2: %s", e)
         return []
     
-    print("Extracted Text from PyPDF2:", text[:200] + "..." if len(text) > 200 else text)  # Debugging
-    return chunk_text_by_sentence(text) if text.strip() else []
+    logger.info("Extracted %d sentences from PyPDF2", len(sentences))
+    return sentences
 
-def extract_text_with_ocr(file_path):
+def extract_text_with_ocr(source, lang=None, profile=None):
     """
     Extracts text from image-based PDFs using OCR.
     Note: This requires pdf2image and pytesseract which need additional setup.
+    
+    Args:
+        source: Path or binary stream of the PDF
+        lang: Tesseract language(s), defaults to Config.OCR_LANG
+        profile: Speed/quality profile from ocr_service.OCR_PROFILES, defaults to Config.OCR_PROFILE
     """
     try:
         # Optional import - only works if packages are installed
-        from pdf2image import convert_from_path
-        from pytesseract import image_to_string
-        
-        images = convert_from_path(file_path, dpi=300)
-        text = ""
+        import pdf2image  # noqa: F401
+        import pytesseract  # noqa: F401
+        from services.ocr_service import iter_ocr_pages
         
-        for i, image in enumerate(images):
-            image_text = image_to_string(image, lang="ara+eng")
-            print(f"OCR Extracted Text from Page {i+1}: {image_text[:100]}..." if len(image_text) > 100 else image_text)
-            text += image_text + " "
-
-        return chunk_text_by_sentence(text) if text.strip() else []
+        # poppler needs a real file; streams are spilled to a unique temp file only for OCR
+        with as_file_path(source) as file_path:
+            pages = timed_iter(iter_ocr_pages(
+                file_path,
+                lang=lang or Config.OCR_LANG,
+                profile=profile or Config.OCR_PROFILE,
+                workers=Config.OCR_WORKERS
+            ), 'pdf', 'ocr')
+            return [
+                sentence
+                for _, sentences in iter_page_sentences(pages, Config.SEGMENT_MAX_TOKENS)
+                for sentence in sentences
+            ]
         
     except ImportError:
-        print("Warning: OCR functionality not available. Install pdf2image and pytesseract for OCR support.")
+        logger.warning("OCR functionality not available. Install pdf2image and pytesseract for OCR support.")
         return []
     except Exception as e:
-        print(f"Error with OCR: {e}")
+        logger.error("Error with OCR: %s", e)
         return []
 
 def extract_text_from_pdf_file(filepath):
@@ -57,9 +359,9 @@ def extract_text_from_pdf_file(filepath):
     text = extract_text_from_pdf(filepath)
 
     if not text:  # If no text extracted, try OCR if available
-        print("No text extracted using PyPDF2, trying OCR...")
+        logger.info("No text extracted using PyPDF2, trying OCR...")
         text = extract_text_with_ocr(filepath)
         if not text:
-            print("OCR not available or failed. Please install pdf2image and pytesseract for image-based PDF support.")
+            logger.warning("OCR not available or failed. Please install pdf2image and pytesseract for image-based PDF support.")
 
     return text
@@ -1,12 +1,84 @@
-import requests
+import logging
 import re
+import threading
+from models.upstream_client import CircuitOpenError, RateLimitError
+from services.batching import MicroBatcher
+from services.metrics import TRANSLATION_FALLBACKS
+from services.pdf_service import chunk_text_by_sentence, estimate_tokens
+
+logger = logging.getLogger(__name__)
 
 LANG_CODES = {
     "English": "en",
     "Arabic": "ar"
 }
 
-def translate_text(text, source_lang, target_lang, model_info):
+# Defaults for packing sentences into a single Hugging Face request
+BATCH_MAX_ITEMS = 16
+BATCH_MAX_TOKENS = 1200
+
+def _resolve_direction(source_lang, target_lang):
+    """Model key ('en_to_ar' or 'ar_to_en') for a language direction."""
+    src_lang_code = LANG_CODES.get(source_lang)
+    tgt_lang_code = LANG_CODES.get(target_lang)
+
+    if not src_lang_code or not tgt_lang_code:
+        raise ValueError("Unsupported language pair")
+
+    # Determine which model to use based on language direction
+    if src_lang_code == "en" and tgt_lang_code == "ar":
+        return "en_to_ar"
+    elif src_lang_code == "ar" and tgt_lang_code == "en":
+        return "ar_to_en"
+    raise ValueError(f"Unsupported translation direction: {source_lang} to {target_lang}")
+
+def _resolve_model_url(source_lang, target_lang, models):
+    """Pick the Helsinki-NLP model URL for a language direction."""
+    return models[_resolve_direction(source_lang, target_lang)]
+
+def hf_model_name(model_url):
+    """Hugging Face model id from an Inference API URL, e.g. Helsinki-NLP/opus-mt-ar-en"""
+    return model_url.rsplit('/models/', 1)[-1]
+
+def _fallback_model_urls(source_lang, target_lang, model_info):
+    """Alternate model URLs for a direction, tried while the primary's circuit breaker is open."""
+    return (model_info.get('fallback_models') or {}).get(_resolve_direction(source_lang, target_lang), [])
+
+def _post_translation(client, model_urls, headers, payload, priority):
+    """
+    POST to the first model whose circuit breaker lets the call through.
+
+    Returns:
+        tuple: (response, URL of the model that answered)
+    """
+    for position, model_url in enumerate(model_urls):
+        try:
+            response = client.post('huggingface', model_url, model=hf_model_name(model_url), priority=priority,
+                                   hedge=priority == 'interactive', headers=headers, json=payload)
+        except CircuitOpenError as e:
+            if position == len(model_urls) - 1:
+                raise
+            logger.warning("%s, falling back to %s", e, hf_model_name(model_urls[position + 1]))
+            TRANSLATION_FALLBACKS.labels(hf_model_name(model_urls[0]), hf_model_name(model_urls[position + 1])).inc()
+            continue
+        return response, model_url
+
+def _get_api_settings(model_info):
+    """Validate model_info and return (api_token, models, client)."""
+    if model_info.get('type') != 'huggingface_api':
+        raise ValueError("Unsupported model type for translation")
+
+    api_token = model_info.get('api_token')
+    if not api_token:
+        raise ValueError("Hugging Face API token is required for online translation")
+
+    client = model_info.get('client')
+    if client is None:
+        raise ValueError("Upstream HTTP client is required for online translation")
+
+    return api_token, model_info.get('models'), client
+
+def translate_text(text, source_lang, target_lang, model_info, priority='interactive'):
     """
     Translate text using online models (Hugging Face Inference API)
     
@@ -15,81 +87,283 @@ def translate_text(text, source_lang, target_lang, model_info):
         source_lang: Source language name
         target_lang: Target language name
         model_info: Dictionary containing API info from AIModels.get_translation_model()
+        priority: Rate limiter priority, 'interactive' or 'bulk'
     """
     try:
-        if model_info.get('type') != 'huggingface_api':
-            raise ValueError("Unsupported model type for translation")
-        
-        api_token = model_info.get('api_token')
-        models = model_info.get('models')
-        
-        if not api_token:
-            raise ValueError("Hugging Face API token is required for online translation")
-        
-        src_lang_code = LANG_CODES.get(source_lang)
-        tgt_lang_code = LANG_CODES.get(target_lang)
-
-        if not src_lang_code or not tgt_lang_code:
-            raise ValueError("Unsupported language pair")
-
-        # Determine which model to use based on language direction
-        if src_lang_code == "en" and tgt_lang_code == "ar":
-            model_url = models["en_to_ar"]
-        elif src_lang_code == "ar" and tgt_lang_code == "en":
-            model_url = models["ar_to_en"]
-        else:
-            raise ValueError(f"Unsupported translation direction: {source_lang} to {target_lang}")
-
-        headers = {"Authorization": f"Bearer {api_token}"}
-        
-        # Helsinki-NLP models use simple input format
-        payload = {
-            "inputs": text
-        }
-        
-        response = requests.post(model_url, headers=headers, json=payload)
-        response.raise_for_status()
-        
-        result = response.json()
-        if isinstance(result, list) and len(result) > 0:
-            return result[0].get('translation_text', text)
-        return text
+        # Inputs over the model's budget would be truncated; translate them segment by segment
+        max_tokens = model_info.get('max_tokens')
+        if max_tokens and estimate_tokens(text) > max_tokens:
+            return _translate_segmented(text, source_lang, target_lang, model_info, max_tokens, priority)
+        return _translate_one(text, source_lang, target_lang, model_info, priority)
     
     except Exception as e:
-        print(f"Translation error: {str(e)}")
+        logger.warning("Translation error: %s", e)
         raise
 
-def translate_text_legacy(text, source_lang, target_lang, tokenizer, model, device):
+def _translate_one(text, source_lang, target_lang, model_info, priority):
+    """Translate a text within the model's budget: memory, coalescing, then one upstream call."""
+    if model_info.get('type') == 'local':
+        return _translate_local(text, source_lang, target_lang, model_info)
+
+    api_token, models, client = _get_api_settings(model_info)
+    model_url = _resolve_model_url(source_lang, target_lang, models)
+
+    memory = model_info.get('memory')
+    if memory:
+        remembered = memory.lookup(text, source_lang, target_lang, model_url)
+        if remembered is not None:
+            return remembered
+
+    request_translation = lambda: _request_translation(text, source_lang, target_lang, model_url, api_token,
+                                                       client, model_info, priority)
+
+    # Identical requests already in flight (in this worker, or best effort in another) share one call
+    coalescer = model_info.get('coalescer')
+    if coalescer:
+        lookup = (lambda: memory.lookup(text, source_lang, target_lang, model_url)) if memory else None
+        key = "\x1f".join([model_url, source_lang, target_lang, text])
+        return coalescer.do(key, request_translation, lookup)
+    return request_translation()
+
+def _request_translation(text, source_lang, target_lang, model_url, api_token, client, model_info, priority):
+    """Call the Inference API for one text and remember the result."""
+    memory = model_info.get('memory')
+
+    # Concurrent interactive requests share one upstream call
+    batcher = model_info.get('batcher')
+    if batcher and priority == 'interactive':
+        try:
+            translation = batcher.translate(text, model_url)
+            if memory:
+                memory.store(text, source_lang, target_lang, model_url, translation)
+            return translation
+        except BatchFailedError:
+            pass  # Retried on its own below, so one bad sentence doesn't fail its neighbours
+        except CircuitOpenError:
+            pass  # Sent below to a fallback model, if there is one
+
+    headers = {"Authorization": f"Bearer {api_token}"}
+    
+    # Helsinki-NLP models use simple input format
+    payload = {
+        "inputs": text
+    }
+    
+    model_urls = [model_url] + _fallback_model_urls(source_lang, target_lang, model_info)
+    response, _ = _post_translation(client, model_urls, headers, payload, priority)
+    
+    result = response.json()
+    if not (isinstance(result, list) and len(result) > 0 and 'translation_text' in result[0]):
+        raise ValueError("Unexpected translation response")
+    translation = result[0]['translation_text']
+    if memory:
+        # Under the primary model, where lookups find it, even when a fallback model answered
+        memory.store(text, source_lang, target_lang, model_url, translation)
+    return translation
+
+def _translate_local(text, source_lang, target_lang, model_info):
+    """Translate with the in-process CPU backend (services.local_translation)."""
+    translator = model_info['translator']
+    direction = _resolve_direction(source_lang, target_lang)
+    model_id = translator.model_id(direction)
+
+    memory = model_info.get('memory')
+    if memory:
+        remembered = memory.lookup(text, source_lang, target_lang, model_id)
+        if remembered is not None:
+            return remembered
+
+    translation = translator.translate(text, direction)
+    if memory:
+        memory.store(text, source_lang, target_lang, model_id, translation)
+    return translation
+
+def _translate_segmented(text, source_lang, target_lang, model_info, max_tokens, priority):
+    """Translate a long text as sentence-aligned segments within the model's token budget."""
+    segments = chunk_text_by_sentence(text, max_tokens, pack=True)
+    # Segments fit the budget; never route them back through segmentation
+    results = translate_text_many(segments, source_lang, target_lang, model_info, priority=priority,
+                                  segment_oversized=False)
+    for result in results:
+        if 'error' in result:
+            raise Exception(result['error'])
+    return ' '.join(result['translation'] for result in results)
+
+def _pack_batches(items, max_items, max_tokens):
+    """
+    Group (index, text, tokens) items into batches bounded by item count and total
+    estimated tokens. A single text over max_tokens gets a batch of its own.
+    """
+    batch = []
+    batch_tokens = 0
+    for index, text, tokens in items:
+        if batch and (len(batch) >= max_items or batch_tokens + tokens > max_tokens):
+            yield batch
+            batch = []
+            batch_tokens = 0
+        batch.append((index, text))
+        batch_tokens += tokens
+    if batch:
+        yield batch
+
+def _translate_batch(texts, model_urls, headers, client, priority='bulk'):
+    """
+    Send one batched request to the Hugging Face Inference API.
+
+    Returns:
+        tuple: (translations, URL of the model that answered); an item the response
+            has no translation for is a ValueError instance instead of a string
+    """
+    response, model_url = _post_translation(client, model_urls, headers, {"inputs": texts}, priority)
+
+    result = response.json()
+    if not isinstance(result, list) or len(result) != len(texts):
+        raise ValueError(f"Unexpected batch response: expected {len(texts)} translations")
+
+    translations = []
+    for item in result:
+        # Some deployments wrap each item in its own list
+        if isinstance(item, list):
+            item = item[0] if item else None
+        translation = item.get('translation_text') if isinstance(item, dict) else None
+        if isinstance(translation, str):
+            translations.append(translation)
+        else:
+            # Only this item fails; the others in the batch are still good
+            translations.append(ValueError("No translation returned"))
+    return translations, model_url
+
+class BatchFailedError(Exception):
+    """A micro-batch with several sentences failed; each sentence should be retried alone."""
+
+class TranslationBatcher:
     """
-    Legacy function for backward compatibility with local models
-    This function is deprecated - use translate_text() with model_info instead
+    Per-worker micro-batcher for single-sentence /translate requests. Requests for
+    the same model arriving within max_wait of each other (up to max_batch_size)
+    go to Hugging Face as one batched call, and each waiting request gets its own
+    translation back.
+    """
+
+    def __init__(self, api_token, client, max_batch_size=8, max_wait=0.01, max_concurrent_batches=8):
+        self.headers = {"Authorization": f"Bearer {api_token}"}
+        self.client = client
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait
+        self.max_concurrent_batches = max_concurrent_batches
+        self._batchers = {}
+        self._lock = threading.Lock()
+
+    def _get_batcher(self, model_url):
+        with self._lock:
+            batcher = self._batchers.get(model_url)
+            if batcher is None:
+                batcher = MicroBatcher(lambda texts: self._process(model_url, texts),
+                                       max_batch_size=self.max_batch_size, max_wait=self.max_wait,
+                                       name=f"translate-{hf_model_name(model_url)}",
+                                       max_concurrent_batches=self.max_concurrent_batches)
+                self._batchers[model_url] = batcher
+            return batcher
+
+    def _process(self, model_url, texts):
+        try:
+            return _translate_batch(texts, [model_url], self.headers, self.client, priority='interactive')[0]
+        except Exception as e:
+            if len(texts) == 1:
+                raise
+            logger.warning("Micro-batch of %d translations failed, retrying individually: %s", len(texts), e)
+            return [BatchFailedError(str(e)) for _ in texts]
+
+    def translate(self, text, model_url):
+        """Translate one text as part of the next batch for its model."""
+        return self._get_batcher(model_url).process(text)
+
+def translate_text_many(texts, source_lang, target_lang, model_info,
+                        max_batch_items=BATCH_MAX_ITEMS, max_batch_tokens=BATCH_MAX_TOKENS, priority='bulk',
+                        segment_oversized=True):
     """
-    import torch
+    Translate a list of texts with as few Hugging Face calls (or local model batches) as possible
     
-    try:
-        src_lang_code = LANG_CODES.get(source_lang)
-        tgt_lang_code = LANG_CODES.get(target_lang)
-
-        if not src_lang_code or not tgt_lang_code:
-            raise ValueError("Unsupported language pair")
-
-        inputs = tokenizer(text, return_tensors="pt", padding=True, truncation=True, max_length=512)
-        inputs = {k: v.to(device) for k, v in inputs.items()}
-
-        forced_bos_token = tgt_lang_code
-        
-        with torch.no_grad():
-            translated_ids = model.generate(
-                **inputs,
-                forced_bos_token_id=tokenizer.convert_tokens_to_ids(forced_bos_token),
-                max_length=1024,
-                num_beams=5,
-                length_penalty=1.0,
-                do_sample=False
-            )
-
-        return tokenizer.decode(translated_ids[0], skip_special_tokens=True)
+    Args:
+        texts: List of texts to translate
+        source_lang: Source language name
+        target_lang: Target language name
+        model_info: Dictionary containing API info from AIModels.get_translation_model()
+        max_batch_items: Maximum number of texts sent in one upstream request
+        max_batch_tokens: Maximum total estimated tokens sent in one upstream request
+        priority: Rate limiter priority, 'interactive' or 'bulk'
+        segment_oversized: Split texts over the model's budget into segments; when False
+            they are sent as they are
     
-    except Exception as e:
-        print(f"Translation error: {str(e)}")
-        raise
+    Returns:
+        list: One dict per input, in input order, holding either 'translation' or 'error'
+    """
+    # Configuration problems affect every item, so they are raised instead of reported per item
+    if model_info.get('type') == 'local':
+        translator = model_info['translator']
+        direction = _resolve_direction(source_lang, target_lang)
+        model_url = translator.model_id(direction)
+        translate_batch = lambda batch_texts: (translator.translate_many(batch_texts, direction), model_url)
+    else:
+        api_token, models, client = _get_api_settings(model_info)
+        model_url = _resolve_model_url(source_lang, target_lang, models)
+        model_urls = [model_url] + _fallback_model_urls(source_lang, target_lang, model_info)
+        headers = {"Authorization": f"Bearer {api_token}"}
+        translate_batch = lambda batch_texts: _translate_batch(batch_texts, model_urls, headers, client, priority)
+    memory = model_info.get('memory')
+    max_tokens = model_info.get('max_tokens')
+
+    results = [None] * len(texts)
+    pending = []
+    oversized = []
+    for index, text in enumerate(texts):
+        if not isinstance(text, str):
+            results[index] = {'error': 'Text must be a string'}
+        elif not text.strip():
+            results[index] = {'translation': ''}
+        else:
+            remembered = memory.lookup(text, source_lang, target_lang, model_url) if memory else None
+            if remembered is not None:
+                results[index] = {'translation': remembered}
+                continue
+            tokens = estimate_tokens(text)
+            if segment_oversized and max_tokens and tokens > max_tokens:
+                oversized.append(index)
+            else:
+                pending.append((index, text, tokens))
+
+    for batch in _pack_batches(pending, max_batch_items, max_batch_tokens):
+        batch_texts = [text for _, text in batch]
+        try:
+            translations, _ = translate_batch(batch_texts)
+            for (index, text), translation in zip(batch, translations):
+                if isinstance(translation, Exception):
+                    results[index] = {'error': str(translation)}
+                    continue
+                results[index] = {'translation': translation}
+                if memory:
+                    # Under the primary model, where lookups find it, even when a fallback model answered
+                    memory.store(text, source_lang, target_lang, model_url, translation)
+        except (RateLimitError, CircuitOpenError) as e:
+            # Retrying item by item would only queue or fail again, once per item
+            logger.warning("Batch of %d translations not sent: %s", len(batch), e)
+            for index, _ in batch:
+                results[index] = {'error': str(e)}
+        except Exception as e:
+            logger.warning("Batch translation error, retrying %d items individually: %s", len(batch), e)
+            # Isolate the failing items so one bad sentence doesn't fail the whole batch
+            for index, text in batch:
+                try:
+                    results[index] = {'translation': _translate_one(text, source_lang, target_lang, model_info,
+                                                                    priority)}
+                except Exception as item_error:
+                    results[index] = {'error': str(item_error)}
+
+    # Texts over the per-input budget are segmented and translated on their own
+    for index in oversized:
+        try:
+            results[index] = {'translation': _translate_segmented(texts[index], source_lang, target_lang, model_info,
+                                                                  max_tokens, priority)}
+        except Exception as e:
+            results[index] = {'error': str(e)}
+
+    return results
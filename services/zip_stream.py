@@ -0,0 +1,63 @@
+import re
+import zipfile
+from xml.sax.saxutils import escape
+
+# Characters that are not allowed in XML 1.0 documents
+_ILLEGAL_XML_CHARS_RE = re.compile(r'[\x00-\x08\x0b\x0c\x0e-\x1f]')
+
+def xml_text(value):
+    """Escape a value for use as XML character data."""
+    return escape(_ILLEGAL_XML_CHARS_RE.sub('', str(value)))
+
+class _ChunkSink:
+    """Write-only, non-seekable file object that collects what zipfile writes."""
+
+    def __init__(self):
+        self._chunks = []
+        self._position = 0
+        self.pending = 0
+
+    def write(self, data):
+        self._chunks.append(bytes(data))
+        self._position += len(data)
+        self.pending += len(data)
+        return len(data)
+
+    def tell(self):
+        return self._position
+
+    def seek(self, *args):
+        # Makes zipfile fall back to streaming mode (data descriptors after each entry)
+        raise OSError("stream is not seekable")
+
+    def flush(self):
+        pass
+
+    def drain(self):
+        data = b''.join(self._chunks)
+        self._chunks = []
+        self.pending = 0
+        return data
+
+def iter_zip(entries, flush_size=64 * 1024):
+    """
+    Build a ZIP archive incrementally and yield it in chunks while it is produced.
+
+    Args:
+        entries: Iterable of (name, content) where content is bytes or an iterable of bytes
+        flush_size: Yield as soon as this many compressed bytes are buffered
+
+    Yields:
+        bytes: Consecutive pieces of the archive
+    """
+    sink = _ChunkSink()
+    with zipfile.ZipFile(sink, 'w', compression=zipfile.ZIP_DEFLATED) as archive:
+        for name, content in entries:
+            with archive.open(name, 'w') as entry:
+                for chunk in ([content] if isinstance(content, bytes) else content):
+                    entry.write(chunk)
+                    if sink.pending >= flush_size:
+                        yield sink.drain()
+    data = sink.drain()
+    if data:
+        yield data
@@ -93,6 +93,59 @@ document.addEventListener('DOMContentLoaded', function () {
         }
     }
 
+    // Function to translate many sentences with one request per batch
+    async function translateBatch(texts, sourceLang, targetLang, attempts = 5) {
+        const response = await fetch('/translate/batch', {
+            method: 'POST',
+            headers: {
+                'Content-Type': 'application/json',
+            },
+            body: JSON.stringify({
+                texts: texts,
+                sourceLang: sourceLang,
+                targetLang: targetLang
+            })
+        });
+
+        // Other uploads are being translated; try again when the server says to
+        if (response.status === 503 && attempts > 1) {
+            const retryAfter = parseFloat(response.headers.get('Retry-After')) || 2;
+            await new Promise(resolve => setTimeout(resolve, retryAfter * 1000));
+            return translateBatch(texts, sourceLang, targetLang, attempts - 1);
+        }
+
+        const data = await response.json();
+        if (!response.ok) {
+            throw new Error(data.error || "Failed to fetch translations");
+        }
+
+        return data.translations;
+    }
+
+    // Translate sentences in batches and show them in the chat
+    async function translateAndDisplay(lines, sourceLang, targetLang) {
+        const nonEmptyLines = lines.filter(line => line.trim());
+        const batchSize = 50;
+
+        for (let start = 0; start < nonEmptyLines.length; start += batchSize) {
+            const batch = nonEmptyLines.slice(start, start + batchSize);
+            const skeleton = addSkeletonLoader(false);
+            const translations = await translateBatch(batch, sourceLang, targetLang);
+            skeleton.remove();
+
+            batch.forEach((line, index) => {
+                const result = translations[index];
+                addMessage(line, true);
+                if (result.error) {
+                    console.error('Translation error for sentence:', line, result.error);
+                    addMessage('[Translation failed: ' + result.error + ']', false);
+                } else {
+                    addMessage(result.translation, false);
+                }
+            });
+        }
+    }
+
     pdfFileInput.addEventListener('change', async function () {
         const file = pdfFileInput.files[0];
         if (!file) return;
@@ -105,35 +158,56 @@ document.addEventListener('DOMContentLoaded', function () {
         formData.append('file', file);
     
         try {
-            const response = await fetch('/upload-pdf', {
+            // Stream sentences page by page so translation starts before parsing finishes
+            const response = await fetch('/upload-pdf?stream=1', {
                 method: 'POST',
                 body: formData,
             });
-    
-            const data = await response.json();
-            console.log(data)
-            if (data.error) {
-                throw new Error(data.error);
-            }
-    
-            // ✅ Ensure 'text' exists before splitting
-            if (!data.text) {
-                console.log('No text extracted from PDF');
+
+            if (!response.ok) {
+                const data = await response.json();
+                throw new Error(data.error || 'Failed to upload PDF');
             }
     
-            const lines = data.sentences; // Use the array directly
             const sourceLang = document.getElementById('sourceLang').value;
             const targetLang = document.getElementById('targetLang').value;
-    
-            for (const line of lines) {
-                if (line.trim()) {
-                    addMessage(line, true);
-                    const skeleton = addSkeletonLoader(false);
-                    const translation = await translateText(line, sourceLang, targetLang);
-                    skeleton.remove();
-                    addMessage(translation, false);
+            const reader = response.body.getReader();
+            const decoder = new TextDecoder();
+            let buffered = '';
+            let translating = Promise.resolve();
+
+            const handleEvent = (event) => {
+                if (event.error) {
+                    throw new Error(event.error);
                 }
+                if (event.sentences) {
+                    // Queue translations in page order without pausing the stream
+                    translating = translating.then(async () => {
+                        await translateAndDisplay(event.sentences, sourceLang, targetLang);
+                        progressBarInner.style.width = `${Math.round(event.page / event.pages * 100)}%`;
+                    });
+                }
+            };
+
+            while (true) {
+                const { value, done } = await reader.read();
+                if (done) break;
+                buffered += decoder.decode(value, { stream: true });
+
+                let newline;
+                while ((newline = buffered.indexOf('\n')) >= 0) {
+                    const line = buffered.slice(0, newline);
+                    buffered = buffered.slice(newline + 1);
+                    if (line.trim()) {
+                        handleEvent(JSON.parse(line));
+                    }
+                }
+            }
+            if (buffered.trim()) {
+                handleEvent(JSON.parse(buffered));
             }
+
+            await translating;
         } catch (error) {
             console.error('PDF processing error:', error);
             alert('PDF processing failed: ' + error.message);
@@ -508,6 +582,32 @@ async function fetchAndExportPDF(fileType) {
     }
 }
 
+// Feed a streamed MP3 response into a MediaSource and return its object URL
+function streamAudioToMediaSource(response) {
+    const mediaSource = new MediaSource();
+    const reader = response.body.getReader();
+
+    mediaSource.addEventListener('sourceopen', async () => {
+        const sourceBuffer = mediaSource.addSourceBuffer('audio/mpeg');
+        const appendChunk = (chunk) => new Promise((resolve) => {
+            sourceBuffer.addEventListener('updateend', resolve, { once: true });
+            sourceBuffer.appendBuffer(chunk);
+        });
+
+        while (true) {
+            const { value, done } = await reader.read();
+            if (done) break;
+            await appendChunk(value);
+        }
+        mediaSource.endOfStream();
+    }, { once: true });
+
+    return URL.createObjectURL(mediaSource);
+}
+
+// Server URLs of cached speech clips, by text
+const ttsAudioUrls = new Map();
+
 // Text-to-Speech functionality
 async function playTextToSpeech(text, button) {
     const originalIcon = button.innerHTML;
@@ -517,26 +617,41 @@ async function playTextToSpeech(text, button) {
         button.innerHTML = '<i class="bi bi-arrow-clockwise spinner-border spinner-border-sm"></i>';
         button.disabled = true;
         
-        const response = await fetch('/text-to-speech', {
-            method: 'POST',
-            headers: {
-                'Content-Type': 'application/json',
-            },
-            body: JSON.stringify({
-                text: text,
-                voice: 'alloy',  // You can make this configurable
-                model: 'tts-1'
-            })
-        });
+        // Replays use the server's cached clip URL directly (seekable, no new synthesis)
+        let audioUrl = ttsAudioUrls.get(text);
+        const isReplay = Boolean(audioUrl);
+        // The server announces the clip's URL before the stream ends; it only exists once it has
+        let pendingAudioUrl = null;
 
-        if (!response.ok) {
-            const errorData = await response.json();
-            throw new Error(errorData.error || 'TTS request failed');
-        }
+        if (!audioUrl) {
+            // Stream audio when the browser can play MP3 progressively
+            const canStream = window.MediaSource && MediaSource.isTypeSupported('audio/mpeg');
 
-        // Get audio blob
-        const audioBlob = await response.blob();
-        const audioUrl = URL.createObjectURL(audioBlob);
+            const response = await fetch('/text-to-speech', {
+                method: 'POST',
+                headers: {
+                    'Content-Type': 'application/json',
+                },
+                body: JSON.stringify({
+                    text: text,
+                    voice: 'alloy',  // You can make this configurable
+                    model: 'tts-1',
+                    stream: canStream
+                })
+            });
+
+            if (!response.ok) {
+                const errorData = await response.json();
+                throw new Error(errorData.error || 'TTS request failed');
+            }
+
+            pendingAudioUrl = response.headers.get('X-Audio-Url');
+
+            // Start playback as soon as the first chunks arrive, or fall back to the whole blob
+            audioUrl = canStream
+                ? streamAudioToMediaSource(response)
+                : URL.createObjectURL(await response.blob());
+        }
         
         // Create and play audio
         const audio = new Audio(audioUrl);
@@ -552,12 +667,26 @@ async function playTextToSpeech(text, button) {
             button.innerHTML = originalIcon;
             button.disabled = false;
             button.title = 'Listen to translation';
-            URL.revokeObjectURL(audioUrl);
+            if (pendingAudioUrl) {
+                ttsAudioUrls.set(text, pendingAudioUrl);
+            }
+            if (audioUrl.startsWith('blob:')) {
+                URL.revokeObjectURL(audioUrl);
+            }
         });
         
         // Handle audio errors
         audio.addEventListener('error', () => {
-            throw new Error('Failed to play audio');
+            button.innerHTML = originalIcon;
+            button.disabled = false;
+            button.title = 'Listen to translation';
+            if (isReplay) {
+                // The cached clip is gone (evicted, or another server); synthesize it again
+                ttsAudioUrls.delete(text);
+                playTextToSpeech(text, button);
+            } else {
+                alert('Text-to-speech failed: Failed to play audio');
+            }
         });
         
     } catch (error) {
@@ -0,0 +1,96 @@
+import json
+import multiprocessing
+import threading
+import time
+import pytest
+from services.admission import AdmissionQueue, AdmissionRejected
+
+_fork = multiprocessing.get_context('fork')
+
+def _queue(tmp_path, concurrency=1, queue_size=0, timeout=5):
+    return AdmissionQueue('test', concurrency, queue_size, timeout, str(tmp_path), poll_interval=0.01)
+
+def _state(queue):
+    with open(queue.path) as f:
+        return json.loads(f.read() or '{}')
+
+def test_concurrency_and_queue_are_shared_between_workers(tmp_path):
+    running = _fork.Value('i', 0)
+    peak = _fork.Value('i', 0)
+    admitted = _fork.Value('i', 0)
+    rejected = _fork.Value('i', 0)
+    ready = _fork.Barrier(6)
+
+    def request():
+        queue = _queue(tmp_path, concurrency=2, queue_size=2)
+        ready.wait()
+        try:
+            queue.acquire()
+        except AdmissionRejected as e:
+            assert e.reason == 'queue_full'
+            with rejected.get_lock():
+                rejected.value += 1
+            return
+        with running.get_lock():
+            running.value += 1
+            admitted.value += 1
+            peak.value = max(peak.value, running.value)
+        time.sleep(0.3)
+        with running.get_lock():
+            running.value -= 1
+        queue.release()
+
+    workers = [_fork.Process(target=request) for _ in range(6)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    assert [worker.exitcode for worker in workers] == [0] * 6
+    assert peak.value == 2
+    assert admitted.value == 4
+    assert rejected.value == 2
+    assert _state(_queue(tmp_path)) == {}
+
+def test_request_is_rejected_at_once_without_a_queue(tmp_path):
+    queue = _queue(tmp_path)
+    queue.acquire()
+    start = time.monotonic()
+    with pytest.raises(AdmissionRejected) as excinfo:
+        queue.acquire()
+    assert excinfo.value.reason == 'queue_full'
+    assert time.monotonic() - start < 0.1
+    queue.release()
+
+def test_waiting_request_times_out_and_leaves_the_queue(tmp_path):
+    queue = _queue(tmp_path, queue_size=1, timeout=0.2)
+    queue.acquire()
+    start = time.monotonic()
+    with pytest.raises(AdmissionRejected) as excinfo:
+        queue.acquire()
+    assert excinfo.value.reason == 'timeout'
+    assert time.monotonic() - start >= 0.2
+    queue.release()
+    assert _state(queue) == {}
+
+def test_waiting_request_gets_the_released_slot(tmp_path):
+    queue = _queue(tmp_path, queue_size=1)
+    queue.acquire()
+    threading.Timer(0.1, queue.release).start()
+    queue.acquire()
+    queue.release()
+    assert _state(queue) == {}
+
+def test_slots_of_a_crashed_worker_are_reclaimed(tmp_path):
+    def crash():
+        _queue(tmp_path).acquire()
+        # Exits without release(), like a worker killed mid-request
+
+    worker = _fork.Process(target=crash)
+    worker.start()
+    worker.join()
+    assert str(worker.pid) in _state(_queue(tmp_path))
+
+    queue = _queue(tmp_path)
+    queue.acquire()
+    assert str(worker.pid) not in _state(queue)
+    queue.release()
@@ -0,0 +1,136 @@
+import multiprocessing
+import time
+import pytest
+from models.resilience import CircuitBreaker
+from models.upstream_client import CircuitOpenError
+from services import cache_service
+from services.cache_service import AudioCache, DiskCache, TranslationMemory
+from services.translation_service import translate_text
+
+PRIMARY_URL = 'https://api-inference.huggingface.co/models/Helsinki-NLP/opus-mt-tc-big-en-ar'
+FALLBACK_URL = 'https://api-inference.huggingface.co/models/Helsinki-NLP/opus-mt-en-ar'
+
+class _Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = _Clock()
+    monkeypatch.setattr(cache_service.time, 'time', clock)
+    return clock
+
+class _Response:
+    def __init__(self, payload):
+        self._payload = payload
+
+    def json(self):
+        return self._payload
+
+class _FallbackClient:
+    """Upstream stand-in whose primary model's circuit breaker is open."""
+
+    def __init__(self):
+        self.calls = []
+
+    def post(self, provider, url, **kwargs):
+        self.calls.append(url)
+        if url == PRIMARY_URL:
+            raise CircuitOpenError(CircuitBreaker('huggingface:primary'))
+        return _Response([{'translation_text': kwargs['json']['inputs'].upper()}])
+
+def test_entries_expire_after_the_ttl(tmp_path, clock):
+    evicted = []
+    cache = DiskCache(str(tmp_path / 'cache.db'), ttl=60, on_evict=evicted.extend)
+    cache.set('key', 'value')
+    clock.now += 59
+    assert cache.get('key') == 'value'
+    clock.now += 2
+    assert cache.get('key') is None
+    assert evicted == [('key', 'value')]
+
+def test_least_recently_used_entries_are_evicted(tmp_path, clock):
+    cache = DiskCache(str(tmp_path / 'cache.db'), max_entries=2)
+    cache.set('a', '1')
+    clock.now += 1
+    cache.set('b', '2')
+    clock.now += 1
+    cache.set('c', '3')
+    clock.now += cache.ACCESS_RESOLUTION + 1
+    cache.get('a')
+    cache.evict()
+    assert cache.get('a') == '1'
+    assert cache.get('b') is None
+    assert cache.get('c') == '3'
+
+def test_hits_do_not_write(tmp_path, clock):
+    cache = DiskCache(str(tmp_path / 'cache.db'))
+    cache.set('key', 'value')
+    conn = cache._connect()
+    changes = conn.total_changes
+    for _ in range(100):
+        assert cache.get('key') == 'value'
+        cache.get('missing')
+    assert conn.total_changes == changes
+
+    # A stale access time is refreshed once, then hits are plain reads again
+    clock.now += cache.ACCESS_RESOLUTION + 1
+    cache.get('key')
+    cache.get('key')
+    assert conn.total_changes == changes + 1
+
+def test_stats_add_up_across_workers(tmp_path):
+    path = str(tmp_path / 'cache.db')
+    cache = DiskCache(path)
+    cache.set('key', 'value')
+
+    def lookups():
+        other = DiskCache(path)
+        other.get('key')
+        other.get('missing')
+        other.stats()
+
+    worker = multiprocessing.get_context('fork').Process(target=lookups)
+    worker.start()
+    worker.join()
+    cache.get('key')
+
+    stats = cache.stats()
+    assert (stats['hits'], stats['misses'], stats['entries']) == (2, 1, 1)
+    assert stats['hit_ratio'] == pytest.approx(2 / 3)
+
+def test_fallback_translation_is_remembered_under_the_primary_model(tmp_path):
+    memory = TranslationMemory(str(tmp_path / 'memory.db'))
+    client = _FallbackClient()
+    model_info = {
+        'type': 'huggingface_api',
+        'api_token': 'token',
+        'client': client,
+        'memory': memory,
+        'models': {'en_to_ar': PRIMARY_URL},
+        'fallback_models': {'en_to_ar': [FALLBACK_URL]}
+    }
+
+    assert translate_text('hello', 'English', 'Arabic', model_info) == 'HELLO'
+    assert client.calls == [PRIMARY_URL, FALLBACK_URL]
+    assert translate_text('hello', 'English', 'Arabic', model_info) == 'HELLO'
+    assert len(client.calls) == 2
+    assert memory.lookup('hello', 'English', 'Arabic', FALLBACK_URL) is None
+
+def test_audio_clip_is_visible_only_once_streamed_completely(tmp_path):
+    cache = AudioCache(str(tmp_path / 'tts'))
+    key = cache.make_key('hello', 'alloy', 'tts-1')
+
+    stream = cache.store_stream(key, iter([b'ab', b'cd']))
+    assert next(stream) == b'ab'
+    assert cache.lookup(key) is None
+    stream.close()  # client went away mid-clip
+    assert cache.lookup(key) is None
+    assert not list((tmp_path / 'tts').rglob('*.tmp'))
+
+    assert list(cache.store_stream(key, iter([b'ab', b'cd']))) == [b'ab', b'cd']
+    with open(cache.lookup(key), 'rb') as f:
+        assert f.read() == b'abcd'
@@ -0,0 +1,121 @@
+import multiprocessing
+import os
+import threading
+import time
+import pytest
+from services.coalescing import SingleFlight
+
+def _wait_for(path, timeout=5):
+    deadline = time.monotonic() + timeout
+    while not os.path.exists(path):
+        assert time.monotonic() < deadline, f"{path} did not appear"
+        time.sleep(0.01)
+
+def _hold_in_worker(lock_dir, key, started, result_path, seconds):
+    """Start a worker process that runs the call for key, storing its result after `seconds`."""
+    def run():
+        def fn():
+            open(started, 'w').close()
+            time.sleep(seconds)
+            with open(result_path, 'w') as f:
+                f.write('from worker')
+            return 'from worker'
+        SingleFlight('test', str(lock_dir), lock_timeout=5).do(key, fn, lambda: None)
+
+    worker = multiprocessing.get_context('fork').Process(target=run)
+    worker.start()
+    _wait_for(started)
+    return worker
+
+def test_identical_calls_in_a_worker_share_one_call():
+    flight = SingleFlight('test')
+    release = threading.Event()
+    calls = []
+    def fn():
+        calls.append(1)
+        release.wait(5)
+        return 'result'
+
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(flight.do('key', fn))) for _ in range(5)]
+    for thread in threads:
+        thread.start()
+    time.sleep(0.1)
+    release.set()
+    for thread in threads:
+        thread.join()
+    assert calls == [1]
+    assert results == ['result'] * 5
+
+def test_followers_get_the_leaders_exception():
+    flight = SingleFlight('test')
+    release = threading.Event()
+    def fn():
+        release.wait(5)
+        raise ValueError('upstream failed')
+
+    errors = []
+    def call():
+        try:
+            flight.do('key', fn)
+        except ValueError as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=call) for _ in range(3)]
+    for thread in threads:
+        thread.start()
+    time.sleep(0.1)
+    release.set()
+    for thread in threads:
+        thread.join()
+    assert len(errors) == 3
+    # The key is free again afterwards
+    assert flight.do('key', lambda: 'ok') == 'ok'
+
+def test_waiter_in_another_worker_uses_the_stored_result(tmp_path):
+    result_path = tmp_path / 'result'
+    worker = _hold_in_worker(tmp_path, 'key', tmp_path / 'started', result_path, 0.3)
+
+    calls = []
+    lookup = lambda: result_path.read_text() if result_path.exists() else None
+    result = SingleFlight('test', str(tmp_path), lock_timeout=5).do('key', lambda: calls.append(1), lookup)
+    worker.join()
+    assert result == 'from worker'
+    assert calls == []
+    assert not list(tmp_path.glob('*.lock'))
+
+def test_unrelated_keys_do_not_wait_for_each_other(tmp_path):
+    worker = _hold_in_worker(tmp_path, 'a', tmp_path / 'started', tmp_path / 'result', 1)
+
+    start = time.monotonic()
+    result = SingleFlight('test', str(tmp_path), lock_timeout=5).do('b', lambda: 'b', lambda: None)
+    elapsed = time.monotonic() - start
+    worker.join()
+    assert result == 'b'
+    assert elapsed < 0.5
+
+def test_waiter_calls_upstream_itself_after_the_lock_timeout(tmp_path):
+    worker = _hold_in_worker(tmp_path, 'key', tmp_path / 'started', tmp_path / 'result', 1)
+
+    start = time.monotonic()
+    result = SingleFlight('test', str(tmp_path), lock_timeout=0.2).do('key', lambda: 'own call', lambda: None)
+    elapsed = time.monotonic() - start
+    worker.join()
+    assert result == 'own call'
+    assert 0.2 <= elapsed < 0.9
+
+@pytest.mark.parametrize('fails', [False, True])
+def test_lock_files_are_removed(tmp_path, fails):
+    flight = SingleFlight('test', str(tmp_path))
+    def fn():
+        assert len(list(tmp_path.glob('*.lock'))) == 1
+        if fails:
+            raise RuntimeError('upstream failed')
+        return 'ok'
+
+    if fails:
+        with pytest.raises(RuntimeError):
+            flight.do('key', fn, lambda: None)
+    else:
+        assert flight.do('key', fn, lambda: None) == 'ok'
+    assert not list(tmp_path.glob('*.lock'))
@@ -0,0 +1,38 @@
+import io
+import zipfile
+import pytest
+from flask import Flask
+from services.convert_service import export_to_excel, export_to_word
+
+_app = Flask(__name__)
+
+EXPORTS = [
+    (export_to_word, 'word/document.xml'),
+    (export_to_excel, 'xl/worksheets/sheet1.xml')
+]
+
+@pytest.mark.parametrize('export, _', EXPORTS)
+@pytest.mark.parametrize('chat_data', [{'original': 'hello'}, ['hello'], [{'original': 'ok'}, None]])
+def test_malformed_chat_data_is_rejected_before_streaming(export, _, chat_data):
+    with _app.test_request_context():
+        response, status = export(chat_data)
+        assert status == 400
+        assert 'error' in response.get_json()
+
+@pytest.mark.parametrize('export, part', EXPORTS)
+def test_non_string_values_stream_a_complete_document(export, part):
+    chat_data = [
+        {'original': 42, 'translated': None, 'source_lang': 'English', 'target_lang': 3.5},
+        {'original': 'tab\there\nnew line', 'translated': '<b>&</b>'}
+    ]
+    with _app.test_request_context():
+        response = export(chat_data)
+        assert response.status_code == 200
+        body = b''.join(response.response)
+
+    with zipfile.ZipFile(io.BytesIO(body)) as archive:
+        assert archive.testzip() is None
+        xml = archive.read(part).decode('utf-8')
+    assert '42' in xml
+    assert '3.5' in xml
+    assert '&lt;b&gt;&amp;&lt;/b&gt;' in xml
@@ -0,0 +1,89 @@
+import multiprocessing
+import time
+import pytest
+from models.rate_limiter import RateLimiter
+from models.upstream_client import UpstreamClient, RateLimitError
+
+class _Response:
+    def __init__(self, status_code, headers=None):
+        self.status_code = status_code
+        self.headers = headers or {}
+        self.closed = False
+
+    def close(self):
+        self.closed = True
+
+    def raise_for_status(self):
+        pass
+
+def _limiter(tmp_path, **kwargs):
+    # 60 requests per minute with a 2 second burst: a bucket of 2 tokens refilled at 1/s
+    kwargs.setdefault('max_wait', 0.1)
+    return RateLimiter(str(tmp_path / 'limits.db'), {'openai:tts-1': 60}, burst_seconds=2, **kwargs)
+
+def _client(limiter, statuses):
+    """UpstreamClient whose OpenAI session answers with the given status codes in turn."""
+    client = UpstreamClient(max_retries=len(statuses), backoff_base=0.05, rate_limiter=limiter, breaker_threshold=0)
+    session = client._get_session('openai')
+    sent = []
+    def post(url, **kwargs):
+        sent.append(time.monotonic())
+        return _Response(statuses[len(sent) - 1])
+    session.post = post
+    return client, sent
+
+def test_requests_over_the_bucket_are_shed(tmp_path):
+    limiter = _limiter(tmp_path)
+    limiter.acquire('openai', 'tts-1')
+    limiter.acquire('openai', 'tts-1')
+    with pytest.raises(RateLimitError):
+        limiter.acquire('openai', 'tts-1')
+
+def test_unlimited_models_never_wait(tmp_path):
+    limiter = _limiter(tmp_path)
+    for _ in range(10):
+        limiter.acquire('openai', 'whisper-1')
+
+def test_bulk_requests_leave_the_reserve_to_interactive_ones(tmp_path):
+    limiter = _limiter(tmp_path, bulk_reserve=0.5)
+    assert limiter.try_acquire('openai', 'tts-1', priority='bulk')
+    assert not limiter.try_acquire('openai', 'tts-1', priority='bulk')
+    assert limiter.try_acquire('openai', 'tts-1')
+
+def test_bucket_is_shared_between_workers(tmp_path):
+    def drain():
+        limiter = _limiter(tmp_path)
+        limiter.acquire('openai', 'tts-1')
+        limiter.acquire('openai', 'tts-1')
+
+    worker = multiprocessing.get_context('fork').Process(target=drain)
+    worker.start()
+    worker.join()
+    assert worker.exitcode == 0
+    assert not _limiter(tmp_path).try_acquire('openai', 'tts-1')
+
+def test_penalize_reports_whether_a_bucket_was_paused(tmp_path):
+    limiter = _limiter(tmp_path)
+    assert not limiter.penalize('openai', 'whisper-1', 1)
+    assert limiter.penalize('openai', 'tts-1', 1)
+    assert not limiter.try_acquire('openai', 'tts-1')
+
+def test_429_for_a_model_without_bucket_backs_off_before_retrying(tmp_path):
+    client, sent = _client(_limiter(tmp_path), [429, 200])
+    response = client.post('openai', '/v1/audio/transcriptions', model='whisper-1')
+    assert response.status_code == 200
+    assert sent[1] - sent[0] >= 0.05
+
+def test_429_for_a_model_with_bucket_waits_in_the_limiter(tmp_path):
+    limiter = _limiter(tmp_path, max_wait=5)
+    client, sent = _client(limiter, [429, 200])
+    response = client.post('openai', '/v1/audio/speech', model='tts-1')
+    assert response.status_code == 200
+    # The penalty drained the bucket, so the retry waited for a refill (1 token per second)
+    assert sent[1] - sent[0] >= 0.5
+
+def test_429_after_all_retries_raises(tmp_path):
+    client, sent = _client(None, [429, 429])
+    with pytest.raises(RateLimitError):
+        client.post('openai', '/v1/audio/speech', model='tts-1')
+    assert len(sent) == 2
@@ -0,0 +1,108 @@
+import threading
+import time
+import pytest
+import requests
+from models.resilience import CircuitBreaker, CLOSED, OPEN, HALF_OPEN
+from models.upstream_client import UpstreamClient, CircuitOpenError
+
+class _Response:
+    def __init__(self, status_code, name=None):
+        self.status_code = status_code
+        self.name = name
+        self.headers = {}
+        self.closed = False
+
+    def close(self):
+        self.closed = True
+
+    def raise_for_status(self):
+        if self.status_code >= 400:
+            raise requests.exceptions.HTTPError(response=self)
+
+def _client(post, **kwargs):
+    client = UpstreamClient(max_retries=1, **kwargs)
+    client._get_session('huggingface').post = post
+    return client
+
+def test_breaker_opens_probes_once_and_closes():
+    breaker = CircuitBreaker('test', failure_threshold=2, reset_timeout=0.05)
+    breaker.record_failure()
+    assert breaker.state == CLOSED
+    breaker.record_failure()
+    assert breaker.state == OPEN
+    assert not breaker.allow()
+
+    time.sleep(0.06)
+    assert breaker.allow()
+    assert breaker.state == HALF_OPEN
+    assert not breaker.allow()  # one probe at a time
+    breaker.record_failure()
+    assert breaker.state == OPEN
+
+    time.sleep(0.06)
+    assert breaker.allow()
+    breaker.record_success()
+    assert breaker.state == CLOSED
+    assert breaker.allow()
+
+def test_open_breaker_fails_fast_without_calling_upstream():
+    sent = []
+    def post(url, **kwargs):
+        sent.append(url)
+        return _Response(503)
+    client = _client(post, breaker_threshold=2, breaker_reset_timeout=30)
+
+    for _ in range(2):
+        with pytest.raises(requests.exceptions.HTTPError):
+            client.post('huggingface', '/models/m', model='m')
+    with pytest.raises(CircuitOpenError) as excinfo:
+        client.post('huggingface', '/models/m', model='m')
+    assert len(sent) == 2
+    assert excinfo.value.retry_after > 0
+
+def test_client_errors_do_not_open_the_breaker():
+    client = _client(lambda url, **kwargs: _Response(400), breaker_threshold=1)
+    for _ in range(3):
+        with pytest.raises(requests.exceptions.HTTPError):
+            client.post('huggingface', '/models/m', model='m')
+    assert client.get_breaker('huggingface', 'm').state == CLOSED
+
+def test_slow_request_is_hedged_and_the_loser_closed():
+    release = threading.Event()
+    responses = []
+    lock = threading.Lock()
+    def post(url, **kwargs):
+        with lock:
+            response = _Response(200, name=len(responses))
+            responses.append(response)
+        if response.name == 0:
+            release.wait(5)
+        return response
+
+    client = _client(post, breaker_threshold=0,
+                     hedge_settings={'min_samples': 1, 'min_delay': 0.01, 'max_ratio': 1.0})
+    client._get_tracker('huggingface', 'm').observe(0.01)
+
+    response = client.post('huggingface', '/models/m', model='m', hedge=True)
+    assert response.name == 1
+    assert not responses[0].closed
+
+    release.set()
+    deadline = time.monotonic() + 2
+    while not responses[0].closed and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert responses[0].closed
+    assert not response.closed
+
+def test_hedge_budget_limits_duplicates():
+    sent = []
+    def post(url, **kwargs):
+        sent.append(url)
+        time.sleep(0.05)
+        return _Response(200)
+
+    client = _client(post, breaker_threshold=0,
+                     hedge_settings={'min_samples': 1, 'min_delay': 0.01, 'max_ratio': 0.0})
+    client._get_tracker('huggingface', 'm').observe(0.01)
+    client.post('huggingface', '/models/m', model='m', hedge=True)
+    assert len(sent) == 1
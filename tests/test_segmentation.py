@@ -0,0 +1,47 @@
+from services.pdf_service import chunk_text_by_sentence, estimate_tokens
+from services.translation_service import translate_text
+
+MAX_TOKENS = 200
+
+class _Response:
+    def __init__(self, payload):
+        self._payload = payload
+
+    def json(self):
+        return self._payload
+
+class _EchoClient:
+    """Upstream stand-in that answers every input with itself in upper case."""
+
+    def __init__(self):
+        self.calls = []
+
+    def post(self, provider, url, **kwargs):
+        inputs = kwargs['json']['inputs']
+        self.calls.append(inputs)
+        if isinstance(inputs, list):
+            return _Response([{'translation_text': text.upper()} for text in inputs])
+        return _Response([{'translation_text': inputs.upper()}])
+
+def _model_info(client):
+    return {
+        'type': 'huggingface_api',
+        'api_token': 'token',
+        'client': client,
+        'models': {'en_to_ar': 'https://api-inference.huggingface.co/models/Helsinki-NLP/opus-mt-en-ar'},
+        'max_tokens': MAX_TOKENS
+    }
+
+def test_single_word_over_budget_is_split_by_characters():
+    for text in ['a' * 1000, 'https://example.com/' + 'x' * 1200, '漢字' * 800, '!' * 500]:
+        pieces = chunk_text_by_sentence(text, MAX_TOKENS, pack=True)
+        assert ''.join(pieces) == text
+        assert all(estimate_tokens(piece) <= MAX_TOKENS for piece in pieces)
+
+def test_translating_a_single_word_over_budget_does_not_recurse():
+    client = _EchoClient()
+    text = 'a' * 1000
+
+    assert translate_text(text, 'English', 'Arabic', _model_info(client), priority='bulk').replace(' ', '') == text.upper()
+    assert len(client.calls) == 1
+    assert all(estimate_tokens(piece) <= MAX_TOKENS for piece in client.calls[0])